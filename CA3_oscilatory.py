@@ -1,6 +1,15 @@
 
-import spynnaker8 as sim
+try:
+    import spynnaker8 as sim
+except ImportError:
+    # Local NumPy reference backend when the SpiNNaker toolchain is not available
+    import sim_numpy as sim
+import numpy as np
 import utils
+import spikes
+import instrumentation
+import attractor
+import stdp
 
 """
 Oscilatory CA3 network
@@ -23,8 +32,39 @@ simulationParameters = {"simTime": 85, "timeStep": 1.0, "filename": "CA3_oscilat
 networkSize = 15
 popNeurons = {"DGLayer": networkSize, "PCLayer": networkSize}
 
+# + Connectivity of the recurrent PC-PC synapses (STDP and inhibitory): all-to-all or sparse to reach large network
+#   sizes without N^2 synapses, as {"type": "fixed-probability", "p_connect": 0.1, "seed": 1} or
+#   {"type": "fixed-in-degree", "n": 100, "seed": 1}
+PCConnectivity = {"type": "all-to-all"}
+
 # + If store the weight or not (large increase in simulation time)
 recordWeight = False
+# + If the weight is rebuilt after the simulation from the PC spikes (one single run) instead of reading it from the
+#   simulator each time step. Only with the NumPy backend: the fixed-point STDP of the board does not match the float
+#   reconstruction, so with sPyNNaker the weight history is read from the board
+reconstructWeight = sim.__name__ == "sim_numpy"
+
+# + Duration (ms) of the segments of a streaming simulation, None to run it at once (see the options in utils.py)
+streamSegment = None
+
+# + Event-driven simulation with the NumPy backend (see the options in utils.py)
+eventDriven = False
+
+# + Early termination at a periodic attractor: the simulation runs in segments of "segment" ms (streamSegment if it is
+#   set) and, once all the DG input has been delivered, it stops when the state of PC (spike vector and v quantized to
+#   "vQuantum" mV) repeats with a period, so simTime is only the maximum duration (see attractor.PeriodDetector). The
+#   period (up to "maxPeriod" ms) and the recalled assembly are stored in the header ("attractor"). None to always
+#   simulate simTime, for example {"segment": 20, "vQuantum": 0.01, "maxPeriod": 100}
+attractorDetection = None
+
+# + Fixed-point simulation with the arithmetic of SpiNNaker in the NumPy backend (see the options in utils.py)
+fixedPoint = False
+
+# + If measure the phases of the execution (see the options in utils.py)
+recordPhases = False
+
+# + Recording of v of each population (see the options in utils.py)
+recordPolicies = {"PCLayer": {"neurons": None, "samplingInterval": None, "dtype": "float64", "delta": False}}
 
 # + Input spikes
 # 3 orthogonal patterns
@@ -75,16 +115,25 @@ synParameters = {
 }
 
 
-def main():
+def build_network(sim, DGLSpikes, params=None):
+    """
+    Create the populations and synapses of the network and set the variables to record
 
-    ######################################
-    # Simulation parameters
-    ######################################
-    sim.setup(timestep=simulationParameters["timeStep"])
+    :param sim: simulator used to build the network (spynnaker8 or sim_numpy)
+    :param DGLSpikes: input spikes of DG (a sim.PerTrial with the input spikes of each trial in batch mode)
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    :return: dict with the populations and projections of the network
+    """
+    params = utils.get_model_parameters(globals(), params)
+    popNeurons, neuronParameters = params["popNeurons"], params["neuronParameters"]
+    initNeuronParameters, synParameters = params["initNeuronParameters"], params["synParameters"]
+    PCConnectivity, recordPolicies = params["PCConnectivity"], params["recordPolicies"]
 
     ######################################
     # Create neuron population
     ######################################
+    instrumentation.start_phase("populations")
     # DG
     DGLayer = sim.Population(popNeurons["DGLayer"], sim.SpikeSourceArray(spike_times=DGLSpikes), label="DGLayer")
     # PC
@@ -94,6 +143,7 @@ def main():
     ######################################
     # Create synapses
     ######################################
+    instrumentation.start_phase("projections")
 
     # DG-PC
     DGL_PCL_conn = sim.Projection(DGLayer, PCLayer, sim.OneToOneConnector(),
@@ -107,10 +157,10 @@ def main():
     weight_rule = sim.AdditiveWeightDependence(w_max=synParameters["PCL-PCL"]["w_max"], w_min=synParameters["PCL-PCL"]["w_min"])
     stdp_model = sim.STDPMechanism(timing_dependence=timing_rule, weight_dependence=weight_rule,
                                    weight=synParameters["PCL-PCL"]["initWeight"], delay=synParameters["PCL-PCL"]["delay"])
-    PCL_PCL_conn = sim.Projection(PCLayer, PCLayer, sim.AllToAllConnector(allow_self_connections=False), synapse_type=stdp_model)
+    PCL_PCL_conn = sim.Projection(PCLayer, PCLayer, utils.get_recurrent_connector(sim, PCConnectivity), synapse_type=stdp_model)
 
     # PCL-PCL-inh
-    PCL_PCL_inh_conn = sim.Projection(PCLayer, PCLayer, sim.AllToAllConnector(allow_self_connections=False),
+    PCL_PCL_inh_conn = sim.Projection(PCLayer, PCLayer, utils.get_recurrent_connector(sim, PCConnectivity),
                                    synapse_type=sim.StaticSynapse(weight=synParameters["PCL-PCL-inh"]["initWeight"],
                                                                   delay=synParameters["PCL-PCL-inh"]["delay"]),
                                    receptor_type=synParameters["PCL-PCL-inh"]["receptor_type"])
@@ -118,41 +168,102 @@ def main():
     ######################################
     # Parameters to store
     ######################################
-    PCLayer.record(["spikes", "v"])
+    PCLayer.record(["spikes"])
+    PCLayer.record(["v"], **utils.get_record_options(recordPolicies["PCLayer"]))
 
-    ######################################
-    # Execute the simulation
-    ######################################
+    return {"DGLayer": DGLayer, "PCLayer": PCLayer, "DGL_PCL_conn": DGL_PCL_conn, "PCL_PCL_conn": PCL_PCL_conn,
+            "PCL_PCL_inh_conn": PCL_PCL_inh_conn}
+
+
+def run_network(sim, network, params=None):
+    """
+    Execute the simulation of the network
+
+    :param sim: simulator used to build the network
+    :param network: dict with the populations and projections of the network
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    :return: list with the PCL-PCL weights of each time step (only instant 0 if reconstructWeight) if recordWeight is
+             True or None in other case
+    """
+    params = utils.get_model_parameters(globals(), params)
+    simulationParameters, recordWeight = params["simulationParameters"], params["recordWeight"]
+    reconstructWeight = params["reconstructWeight"]
+
+    w_PCL_PCL = None
+    # To store the weight: only the initial weight, the rest is rebuilt from the PC spikes in create_data_out
+    if recordWeight and reconstructWeight:
+        instrumentation.start_phase("get_weight")
+        w_PCL_PCL = [network["PCL_PCL_conn"].get('weight', format='list', with_address=True)]
+        instrumentation.start_phase("run")
+        sim.run(simulationParameters["simTime"])
     # To store the weight
-    if recordWeight:
+    elif recordWeight:
         w_PCL_PCL = []
-        w_PCL_PCL.append(PCL_PCL_conn.get('weight', format='list', with_address=True))  # Instante 0
+        instrumentation.start_phase("get_weight")
+        w_PCL_PCL.append(network["PCL_PCL_conn"].get('weight', format='list', with_address=True))  # Instante 0
         for n in range(0, int(simulationParameters["simTime"]), int(simulationParameters["timeStep"])):
+            instrumentation.start_phase("run")
             sim.run(simulationParameters["timeStep"])
-            w_PCL_PCL.append(PCL_PCL_conn.get('weight', format='list', with_address=True))
+            instrumentation.start_phase("get_weight")
+            w_PCL_PCL.append(network["PCL_PCL_conn"].get('weight', format='list', with_address=True))
     else:
+        instrumentation.start_phase("run")
         sim.run(simulationParameters["simTime"])
+    return w_PCL_PCL
 
-    ######################################
-    # Retrieve output data
-    ######################################
-    PCData = PCLayer.get_data(variables=["spikes", "v"])
-    spikesPC = PCData.segments[0].spiketrains
-    vPC = PCData.segments[0].filter(name='v')[0]
 
-    ######################################
-    # End simulation
-    ######################################
-    sim.end()
+def create_data_header(params=None):
+    """
+    Create the dictionary with the headers of the data of a simulation (parameters of the network) without variables
+
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    """
+    params = utils.get_model_parameters(globals(), params)
+    simulationParameters, synParameters = params["simulationParameters"], params["synParameters"]
+    neuronParameters, initNeuronParameters = params["neuronParameters"], params["initNeuronParameters"]
+    PCConnectivity = params["PCConnectivity"]
+
+    return {"scriptName": simulationParameters["filename"], "timeStep": simulationParameters["timeStep"],
+            "simTime": simulationParameters["simTime"], "synParameters": synParameters,
+            "neuronParameters": neuronParameters, "initNeuronParameters": initNeuronParameters,
+            "PCConnectivity": PCConnectivity, "variables": []}
+
+
+def create_data_out(PCSegment, w_PCL_PCL, DGLSpikes, params=None):
+    """
+    Format the data retrieved from a simulation and create the dictionary with all the information and headers
+
+    :param PCSegment: neo segment with the spikes and v recorded from PC
+    :param w_PCL_PCL: list with the PCL-PCL weights of each time step (only instant 0 if reconstructWeight) or None if
+                      not recorded
+    :param DGLSpikes: input spikes of DG
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    :return: dictionary with the data of the simulation
+    """
+    params = utils.get_model_parameters(globals(), params)
+    simulationParameters, popNeurons = params["simulationParameters"], params["popNeurons"]
+    synParameters, reconstructWeight = params["synParameters"], params["reconstructWeight"]
+    fixedPoint, recordPolicies = params["fixedPoint"], params["recordPolicies"]
+
+    spikesPC = PCSegment.spiketrains
+    vPC = PCSegment.filter(name='v')[0]
+
+    # Rebuild the weight of each time step from the PC spikes and the initial weight
+    if w_PCL_PCL is not None and reconstructWeight:
+        w_PCL_PCL = stdp.reconstruct_weight_stream(spikesPC, spikesPC, w_PCL_PCL[0], synParameters["PCL-PCL"],
+                                                   simulationParameters["simTime"], simulationParameters["timeStep"],
+                                                   fixedPoint)
 
-    ######################################
-    # Processing and store the output data
-    ######################################
     # Format the retrieve data
     formatVPC = utils.format_neo_data("v", vPC)
-    formatSpikesPC = utils.format_neo_data("spikes", spikesPC)
-    if recordWeight:
-        formatWeightPCL_PCL = utils.format_neo_data("weights", w_PCL_PCL, {"simTime": simulationParameters["simTime"], "timeStep": simulationParameters["timeStep"]})
+    formatSpikesPC = utils.format_neo_data("spikes", spikesPC, {"timeStep": simulationParameters["timeStep"]})
+    formatDGLSpikes = spikes.SpikeTrains.from_times(DGLSpikes, simulationParameters["timeStep"], popNeurons["DGLayer"])
+    if w_PCL_PCL is not None:
+        formatWeightPCL_PCL = utils.format_neo_data("weights", w_PCL_PCL, {"simTime": simulationParameters["simTime"], "timeStep": simulationParameters["timeStep"],
+                                                                          "numSrc": popNeurons["PCLayer"], "numDst": popNeurons["PCLayer"]})
 
     # Show some of the data
     # print("V PCLayer = " + str(formatVPC))
@@ -161,26 +272,220 @@ def main():
     # print("Spikes DGL = " + str(DGLSpikes))
 
     # Create a dictionary with all the information and headers
-    dataOut = {"scriptName": simulationParameters["filename"], "timeStep": simulationParameters["timeStep"],
-               "simTime": simulationParameters["simTime"], "synParameters": synParameters,
-               "neuronParameters": neuronParameters, "initNeuronParameters": initNeuronParameters, "variables": []}
+    dataOut = create_data_header(params)
     dataOut["variables"].append(
         {"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": popNeurons["PCLayer"],
          "data": formatSpikesPC})
     dataOut["variables"].append(
         {"type": "v", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": popNeurons["PCLayer"],
-         "data": formatVPC})
-    if recordWeight:
+         "data": formatVPC, **utils.get_record_fields(recordPolicies["PCLayer"], simulationParameters["timeStep"])})
+    if w_PCL_PCL is not None:
         dataOut["variables"].append({"type": "w", "popName": "DGL-PCL", "popNameShort": "PCL-PCL", "data": formatWeightPCL_PCL})
     dataOut["variables"].append(
         {"type": "spikes", "popName": "DG Layer", "popNameShort": "DGL", "numNeurons": popNeurons["DGLayer"],
-         "data": DGLSpikes})
+         "data": formatDGLSpikes})
+    return dataOut
+
+
+def main():
+    instrumentation.enable(recordPhases)
+    # Long simulations: run in segments and store the data while simulating
+    if streamSegment or attractorDetection:
+        return main_stream()
+
+    ######################################
+    # Simulation parameters
+    ######################################
+    instrumentation.start_phase("setup")
+    sim.setup(timestep=simulationParameters["timeStep"], **utils.get_setup_options(sim, eventDriven, fixedPoint))
+
+    ######################################
+    # Create the network and execute the simulation
+    ######################################
+    network = build_network(sim, DGLSpikes)
+    w_PCL_PCL = run_network(sim, network)
+
+    ######################################
+    # Retrieve output data
+    ######################################
+    instrumentation.start_phase("get_data")
+    PCData = network["PCLayer"].get_data(variables=["spikes", "v"])
+
+    ######################################
+    # End simulation
+    ######################################
+    sim.end()
+
+    ######################################
+    # Processing and store the output data
+    ######################################
+    instrumentation.start_phase("format")
+    dataOut = create_data_out(PCData.segments[0], w_PCL_PCL, DGLSpikes)
 
     # Store the data in a file
+    instrumentation.start_phase("write")
     fullPath, filename = utils.write_file("data/", simulationParameters["filename"], dataOut)
     print("Data stored in: " + fullPath)
+    report_phases(fullPath)
     return fullPath, filename
 
 
+def report_phases(fullPath):
+    """
+    Store the measures of the phases of the execution next to the data file (if recordPhases)
+
+    :param fullPath: full path to the data file of the simulation
+    """
+    reportPath = instrumentation.write_report(fullPath)
+    if reportPath:
+        print("Phases stored in: " + reportPath)
+
+
+def append_weight(writer, network, timeStamp):
+    """
+    Append the current PCL-PCL weights to the weight history of a streaming simulation
+
+    :param writer: utils.DataStreamWriter of the data file
+    :param network: dict with the populations and projections of the network
+    :param timeStamp: current time of the simulation (ms)
+    """
+    instrumentation.start_phase("get_weight")
+    w_PCL_PCL = network["PCL_PCL_conn"].get('weight', format='list', with_address=True)
+    writer.append({"type": "w", "popName": "DGL-PCL", "popNameShort": "PCL-PCL",
+                   "data": utils.format_weight_snapshot(w_PCL_PCL, timeStamp, popNeurons["PCLayer"],
+                                                        popNeurons["PCLayer"])}, utils.WEIGHT_FIXED_COLUMNS)
+
+
+def main_stream():
+    """
+    Execute the simulation in segments of streamSegment ms, appending the spikes and v of PC (and the PCL-PCL weights
+    at the end of each segment if recordWeight) to the data file after each segment, so the memory does not grow with
+    simTime. With attractorDetection, the simulation stops at the end of the segment where a periodic attractor is
+    detected
+
+    :return: full path to the file created, name of the file created
+    """
+    instrumentation.start_phase("setup")
+    sim.setup(timestep=simulationParameters["timeStep"], **utils.get_setup_options(sim, eventDriven, fixedPoint))
+    network = build_network(sim, DGLSpikes)
+    instrumentation.start_phase("write")
+    writer = utils.DataStreamWriter("data/", simulationParameters["filename"], create_data_header())
+    if recordWeight:
+        append_weight(writer, network, 0.0)
+    detector = create_period_detector()
+    segmentTime = streamSegment or attractorDetection["segment"]
+    segmentStart = 0.0
+    for segmentEnd in utils.run_segments(sim, simulationParameters["simTime"], segmentTime):
+        instrumentation.start_phase("get_data")
+        PCSegment = network["PCLayer"].get_data(variables=["spikes", "v"], clear=True).segments[0]
+        instrumentation.start_phase("write")
+        formatSpikesPC = utils.format_neo_data("spikes", PCSegment.spiketrains,
+                                               {"timeStep": simulationParameters["timeStep"]})
+        formatVPC = utils.format_neo_data("v", PCSegment.filter(name='v')[0])
+        writer.append({"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL",
+                       "numNeurons": popNeurons["PCLayer"], "data": formatSpikesPC})
+        writer.append({"type": "v", "popName": "PC Layer", "popNameShort": "PCL",
+                       "numNeurons": popNeurons["PCLayer"], "data": formatVPC,
+                       **utils.get_record_fields(recordPolicies["PCLayer"], simulationParameters["timeStep"])})
+        if recordWeight:
+            append_weight(writer, network, segmentEnd)
+        if detector is not None and update_period_detector(detector, formatSpikesPC, formatVPC, segmentStart,
+                                                           segmentEnd):
+            # Periodic attractor: the rest of the simulation would repeat the cycle
+            writer.meta["simTime"] = segmentEnd
+            writer.meta["attractor"] = detector.cycle
+            print("Periodic attractor of {period}ms detected at {detectedTime}ms, assembly: {assembly}".format(
+                **detector.cycle))
+            break
+        segmentStart = segmentEnd
+    instrumentation.start_phase("write")
+    sim.end()
+    formatDGLSpikes = spikes.SpikeTrains.from_times(DGLSpikes, simulationParameters["timeStep"], popNeurons["DGLayer"])
+    writer.add({"type": "spikes", "popName": "DG Layer", "popNameShort": "DGL", "numNeurons": popNeurons["DGLayer"],
+                "data": formatDGLSpikes})
+
+    # Store the data in a file
+    fullPath, filename = writer.close()
+    print("Data stored in: " + fullPath)
+    report_phases(fullPath)
+    return fullPath, filename
+
+
+def create_period_detector():
+    """
+    Detector of periodic attractors of the PC activity after the last DG input (None if not attractorDetection)
+
+    :return: attractor.PeriodDetector or None
+    """
+    if not attractorDetection:
+        return None
+    timeStep = simulationParameters["timeStep"]
+    lastInput = max([time for times in DGLSpikes for time in times], default=0.0)
+    # The input arrives to PC after the delay of the DGL-PCL synapses
+    startTick = int(round((lastInput + synParameters["DGL-PCL"]["delay"]) / timeStep)) + 1
+    return attractor.PeriodDetector(startTick, timeStep, attractorDetection.get("vQuantum", 0.01),
+                                    attractorDetection.get("maxPeriod", 100.0))
+
+
+def update_period_detector(detector, formatSpikesPC, formatVPC, segmentStart, segmentEnd):
+    """
+    Add the PC activity of a segment to the detector of periodic attractors. v is part of the state only if it is
+    recorded from all the neurons every time step (see recordPolicies)
+
+    :param detector: attractor.PeriodDetector
+    :param formatSpikesPC: spikes of PC in the segment (spikes.SpikeTrains)
+    :param formatVPC: matrix (neuron, time stamp) of v of PC in the segment
+    :param segmentStart: time at the beginning of the segment (ms)
+    :param segmentEnd: time at the end of the segment (ms)
+    :return: True if a periodic attractor has been detected
+    """
+    timeStep = simulationParameters["timeStep"]
+    firstTick = int(round(segmentStart / timeStep))
+    numTicks = int(round(segmentEnd / timeStep)) - firstTick
+    spikeMatrix = formatSpikesPC.to_matrix(numTicks, firstTick)
+    policy = utils.get_record_policy(recordPolicies["PCLayer"])
+    fullV = policy["neurons"] is None and policy["samplingInterval"] in (None, timeStep)
+    vMatrix = np.asarray(formatVPC).T if fullV and np.shape(formatVPC)[1:] == (numTicks,) else None
+    return detector.update(spikeMatrix, vMatrix, firstTick) is not None
+
+
+def main_batch(DGLSpikesBatch, store=False, params=None):
+    """
+    Execute several independent trials of the network, each one with its own input spikes, in a single vectorized
+    simulation with the NumPy backend
+
+    :param DGLSpikesBatch: list with the input spikes of DG of each trial
+    :param store: if store the data of each trial in a file
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    :return: list with the dataOut of each trial and list with (full path, filename) of each file stored if store or
+             Raise an error if streamSegment or attractorDetection is set (only supported by main_stream)
+    """
+    import sim_numpy
+
+    params = utils.get_model_parameters(globals(), params)
+    if params["streamSegment"] or params["attractorDetection"]:
+        raise ValueError("The batch mode does not support streamSegment nor attractorDetection")
+    simulationParameters, eventDriven = params["simulationParameters"], params["eventDriven"]
+    fixedPoint = params["fixedPoint"]
+    sim_numpy.setup(timestep=simulationParameters["timeStep"], batch_size=len(DGLSpikesBatch),
+                    event_driven=eventDriven, fixed_point=fixedPoint)
+    network = build_network(sim_numpy, sim_numpy.PerTrial(DGLSpikesBatch), params)
+    w_PCL_PCL = run_network(sim_numpy, network, params)
+    PCData = network["PCLayer"].get_data(variables=["spikes", "v"])
+    sim_numpy.end()
+
+    dataOutBatch, files = [], []
+    for trial, DGLSpikesTrial in enumerate(DGLSpikesBatch):
+        wTrial = None
+        if w_PCL_PCL is not None:
+            wTrial = [step[trial] if len(DGLSpikesBatch) > 1 else step for step in w_PCL_PCL]
+        dataOut = create_data_out(PCData.segments[trial], wTrial, DGLSpikesTrial, params)
+        dataOutBatch.append(dataOut)
+        if store:
+            files.append(utils.write_file("data/", simulationParameters["filename"] + "_trial" + str(trial), dataOut))
+    return dataOutBatch, files
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
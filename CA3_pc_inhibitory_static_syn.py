@@ -1,7 +1,13 @@
 
 # import pyNN.spiNNaker as sim
-import spynnaker8 as sim
+try:
+    import spynnaker8 as sim
+except ImportError:
+    # Local NumPy reference backend when the SpiNNaker toolchain is not available
+    import sim_numpy as sim
 import utils
+import spikes
+import instrumentation
 
 """
 Regulated CA3 static network (weights from dinamic network)
@@ -15,6 +21,24 @@ simulationParameters = {"simTime": 55, "timeStep": 1.0, "filename": "CA3_pc_inhi
 networkSize = 15
 popNeurons = {"DGLayer": networkSize, "PCLayer": networkSize, "INHLayer": networkSize, "LEARNING": 1}
 
+# + Connectivity of the recurrent inhibitory PC-PC synapses (the excitatory ones are taken from the training):
+#   all-to-all or sparse to reach large network sizes without N^2 synapses, as {"type": "fixed-probability",
+#   "p_connect": 0.1, "seed": 1} or {"type": "fixed-in-degree", "n": 100, "seed": 1}
+PCConnectivity = {"type": "all-to-all"}
+
+# + Duration (ms) of the segments of a streaming simulation, None to run it at once (see the options in utils.py)
+streamSegment = None
+
+# + Event-driven simulation with the NumPy backend (see the options in utils.py)
+eventDriven = False
+
+# + If measure the phases of the execution (see the options in utils.py)
+recordPhases = False
+
+# + Recording of v of each population (see the options in utils.py)
+recordPolicies = {"PCLayer": {"neurons": None, "samplingInterval": None, "dtype": "float64", "delta": False},
+                  "INHLayer": {"neurons": None, "samplingInterval": None, "dtype": "float64", "delta": False}}
+
 # + Input spikes
 # 2 non-orthogonal patterns
 DGLSpikes = [[1,4]]
@@ -48,7 +72,8 @@ initNeuronParameters = {
     "LEARNING": {"vInit": False}
 }
 
-# + Synapses parameters (weight in nA): path to the data file with trained network
+# + Synapses parameters (weight in nA): path to the data file with trained network (or the data of the training in
+#   memory, see pipeline.py)
 w_path = "data/CA3_pc_inhibitory_2022_01_25__11_38_12.txt"
 synParameters = {
     "DGL-PCL": {"initWeight": 12.0, "delay": 1.0, "receptor_type": "excitatory"},
@@ -61,16 +86,29 @@ synParameters = {
 }
 
 
-def main():
+def build_network(sim, DGLSpikes, LEARNINGSpikes, trainedWeights=None, params=None):
+    """
+    Create the populations and synapses of the network and set the variables to record
 
-    ######################################
-    # Simulation parameters
-    ######################################
-    sim.setup(timestep=simulationParameters["timeStep"])
+    :param sim: simulator used to build the network (spynnaker8 or sim_numpy)
+    :param DGLSpikes: input spikes of DG (a sim.PerTrial with the input spikes of each trial in batch mode)
+    :param LEARNINGSpikes: input spikes of LEARNING (a sim.PerTrial in batch mode)
+    :param trainedWeights: (optional) trained PCL-PCL weights: full path to the data file of a training or its data in
+                           memory (see pipeline.trained_weights), by default synParameters["PCL-PCL-origin"]
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    :return: dict with the populations and projections of the network and the synParameters of the trained PCL-PCL
+             synapses ("PCL_PCL_params")
+    """
+    params = utils.get_model_parameters(globals(), params)
+    popNeurons, neuronParameters = params["popNeurons"], params["neuronParameters"]
+    initNeuronParameters, synParameters = params["initNeuronParameters"], params["synParameters"]
+    PCConnectivity, recordPolicies = params["PCConnectivity"], params["recordPolicies"]
 
     ######################################
     # Create neuron population
     ######################################
+    instrumentation.start_phase("populations")
     # DG
     DGLayer = sim.Population(popNeurons["DGLayer"], sim.SpikeSourceArray(spike_times=DGLSpikes), label="DGLayer")
     # PC
@@ -86,7 +124,7 @@ def main():
     ######################################
     # Create synapses
     ######################################
-
+    instrumentation.start_phase("projections")
     # DG-PC
     DGL_PCL_conn = sim.Projection(DGLayer, PCLayer, sim.OneToOneConnector(),
                                   synapse_type=sim.StaticSynapse(weight=synParameters["DGL-PCL"]["initWeight"],
@@ -94,17 +132,16 @@ def main():
                                   receptor_type=synParameters["DGL-PCL"]["receptor_type"])
 
     # PC-PC: statics
-    # + Take weight from last iteration
-    synapsePCL_PCL, synParametersOrigin = utils.get_last_stamp_synapse_list(synParameters["PCL-PCL-origin"]["initWeight"])
+    # + Take weight from last iteration (array of (src, dst, w, delay))
+    if trainedWeights is None:
+        trainedWeights = synParameters["PCL-PCL-origin"]["initWeight"]
+    synapsePCL_PCL, synParametersOrigin = utils.get_last_stamp_synapse_list(trainedWeights)
 
     PCL_PCL_conn = sim.Projection(PCLayer, PCLayer, sim.FromListConnector(synapsePCL_PCL),
                                   synapse_type=sim.StaticSynapse(), receptor_type="excitatory")
 
-    # + Assign to synapses
-    synParameters["PCL-PCL"] = synParametersOrigin
-
     # PCL-PCL-inh
-    PCL_PCL_inh_conn = sim.Projection(PCLayer, PCLayer, sim.AllToAllConnector(allow_self_connections=False),
+    PCL_PCL_inh_conn = sim.Projection(PCLayer, PCLayer, utils.get_recurrent_connector(sim, PCConnectivity),
                                       synapse_type=sim.StaticSynapse(weight=synParameters["PCL-PCL-inh"]["initWeight"],
                                                                      delay=synParameters["PCL-PCL-inh"]["delay"]),
                                       receptor_type=synParameters["PCL-PCL-inh"]["receptor_type"])
@@ -131,37 +168,87 @@ def main():
     ######################################
     # Parameters to store
     ######################################
-    PCLayer.record(["spikes", "v"])
-    INHLayer.record(["spikes", "v"])
+    PCLayer.record(["spikes"])
+    PCLayer.record(["v"], **utils.get_record_options(recordPolicies["PCLayer"]))
+    INHLayer.record(["spikes"])
+    INHLayer.record(["v"], **utils.get_record_options(recordPolicies["INHLayer"]))
 
-    ######################################
-    # Execute the simulation
-    ######################################
-    sim.run(simulationParameters["simTime"])
-    
-    ######################################
-    # Retrieve output data
-    ######################################
-    PCData = PCLayer.get_data(variables=["spikes", "v"])
-    INHData = INHLayer.get_data(variables=["spikes", "v"])
-    spikesPC = PCData.segments[0].spiketrains
-    vPC = PCData.segments[0].filter(name='v')[0]
-    spikesINH = INHData.segments[0].spiketrains
-    vINH = INHData.segments[0].filter(name='v')[0]
+    return {"DGLayer": DGLayer, "PCLayer": PCLayer, "LEARNING": LEARNING, "INHLayer": INHLayer,
+            "DGL_PCL_conn": DGL_PCL_conn, "PCL_PCL_conn": PCL_PCL_conn, "PCL_PCL_inh_conn": PCL_PCL_inh_conn,
+            "LEARNING_INHL_conn": LEARNING_INHL_conn, "DGL_INHL_conn": DGL_INHL_conn, "INHL_PCL_conn": INHL_PCL_conn,
+            "PCL_PCL_params": synParametersOrigin}
 
-    ######################################
-    # End simulation
-    ######################################
-    sim.end()
 
-    ######################################
-    # Processing and store the output data
-    ######################################
+def weights_tag(trainedWeights):
+    """
+    Reference to the trained weights stored in the header of the data: the path to the data file of the training or the
+    tag of the weights passed in memory (the weights themselves are not stored)
+    """
+    if isinstance(trainedWeights, str):
+        return trainedWeights
+    return trainedWeights.get("tag", "in memory")
+
+
+def create_data_header(trainedWeights=None, trainedParameters=None, params=None):
+    """
+    Create the dictionary with the headers of the data of a simulation (parameters of the network) without variables.
+    The synParameters of the module are not modified: the ones of the trained PCL-PCL synapses are only stored in the
+    header
+
+    :param trainedWeights: (optional) trained PCL-PCL weights used instead of synParameters["PCL-PCL-origin"]
+    :param trainedParameters: (optional) synParameters of the trained PCL-PCL synapses (see build_network)
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    """
+    params = utils.get_model_parameters(globals(), params)
+    simulationParameters, synParameters = params["simulationParameters"], params["synParameters"]
+    neuronParameters, initNeuronParameters = params["neuronParameters"], params["initNeuronParameters"]
+    PCConnectivity = params["PCConnectivity"]
+
+    headerSynParameters = dict(synParameters)
+    if trainedParameters is not None:
+        headerSynParameters["PCL-PCL"] = trainedParameters
+    if trainedWeights is not None:
+        headerSynParameters["PCL-PCL-origin"] = dict(synParameters["PCL-PCL-origin"],
+                                                     initWeight=weights_tag(trainedWeights))
+    return {"scriptName": simulationParameters["filename"], "timeStep": simulationParameters["timeStep"],
+            "simTime": simulationParameters["simTime"], "synParameters": headerSynParameters,
+            "neuronParameters": neuronParameters, "initNeuronParameters": initNeuronParameters,
+            "PCConnectivity": PCConnectivity, "variables": []}
+
+
+def create_data_out(PCSegment, INHSegment, DGLSpikes, LEARNINGSpikes, trainedWeights=None, trainedParameters=None,
+                    params=None):
+    """
+    Format the data retrieved from a simulation and create the dictionary with all the information and headers
+
+    :param PCSegment: neo segment with the spikes and v recorded from PC
+    :param INHSegment: neo segment with the spikes and v recorded from INH
+    :param DGLSpikes: input spikes of DG
+    :param LEARNINGSpikes: input spikes of LEARNING
+    :param trainedWeights: (optional) trained PCL-PCL weights used instead of synParameters["PCL-PCL-origin"]
+    :param trainedParameters: (optional) synParameters of the trained PCL-PCL synapses (see build_network)
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    :return: dictionary with the data of the simulation
+    """
+    params = utils.get_model_parameters(globals(), params)
+    simulationParameters, popNeurons = params["simulationParameters"], params["popNeurons"]
+    recordPolicies = params["recordPolicies"]
+
+    spikesPC = PCSegment.spiketrains
+    vPC = PCSegment.filter(name='v')[0]
+    spikesINH = INHSegment.spiketrains
+    vINH = INHSegment.filter(name='v')[0]
+
     # Format the retrieve data
     formatVPC = utils.format_neo_data("v", vPC)
-    formatSpikesPC = utils.format_neo_data("spikes", spikesPC)
+    formatSpikesPC = utils.format_neo_data("spikes", spikesPC, {"timeStep": simulationParameters["timeStep"]})
+    formatDGLSpikes = spikes.SpikeTrains.from_times(DGLSpikes, simulationParameters["timeStep"], popNeurons["DGLayer"])
+    formatLEARNINGSpikes = spikes.SpikeTrains.from_times(LEARNINGSpikes, simulationParameters["timeStep"],
+                                                         popNeurons["LEARNING"])
     formatVINH = utils.format_neo_data("v", vINH)
-    formatSpikesINH = utils.format_neo_data("spikes", spikesINH)
+    formatSpikesINH = utils.format_neo_data("spikes", spikesINH, {"timeStep": simulationParameters["timeStep"]})
 
     # Show some of the data
     # print("V PCLayer = " + str(formatVPC))
@@ -172,34 +259,199 @@ def main():
     # print("Spikes LEARNING = " + str(LEARNINGSpikes))
 
     # Create a dictionary with all the information and headers
-    dataOut = {"scriptName": simulationParameters["filename"], "timeStep": simulationParameters["timeStep"],
-               "simTime": simulationParameters["simTime"], "synParameters": synParameters,
-               "neuronParameters": neuronParameters, "initNeuronParameters": initNeuronParameters, "variables": []}
+    dataOut = create_data_header(trainedWeights, trainedParameters, params)
     dataOut["variables"].append(
         {"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": popNeurons["PCLayer"],
          "data": formatSpikesPC})
     dataOut["variables"].append(
         {"type": "v", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": popNeurons["PCLayer"],
-         "data": formatVPC})
+         "data": formatVPC, **utils.get_record_fields(recordPolicies["PCLayer"], simulationParameters["timeStep"])})
     dataOut["variables"].append(
         {"type": "spikes", "popName": "INH Layer", "popNameShort": "INHL", "numNeurons": popNeurons["INHLayer"],
          "data": formatSpikesINH})
     dataOut["variables"].append(
         {"type": "v", "popName": "INH Layer", "popNameShort": "INHL", "numNeurons": popNeurons["INHLayer"],
-         "data": formatVINH})
+         "data": formatVINH, **utils.get_record_fields(recordPolicies["INHLayer"], simulationParameters["timeStep"])})
     dataOut["variables"].append(
         {"type": "spikes", "popName": "DG Layer", "popNameShort": "DGL", "numNeurons": popNeurons["DGLayer"],
-         "data": DGLSpikes})
+         "data": formatDGLSpikes})
     dataOut["variables"].append(
         {"type": "spikes", "popName": "LEARNING Layer", "popNameShort": "LEARNING",
          "numNeurons": popNeurons["LEARNING"],
-         "data": LEARNINGSpikes})
+         "data": formatLEARNINGSpikes})
+    return dataOut
+
+
+def simulate(trainedWeights=None, params=None):
+    """
+    Execute the simulation of the network and return its data without storing it
+
+    :param trainedWeights: (optional) trained PCL-PCL weights: full path to the data file of a training or its data in
+                           memory (see pipeline.trained_weights), by default synParameters["PCL-PCL-origin"]
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    :return: dictionary with the data of the simulation (dataOut)
+    """
+    params = utils.get_model_parameters(globals(), params)
+    simulationParameters, eventDriven = params["simulationParameters"], params["eventDriven"]
+    DGLSpikes, LEARNINGSpikes = params["DGLSpikes"], params["LEARNINGSpikes"]
+
+    ######################################
+    # Simulation parameters
+    ######################################
+    instrumentation.start_phase("setup")
+    sim.setup(timestep=simulationParameters["timeStep"], **utils.get_setup_options(sim, eventDriven))
+
+    ######################################
+    # Create the network and execute the simulation
+    ######################################
+    network = build_network(sim, DGLSpikes, LEARNINGSpikes, trainedWeights, params)
+    instrumentation.start_phase("run")
+    sim.run(simulationParameters["simTime"])
+
+    ######################################
+    # Retrieve output data
+    ######################################
+    instrumentation.start_phase("get_data")
+    PCData = network["PCLayer"].get_data(variables=["spikes", "v"])
+    INHData = network["INHLayer"].get_data(variables=["spikes", "v"])
+
+    ######################################
+    # End simulation
+    ######################################
+    sim.end()
+
+    ######################################
+    # Processing the output data
+    ######################################
+    instrumentation.start_phase("format")
+    dataOut = create_data_out(PCData.segments[0], INHData.segments[0], DGLSpikes, LEARNINGSpikes, trainedWeights,
+                              network["PCL_PCL_params"], params)
+    return dataOut
+
+
+def main(trainedWeights=None):
+    """
+    Execute the simulation of the network and store its data in a file
+
+    :param trainedWeights: (optional) trained PCL-PCL weights (see simulate)
+    :return: full path to the file created, name of the file created
+    """
+    instrumentation.enable(recordPhases)
+    # Long simulations: run in segments and store the data while simulating
+    if streamSegment:
+        return main_stream(trainedWeights)
+
+    dataOut = simulate(trainedWeights)
 
     # Store the data in a file
+    instrumentation.start_phase("write")
     fullPath, filename = utils.write_file("data/", simulationParameters["filename"], dataOut)
     print("Datos almacenados en: " + fullPath)
+    report_phases(fullPath)
+    return fullPath, filename
+
+
+def report_phases(fullPath):
+    """
+    Store the measures of the phases of the execution next to the data file (if recordPhases)
+
+    :param fullPath: full path to the data file of the simulation
+    """
+    reportPath = instrumentation.write_report(fullPath)
+    if reportPath:
+        print("Phases stored in: " + reportPath)
+
+
+def main_stream(trainedWeights=None):
+    """
+    Execute the simulation in segments of streamSegment ms, appending the spikes and v of PC and INH to the data file
+    after each segment, so the memory does not grow with simTime
+
+    :param trainedWeights: (optional) trained PCL-PCL weights (see simulate)
+    :return: full path to the file created, name of the file created
+    """
+    instrumentation.start_phase("setup")
+    sim.setup(timestep=simulationParameters["timeStep"], **utils.get_setup_options(sim, eventDriven))
+    network = build_network(sim, DGLSpikes, LEARNINGSpikes, trainedWeights)
+    instrumentation.start_phase("write")
+    writer = utils.DataStreamWriter("data/", simulationParameters["filename"],
+                                    create_data_header(trainedWeights, network["PCL_PCL_params"]))
+    for segmentEnd in utils.run_segments(sim, simulationParameters["simTime"], streamSegment):
+        instrumentation.start_phase("get_data")
+        PCSegment = network["PCLayer"].get_data(variables=["spikes", "v"], clear=True).segments[0]
+        INHSegment = network["INHLayer"].get_data(variables=["spikes", "v"], clear=True).segments[0]
+        instrumentation.start_phase("write")
+        writer.append({"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL",
+                       "numNeurons": popNeurons["PCLayer"],
+                       "data": utils.format_neo_data("spikes", PCSegment.spiketrains,
+                                                     {"timeStep": simulationParameters["timeStep"]})})
+        writer.append({"type": "v", "popName": "PC Layer", "popNameShort": "PCL",
+                       "numNeurons": popNeurons["PCLayer"],
+                       "data": utils.format_neo_data("v", PCSegment.filter(name='v')[0]),
+                       **utils.get_record_fields(recordPolicies["PCLayer"], simulationParameters["timeStep"])})
+        writer.append({"type": "spikes", "popName": "INH Layer", "popNameShort": "INHL",
+                       "numNeurons": popNeurons["INHLayer"],
+                       "data": utils.format_neo_data("spikes", INHSegment.spiketrains,
+                                                     {"timeStep": simulationParameters["timeStep"]})})
+        writer.append({"type": "v", "popName": "INH Layer", "popNameShort": "INHL",
+                       "numNeurons": popNeurons["INHLayer"],
+                       "data": utils.format_neo_data("v", INHSegment.filter(name='v')[0]),
+                       **utils.get_record_fields(recordPolicies["INHLayer"], simulationParameters["timeStep"])})
+    instrumentation.start_phase("write")
+    sim.end()
+    formatDGLSpikes = spikes.SpikeTrains.from_times(DGLSpikes, simulationParameters["timeStep"], popNeurons["DGLayer"])
+    formatLEARNINGSpikes = spikes.SpikeTrains.from_times(LEARNINGSpikes, simulationParameters["timeStep"],
+                                                         popNeurons["LEARNING"])
+    writer.add({"type": "spikes", "popName": "DG Layer", "popNameShort": "DGL", "numNeurons": popNeurons["DGLayer"],
+                "data": formatDGLSpikes})
+    writer.add({"type": "spikes", "popName": "LEARNING Layer", "popNameShort": "LEARNING",
+                "numNeurons": popNeurons["LEARNING"], "data": formatLEARNINGSpikes})
+
+    # Store the data in a file
+    fullPath, filename = writer.close()
+    print("Data stored in: " + fullPath)
+    report_phases(fullPath)
     return fullPath, filename
 
 
+def main_batch(DGLSpikesBatch, store=False, trainedWeights=None, params=None):
+    """
+    Execute several independent recall trials of the network, each one with its own cue spikes, in a single
+    vectorized simulation with the NumPy backend
+
+    :param DGLSpikesBatch: list with the input spikes of DG of each trial
+    :param store: if store the data of each trial in a file
+    :param trainedWeights: (optional) trained PCL-PCL weights (see simulate)
+    :param params: (optional) dict {name: value} with module-level parameters of the model used instead of the module
+                   ones (see utils.get_model_parameters)
+    :return: list with the dataOut of each trial and list with (full path, filename) of each file stored if store or
+             Raise an error if streamSegment is set (only supported by main_stream)
+    """
+    import sim_numpy
+
+    params = utils.get_model_parameters(globals(), params)
+    if params["streamSegment"]:
+        raise ValueError("The batch mode does not support streamSegment")
+    simulationParameters, eventDriven = params["simulationParameters"], params["eventDriven"]
+    LEARNINGSpikes = params["LEARNINGSpikes"]
+    sim_numpy.setup(timestep=simulationParameters["timeStep"], batch_size=len(DGLSpikesBatch),
+                    event_driven=eventDriven)
+    network = build_network(sim_numpy, sim_numpy.PerTrial(DGLSpikesBatch), LEARNINGSpikes, trainedWeights, params)
+    sim_numpy.run(simulationParameters["simTime"])
+    PCData = network["PCLayer"].get_data(variables=["spikes", "v"])
+    INHData = network["INHLayer"].get_data(variables=["spikes", "v"])
+    sim_numpy.end()
+
+    dataOutBatch, files = [], []
+    for trial, DGLSpikesTrial in enumerate(DGLSpikesBatch):
+        dataOut = create_data_out(PCData.segments[trial], INHData.segments[trial], DGLSpikesTrial, LEARNINGSpikes,
+                                  trainedWeights, network["PCL_PCL_params"], params)
+        dataOutBatch.append(dataOut)
+        if store:
+            files.append(utils.write_file("data/", simulationParameters["filename"] + "_trial" + str(trial), dataOut))
+    return dataOutBatch, files
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+"""
+Detection of the periodic attractors of the CA3 models
+
+After the last input, the activity of PC in the oscillatory model falls in a periodic attractor: the same sequence of
+states (spike vector and v of the neurons) repeats every period, so the rest of the simulation only repeats the cycle
+and it can be stopped early (see attractorDetection in CA3_oscilatory.py). The state of each time step is compared
+through its sha256 digest and only the states of the last maxPeriod time steps are kept, so the memory of the detector
+does not grow with the simulated time.
+"""
+
+import hashlib
+from collections import deque
+import numpy as np
+
+
+#####################################
+# Periodic attractors
+#####################################
+
+class PeriodDetector(object):
+    """
+    Detection of a periodic attractor from the state of PC in each time step: spike vector and v quantized to vQuantum
+    mV, compared through their sha256 digest (a collision would end the simulation early for good, so a non
+    cryptographic hash is not enough). For each period P up to maxPeriod, the number of consecutive time steps whose
+    state is the same as the one P time steps before is counted: P is reported when it reaches P, so the states of a
+    whole cycle have been confirmed by a second one. The network at rest (the same state in all the time steps) is only
+    reported, with P = 1, when v is part of the state: without it, silent time steps are equal while the neurons are
+    still integrating their inputs
+    """
+
+    def __init__(self, startTick, timeStep, vQuantum=0.01, maxPeriod=100.0):
+        """
+        :param startTick: first time step whose state is considered (after the last input has been delivered)
+        :param timeStep: time step of the simulation in ms
+        :param vQuantum: resolution (mV) of v in the state
+        :param maxPeriod: longest period (ms) detected
+        """
+        self.startTick = startTick
+        self.timeStep = timeStep
+        self.vQuantum = vQuantum
+        self.maxTicks = max(int(round(maxPeriod / timeStep)), 1)
+        self.cycle = None
+        # Ring with the digests and the ids of the PC neurons that fire of the last maxTicks time steps
+        self._digests = np.zeros((self.maxTicks, hashlib.sha256().digest_size), dtype=np.uint8)
+        self._spikeRows = deque(maxlen=self.maxTicks)
+        self._numStates = 0
+        # Number of consecutive time steps with the same state as period + 1 time steps before, for each period
+        self._matches = np.zeros(self.maxTicks, dtype=np.int64)
+        self._periods = np.arange(1, self.maxTicks + 1)
+
+    def update(self, spikeMatrix, vMatrix=None, firstTick=0):
+        """
+        Add the states of consecutive time steps and check if a period has been reached
+
+        :param spikeMatrix: bool matrix (time step, neuron) of the spikes of PC
+        :param vMatrix: (optional) matrix (time step, neuron) of v of PC (None to use only the spikes)
+        :param firstTick: time step of the first row of the matrices
+        :return: dict with the cycle (see cycle_info) when it is detected or None
+        """
+        for row in range(max(self.startTick - firstTick, 0), len(spikeMatrix)):
+            if self.cycle is not None:
+                break
+            state = np.packbits(spikeMatrix[row]).tobytes()
+            if vMatrix is not None:
+                state += np.round(np.asarray(vMatrix[row], dtype=float) / self.vQuantum).astype(np.int64).tobytes()
+            digest = np.frombuffer(hashlib.sha256(state).digest(), dtype=np.uint8)
+            position = self._numStates % self.maxTicks
+            # Period of each slot of the ring with respect to the new state (the slots not filled yet never match)
+            equal = np.all(self._digests == digest, axis=1)
+            equal[self._numStates:] = False
+            matches = np.zeros(self.maxTicks, dtype=bool)
+            matches[(position - np.nonzero(equal)[0] - 1) % self.maxTicks] = True
+            self._matches = np.where(matches, self._matches + 1, 0)
+            self._digests[position] = digest
+            self._spikeRows.append(np.nonzero(spikeMatrix[row])[0])
+            self._numStates += 1
+            confirmed = np.nonzero(self._matches >= self._periods)[0]
+            if len(confirmed) == 0:
+                continue
+            period = int(self._periods[confirmed[0]])
+            # Without v, the network at rest is not distinguished from the neurons integrating their inputs
+            if vMatrix is None and self._matches[0] >= period - 1:
+                continue
+            self.cycle = self.cycle_info(firstTick + row, period)
+        return self.cycle
+
+    def cycle_info(self, tick, period):
+        """
+        :return: dict -> {"period" (ms), "periodTicks", "detectedTime" (ms, end of the time step where it is detected),
+                 "startTime" (ms, beginning of the two cycles compared) and "assembly" (ids of the PC neurons that fire
+                 in a cycle)}
+        """
+        spikeRows = list(self._spikeRows)[-period:]
+        assembly = np.unique(np.concatenate([np.zeros(0, dtype=np.int64)] + spikeRows))
+        return {"period": period * self.timeStep, "periodTicks": period, "detectedTime": (tick + 1) * self.timeStep,
+                "startTime": (tick + 1 - 2 * period) * self.timeStep, "assembly": assembly.tolist()}
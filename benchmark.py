@@ -0,0 +1,413 @@
+"""
+Network size scaling benchmark of the CA3 models
+
+Each case builds a model (CA3_oscilatory or CA3_pc_inhibitory) with N neurons per layer and a set of generated input
+patterns, executes it and stores its data, measuring the wall-clock time of each phase (build, run, get_data, format
+and write), the peak resident memory (RSS) and the bytes written. Each case is executed in a new process, so the peak
+RSS belongs only to that case and the module-level parameters of the model start from their default values. The results
+are stored as JSON and can be compared against a baseline to detect regressions. run_record_policies compares the bytes
+written and the time to retrieve and store the data of the same case with several recording policies of v.
+run_stdp_kernel measures the STDP kernel of the PCL-PCL synapses (stdp.LookupTableSTDP) against the naive evaluation of
+all the spike pairs (stdp.reference_spike_pair_additive).
+"""
+
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import sparse
+import stdp
+import utils
+
+
+BENCHMARK_MODELS = ["CA3_oscilatory", "CA3_pc_inhibitory"]
+BENCHMARK_SIZES = [15, 50, 100, 500, 1000, 2000, 5000, 10000]
+# Connectivity of the recurrent PC-PC synapses of the cases from BENCHMARK_SPARSE_SIZE neurons (when no connectivity is
+#   given): the all-to-all synapses grow with N^2, about BYTES_PER_SYNAPSE bytes each in the NumPy backend
+BENCHMARK_SPARSE_SIZE = 5000
+BENCHMARK_SPARSE_CONNECTIVITY = {"type": "fixed-in-degree", "n": 100, "seed": 1}
+BYTES_PER_SYNAPSE = 64
+BENCHMARK_PHASES = ["build", "run", "get_data", "format", "write"]
+# Recording policies of v of PC compared by run_record_policies (see utils.DEFAULT_RECORD_POLICY): the first one is the
+#   reference (all the neurons every time step as float64)
+BENCHMARK_RECORD_POLICIES = [{}, {"dtype": "float32"}, {"dtype": "float16"}, {"dtype": "float16", "delta": True},
+                             {"samplingInterval": 10.0}, {"neurons": list(range(10)), "dtype": "float32"}]
+
+
+#####################################
+# Generation of cases
+#####################################
+
+def generate_dg_spikes(networkSize, simTime, numPatterns=2, activeRatio=0.3, period=10, burst=1, seed=0):
+    """
+    Generate the input spikes of DG for a network of any size: random patterns (a subset of neurons) presented one
+    after the other every period ms, each neuron of the pattern firing burst consecutive ms in each presentation
+
+    :param networkSize: number of neurons of DG
+    :param simTime: duration of the simulation (the last period is left without input to see the recall)
+    :param numPatterns: number of different patterns
+    :param activeRatio: fraction of the neurons of DG active in each pattern
+    :param period: time between the start of two consecutive presentations (ms)
+    :param burst: number of consecutive ms that the neurons of a pattern fire in each presentation
+    :param seed: seed of the random generator
+    :return: list with the spike times of each neuron of DG
+    """
+    generator = random.Random(seed)
+    numActive = max(1, int(round(networkSize * activeRatio)))
+    patterns = [generator.sample(range(networkSize), numActive) for _ in range(numPatterns)]
+    DGLSpikes = [[] for _ in range(networkSize)]
+    for presentation, start in enumerate(range(1, int(simTime) - period, period)):
+        for neuron in patterns[presentation % numPatterns]:
+            DGLSpikes[neuron].extend(range(start, start + burst))
+    return DGLSpikes
+
+
+def configure_model(module, networkSize, recordWeight=False, seed=0, connectivity=None, recordPolicy=None):
+    """
+    Change the module-level parameters of a model to a network of the given size with generated input patterns
+
+    :param module: module of the model
+    :param networkSize: number of neurons of each layer (DG, PC and INH)
+    :param recordWeight: if record the PCL-PCL weights (their history grows with simTime * N^2)
+    :param seed: seed of the generated patterns
+    :param connectivity: (optional) connectivity of the recurrent PC-PC synapses (see PCConnectivity of the models)
+    :param recordPolicy: (optional) recording policy of v of all the populations (see recordPolicies of the models)
+    """
+    burst = 1 if hasattr(module, "get_learning_spikes") else 5
+    module.DGLSpikes = generate_dg_spikes(networkSize, module.simulationParameters["simTime"], burst=burst, seed=seed)
+    if hasattr(module, "get_learning_spikes"):
+        module.LEARNINGSpikes = module.get_learning_spikes(module.DGLSpikes)
+    # The inhibition of PC by INH is proportional to the size of the network
+    if "INHL-PCL" in module.synParameters:
+        module.synParameters["INHL-PCL"]["initWeight"] *= networkSize / module.networkSize
+    for layer in ["DGLayer", "PCLayer", "INHLayer"]:
+        if layer in module.popNeurons:
+            module.popNeurons[layer] = networkSize
+    module.networkSize = networkSize
+    module.recordWeight = recordWeight
+    if connectivity is not None:
+        module.PCConnectivity = connectivity
+    if recordPolicy is not None:
+        module.recordPolicies = {layer: dict(recordPolicy) for layer in module.recordPolicies}
+
+
+#####################################
+# Execution of cases
+#####################################
+
+def run_case(case):
+    """
+    Execute one case of the benchmark (in a new process)
+
+    :param case: dict with "model", "networkSize", "recordWeight", "seed", "connectivity" and (optional)
+                 "recordPolicy"
+    :return: dict with the case, the time of each phase (s), the peak RSS (MB), the bytes written and the PC spikes
+    """
+    module = importlib.import_module(case["model"])
+    configure_model(module, case["networkSize"], case["recordWeight"], case["seed"], case["connectivity"],
+                    case.get("recordPolicy"))
+    regulated = hasattr(module, "get_learning_spikes")
+    sim = module.sim
+    times = {}
+
+    startTime = time.perf_counter()
+    sim.setup(timestep=module.simulationParameters["timeStep"])
+    if regulated:
+        network = module.build_network(sim, module.DGLSpikes, module.LEARNINGSpikes)
+    else:
+        network = module.build_network(sim, module.DGLSpikes)
+    times["build"] = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    w_PCL_PCL = module.run_network(sim, network)
+    times["run"] = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    PCData = network["PCLayer"].get_data(variables=["spikes", "v"])
+    if regulated:
+        wFinalPCL_PCL = network["PCL_PCL_conn"].get('weight', format='list', with_address=True)
+    sim.end()
+    times["get_data"] = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    if regulated:
+        dataOut = module.create_data_out(PCData.segments[0], w_PCL_PCL, wFinalPCL_PCL, module.DGLSpikes,
+                                         module.LEARNINGSpikes)
+    else:
+        dataOut = module.create_data_out(PCData.segments[0], w_PCL_PCL, module.DGLSpikes)
+    times["format"] = time.perf_counter() - startTime
+
+    with tempfile.TemporaryDirectory() as tmpPath:
+        startTime = time.perf_counter()
+        fullPath, _ = utils.write_file(tmpPath + "/", module.simulationParameters["filename"], dataOut)
+        times["write"] = time.perf_counter() - startTime
+        bytesWritten = os.path.getsize(fullPath)
+
+    result = dict(case)
+    result.update({"times": times, "total": sum(times.values()),
+                   "peakRSS": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+                   "bytesWritten": bytesWritten,
+                   "spikesPC": int(sum(len(spikeTrain) for spikeTrain in PCData.segments[0].spiketrains))})
+    return result
+
+
+def run_benchmark(models=None, sizes=None, recordWeight=False, seed=0, connectivity=None):
+    """
+    Execute all the cases of the benchmark one after the other, each one in a new process. A case is not executed when
+    its estimated memory (see estimate_memory) is larger than the memory available
+
+    :param models: (optional) list of names of the modules of the models (by default BENCHMARK_MODELS)
+    :param sizes: (optional) list of network sizes (by default BENCHMARK_SIZES)
+    :param recordWeight: if record the PCL-PCL weights
+    :param seed: seed of the generated patterns
+    :param connectivity: (optional) connectivity of the recurrent PC-PC synapses (by default, the one of the model up
+                         to BENCHMARK_SPARSE_SIZE neurons and BENCHMARK_SPARSE_CONNECTIVITY from that size)
+    :return: list with the result of each case ("error" instead of the measures if the case has failed or has not been
+             executed, for example because of lack of memory)
+    """
+    results = []
+    memory = available_memory()
+    for model in models or BENCHMARK_MODELS:
+        for networkSize in sizes or BENCHMARK_SIZES:
+            caseConnectivity = connectivity
+            if caseConnectivity is None and networkSize >= BENCHMARK_SPARSE_SIZE:
+                caseConnectivity = BENCHMARK_SPARSE_CONNECTIVITY
+            case = {"model": model, "networkSize": networkSize, "recordWeight": recordWeight, "seed": seed,
+                    "connectivity": caseConnectivity}
+            required = estimate_memory(case)
+            if memory is not None and required > memory:
+                result = dict(case, error="not executed, it needs about {:.0f}MB and {:.0f}MB are available".format(
+                    required / 2 ** 20, memory / 2 ** 20))
+            else:
+                result = _run_case_process(case)
+            print(format_result(result))
+            results.append(result)
+    return results
+
+
+def estimate_memory(case):
+    """
+    Rough estimate of the peak memory of a case: synapses of the recurrent PC-PC projections (STDP and inhibitory), v
+    recorded from all the neurons of each layer (kept while it is formatted) and history of the PCL-PCL weights (if
+    recordWeight)
+
+    :param case: dict with "model", "networkSize", "recordWeight" and "connectivity" (see run_case)
+    :return: estimated memory in bytes
+    """
+    module = importlib.import_module(case["model"])
+    networkSize = case["networkSize"]
+    connectivity = case["connectivity"] or module.PCConnectivity
+    if connectivity["type"] == "fixed-in-degree":
+        synapses = networkSize * min(connectivity["n"], networkSize - 1)
+    else:
+        synapses = networkSize * (networkSize - 1) * connectivity.get("p_connect", 1.0)
+    numTicks = module.simulationParameters["simTime"] / module.simulationParameters["timeStep"]
+    layers = len([layer for layer in ["DGLayer", "PCLayer", "INHLayer"] if layer in module.popNeurons])
+    memory = 2 * synapses * BYTES_PER_SYNAPSE + 2 * layers * networkSize * numTicks * 8
+    if case["recordWeight"]:
+        memory += synapses * numTicks * 8
+    return memory
+
+
+def available_memory():
+    """
+    :return: memory available in the system (bytes) or None if it is not known in this platform
+    """
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def run_record_policies(model, networkSize, policies=None, seed=0):
+    """
+    Execute the same case with several recording policies of v, each one in a new process, and report the bytes
+    written and the time to retrieve (get_data), format and write the data against the first policy
+
+    :param model: name of the module of the model
+    :param networkSize: number of neurons of each layer
+    :param policies: (optional) list of recording policies (by default BENCHMARK_RECORD_POLICIES)
+    :param seed: seed of the generated patterns
+    :return: list with the result of each policy (see run_case)
+    """
+    results = []
+    for policy in policies or BENCHMARK_RECORD_POLICIES:
+        case = {"model": model, "networkSize": networkSize, "recordWeight": False, "seed": seed, "connectivity": None,
+                "recordPolicy": policy}
+        results.append(_run_case_process(case))
+    reference = results[0]
+    for result in results:
+        text = "{:<70}".format(json.dumps(result["recordPolicy"]))
+        if "error" in result or "error" in reference:
+            print(text + " error: " + result.get("error", reference.get("error")))
+            continue
+        print(text + " written={}B ({:.1%}) get_data={:.3f}s ({:.1%}) format+write={:.3f}s".format(
+            result["bytesWritten"], result["bytesWritten"] / reference["bytesWritten"], result["times"]["get_data"],
+            result["times"]["get_data"] / max(reference["times"]["get_data"], 1e-9),
+            result["times"]["format"] + result["times"]["write"]))
+    return results
+
+
+def run_stdp_kernel(model, numNeurons, simTime=1000.0, rate=20.0, seed=0):
+    """
+    Micro-benchmark of the STDP rule of the PCL-PCL synapses of a model: all-to-all recurrent synapses with random
+    (Poisson) spikes, applied with the lookup table kernel and with the naive evaluation of all the spike pairs
+
+    :param model: name of the module of the model (its synParameters["PCL-PCL"] are used)
+    :param numNeurons: number of neurons of the population
+    :param simTime: duration of the spikes (ms)
+    :param rate: firing rate of each neuron (Hz)
+    :param seed: seed of the spikes
+    :return: dict -> {"model", "numNeurons", "synapses", "spikes", "kernelTime", "referenceTime" (s), "speedup",
+             "maxError" (maximum difference of the final weights)}
+    """
+    module = importlib.import_module(model)
+    params = module.synParameters["PCL-PCL"]
+    timeStep = module.simulationParameters["timeStep"]
+    numTicks = int(round(simTime / timeStep))
+    spikeMatrix = np.random.default_rng(seed).random((numTicks, numNeurons)) < rate * timeStep / 1000.0
+    spikeTimes = [np.nonzero(spikeMatrix[:, neuron])[0] * timeStep for neuron in range(numNeurons)]
+    src, dst = np.nonzero(~np.eye(numNeurons, dtype=bool))
+    initWeights = np.column_stack((src, dst, np.full(len(src), (params["w_min"] + params["w_max"]) / 2.0)))
+
+    startTime = time.perf_counter()
+    connectivity = sparse.Connectivity(src, dst, numNeurons, numNeurons)
+    weights = initWeights[connectivity.order, 2][None, :].copy()
+    rule = stdp.LookupTableSTDP(connectivity, 1, params, timeStep)
+    for tick in np.nonzero(spikeMatrix.any(axis=1))[0]:
+        rule.step(weights, spikeMatrix[tick][None, :], spikeMatrix[tick][None, :], tick)
+    kernelTime = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    referenceWeights = stdp.reference_spike_pair_additive(spikeTimes, spikeTimes, initWeights, params, timeStep)
+    referenceTime = time.perf_counter() - startTime
+    return {"model": model, "numNeurons": numNeurons, "synapses": len(src), "spikes": int(spikeMatrix.sum()),
+            "kernelTime": kernelTime, "referenceTime": referenceTime, "speedup": referenceTime / kernelTime,
+            "maxError": float(np.abs(weights[0] - referenceWeights[connectivity.order, 2]).max())}
+
+
+def _run_case_process(case):
+    """
+    Execute a case in a new process ("error" instead of the measures if it has failed, for example because of lack of
+    memory)
+    """
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            return executor.submit(run_case, case).result()
+    except (BrokenProcessPool, MemoryError) as error:
+        return dict(case, error=repr(error))
+
+
+#####################################
+# Results and baseline
+#####################################
+
+def format_result(result):
+    """
+    Text line with the measures of a case
+    """
+    text = "{:<18} N={:<6}".format(result["model"], result["networkSize"])
+    if "error" in result:
+        return text + " error: " + result["error"]
+    text += " ".join(" {}={:.3f}s".format(phase, result["times"][phase]) for phase in BENCHMARK_PHASES)
+    return text + "  peakRSS={:.1f}MB  written={}B".format(result["peakRSS"], result["bytesWritten"])
+
+
+def write_results(results, fullPath):
+    """
+    Store the results of a benchmark in a JSON file (it can be used later as baseline)
+
+    :param results: list with the result of each case
+    :param fullPath: path + filename of the JSON file
+    :return: full path of the file
+    """
+    with open(fullPath, "w") as file:
+        json.dump(results, file, indent=1)
+    return fullPath
+
+
+def read_results(fullPath):
+    """
+    Read the results of a benchmark from a JSON file
+    """
+    with open(fullPath) as file:
+        return json.load(file)
+
+
+def _case_key(result):
+    """
+    Key that identifies the case of a result to match it with the same case of the baseline
+    """
+    return (result["model"], result["networkSize"], result["recordWeight"],
+            json.dumps(result.get("connectivity"), sort_keys=True),
+            json.dumps(result.get("recordPolicy"), sort_keys=True))
+
+
+def compare_results(results, baseline, tolerance=0.25, minTime=0.05, minMemory=10.0):
+    """
+    Compare the results of a benchmark against a baseline
+
+    :param results: list with the result of each case
+    :param baseline: list with the result of each case of the baseline
+    :param tolerance: relative increase allowed over the baseline
+    :param minTime: absolute increase of time (s) under which a phase is not considered a regression (noise)
+    :param minMemory: absolute increase of peak RSS (MB) under which it is not considered a regression (noise)
+    :return: list of regressions (model, network size, measure, baseline value, new value)
+    """
+    baselineCases = {_case_key(result): result for result in baseline if "error" not in result}
+    regressions = []
+    for result in results:
+        base = baselineCases.get(_case_key(result))
+        if base is None or "error" in result:
+            continue
+        measures = [(phase, base["times"][phase], result["times"][phase], minTime) for phase in BENCHMARK_PHASES]
+        measures += [("total", base["total"], result["total"], minTime),
+                     ("peakRSS", base["peakRSS"], result["peakRSS"], minMemory),
+                     ("bytesWritten", base["bytesWritten"], result["bytesWritten"], 0)]
+        for measure, baseValue, newValue, minIncrease in measures:
+            if newValue > baseValue * (1.0 + tolerance) and newValue - baseValue > minIncrease:
+                regressions.append((result["model"], result["networkSize"], measure, baseValue, newValue))
+    return regressions
+
+
+if __name__ == "__main__":
+    # Benchmark parameters
+    # + Models and network sizes to measure
+    models = BENCHMARK_MODELS
+    sizes = BENCHMARK_SIZES
+    # + If record the PCL-PCL weights (their history grows with simTime * N^2)
+    recordWeight = False
+    # + Connectivity of the recurrent PC-PC synapses (None to use the one of the models, and
+    #   BENCHMARK_SPARSE_CONNECTIVITY from BENCHMARK_SPARSE_SIZE neurons), for example
+    #   {"type": "fixed-in-degree", "n": 100, "seed": 1} to measure sparse networks
+    connectivity = None
+    # + Full path to the results of a previous benchmark to compare with (None to not compare)
+    baselinePath = None
+    # + Network size at which the recording policies of v (BENCHMARK_RECORD_POLICIES) are compared (None to not compare)
+    recordPolicySize = None
+    # + Network sizes of the micro-benchmark of the STDP kernel against the naive evaluation of the spike pairs (None to
+    #   not measure it)
+    stdpKernelSizes = None
+
+    benchmarkResults = run_benchmark(models, sizes, recordWeight, connectivity=connectivity)
+    print("Benchmark stored in: " + write_results(benchmarkResults, "data/benchmark_" +
+                                                  time.strftime("%Y_%m_%d__%H_%M_%S") + ".json"))
+    if baselinePath:
+        for model, size, measure, baseValue, newValue in compare_results(benchmarkResults, read_results(baselinePath)):
+            print("Regression {} N={} {}: {:.3f} -> {:.3f}".format(model, size, measure, baseValue, newValue))
+    if recordPolicySize:
+        for model in models:
+            run_record_policies(model, recordPolicySize)
+    if stdpKernelSizes:
+        for size in stdpKernelSizes:
+            print("STDP {model} N={numNeurons} synapses={synapses} spikes={spikes}: kernel={kernelTime:.3f}s "
+                  "reference={referenceTime:.3f}s ({speedup:.1f}x) maxError={maxError:.2e}".format(
+                      **run_stdp_kernel("CA3_pc_inhibitory", size)))
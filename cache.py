@@ -0,0 +1,187 @@
+"""
+Content-addressed cache of the results of the simulations
+
+The result of a simulation (the data file written by the main function of a model) is identified by the sha256 of the
+canonical JSON of the full configuration of the model: its module-level parameters (simulationParameters,
+neuronParameters, synParameters, DGLSpikes, ...), the contents of the data files it reads (as the PCL-PCL weights of the
+static model) and the source code of the model and of the simulator. An index in the data folder maps each key to its
+data file, so an identical run returns the stored file immediately. The index is bounded by a least recently used
+eviction policy on the total size and number of files. Nothing is executed on a cache hit, so no report of the phases
+is written (see instrumentation.py): the report of the execution that created the data file is kept.
+"""
+
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import instrumentation
+import spikes
+
+
+CACHE_INDEX_FILE = "cache_index.json"
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_MAX_ENTRIES = 200
+
+# Module-level parameters of the models that define the result of a simulation
+CONFIG_NAMES = ["simulationParameters", "popNeurons", "PCConnectivity", "DGLSpikes", "LEARNINGSpikes",
+                "neuronParameters", "initNeuronParameters", "synParameters", "recordWeight", "reconstructWeight",
+                "streamSegment", "eventDriven", "fixedPoint", "attractorDetection", "recordPolicies"]
+
+
+#####################################
+# Key of a configuration
+#####################################
+
+def _file_digest(fullPath):
+    """
+    sha256 of the contents of a file
+    """
+    digest = hashlib.sha256()
+    with open(fullPath, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    """
+    Convert a value of the configuration to plain JSON types, replacing the paths to existing files by the digest of
+    their contents so a change in an input file changes the key
+    """
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return _canonical(value.tolist())
+    if isinstance(value, spikes.SpikeTrains):
+        return _canonical(value.to_lists())
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and os.path.isfile(value):
+        return {"file": _file_digest(value)}
+    return value
+
+
+def model_config(module):
+    """
+    Collect the full configuration of a model that determines the result of its simulation
+
+    :param module: module of the model (CA3_oscilatory, CA3_pc_inhibitory, ...)
+    :return: dict with the module-level parameters, the name of the simulator and the digest of the source code of the
+             model, the simulator and the tools it uses (utils, spikes, stdp, attractor, sparse, fixedpoint)
+    """
+    config = {name: getattr(module, name) for name in CONFIG_NAMES if hasattr(module, name)}
+    config["model"] = module.__name__
+    config["simulator"] = module.sim.__name__
+    sources = [module, module.sim] + [getattr(module, name) for name in ["utils", "spikes", "stdp", "attractor"]
+                                      if hasattr(module, name)]
+    sources += [getattr(module.sim, name) for name in ["sparse", "fixedpoint"] if hasattr(module.sim, name)]
+    config["source"] = {source.__name__: _file_digest(source.__file__) for source in sources
+                        if os.path.isfile(getattr(source, "__file__", None) or "")}
+    return config
+
+
+def config_key(config):
+    """
+    Stable key of a configuration: sha256 of its canonical JSON (sorted keys, no spaces, integer floats as int)
+
+    :param config: dict with the configuration (see model_config)
+    :return: hexadecimal key
+    """
+    text = json.dumps(_canonical(config), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+#####################################
+# Index and eviction
+#####################################
+
+def read_index(cachePath):
+    """
+    Read the index of the cache, removing the entries whose data file no longer exists
+
+    :param cachePath: folder of the cache (and of the data files)
+    :return: dict {key: {"fullPath", "filename", "size", "created", "lastUsed"}}
+    """
+    try:
+        with open(cachePath + CACHE_INDEX_FILE) as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return {key: entry for key, entry in index.items() if os.path.isfile(entry["fullPath"])}
+
+
+def write_index(cachePath, index):
+    """
+    Write the index of the cache atomically (temporal file + rename)
+
+    :param cachePath: folder of the cache
+    :param index: dict {key: entry}
+    """
+    tmpPath = cachePath + CACHE_INDEX_FILE + ".tmp"
+    with open(tmpPath, "w") as file:
+        json.dump(index, file, indent=1)
+    os.replace(tmpPath, cachePath + CACHE_INDEX_FILE)
+
+
+def evict(index, maxBytes=CACHE_MAX_BYTES, maxEntries=CACHE_MAX_ENTRIES, keep=None):
+    """
+    Remove the least recently used data files of the cache until the total size and number of files are within limits
+
+    :param index: dict {key: entry}, modified in place
+    :param maxBytes: max total size of the data files of the cache (None for no limit)
+    :param maxEntries: max number of data files of the cache (None for no limit)
+    :param keep: (optional) key of an entry that must not be removed (the one just used)
+    :return: list with the full path of the files removed
+    """
+    removed = []
+    totalBytes = sum(entry["size"] for entry in index.values())
+    for key in sorted(index, key=lambda item: index[item]["lastUsed"]):
+        if key == keep:
+            continue
+        if (maxBytes is None or totalBytes <= maxBytes) and (maxEntries is None or len(index) <= maxEntries):
+            break
+        entry = index.pop(key)
+        totalBytes -= entry["size"]
+        if os.path.isfile(entry["fullPath"]):
+            os.remove(entry["fullPath"])
+        removed.append(entry["fullPath"])
+    return removed
+
+
+#####################################
+# Cached execution
+#####################################
+
+def cached_run(module, run=None, cachePath="data/", maxBytes=CACHE_MAX_BYTES, maxEntries=CACHE_MAX_ENTRIES):
+    """
+    Execute the simulation of a model only if there is not a stored result with the same configuration
+
+    :param module: module of the model (CA3_oscilatory, CA3_pc_inhibitory, ...)
+    :param run: (optional) function that executes the simulation and returns (full path, filename) of the data file,
+                by default the main function of the model
+    :param cachePath: folder of the cache (the folder where the model stores its data files)
+    :param maxBytes: max total size of the data files of the cache (None for no limit)
+    :param maxEntries: max number of data files of the cache (None for no limit)
+    :return: full path to the data file, name of the data file
+    """
+    key = config_key(model_config(module))
+    index = read_index(cachePath)
+    entry = index.get(key)
+    if entry is None:
+        fullPath, filename = (run or module.main)()
+        entry = {"fullPath": fullPath, "filename": filename, "size": os.path.getsize(fullPath),
+                 "created": time.time()}
+        index[key] = entry
+    else:
+        print("Data loaded from cache: " + entry["fullPath"])
+        # The phases of a previous execution in this process must not be written as the report of the cached file
+        instrumentation.enable(False)
+    entry["lastUsed"] = time.time()
+    evict(index, maxBytes, maxEntries, key)
+    write_index(cachePath, index)
+    return entry["fullPath"], entry["filename"]
@@ -0,0 +1,67 @@
+"""
+Fixed-point arithmetic of SpiNNaker, used by the fixed-point mode of the NumPy backend (sim_numpy)
+
+The board computes IF_curr_exp and STDP with the REAL type of sPyNNaker: signed s16.15 fixed point stored in int32
+(16 integer bits and 15 fractional bits, resolution 2^-15 and range [-65536, 65536)). The exponential decays of the
+membrane, the synaptic currents and the STDP traces are unsigned u0.32 fractions (decay_t) applied with a 64-bit
+product and a shift of 32 bits. The products are truncated towards -inf (arithmetic shift) and wrap around on overflow,
+as the integer instructions of the ARM cores; only the conversion of float values to fixed point saturates.
+"""
+
+import numpy as np
+
+
+FRACTION_BITS = 15
+ONE = 1 << FRACTION_BITS
+DECAY_BITS = 32
+INT32_MIN = np.iinfo(np.int32).min
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def to_fixed(values):
+    """
+    Convert values to s16.15 (rounded to the nearest representable value and saturated to the range of int32)
+
+    :param values: scalar or array of floats
+    :return: int32 array
+    """
+    scaled = np.round(np.asarray(values, dtype=float) * ONE)
+    return np.clip(scaled, INT32_MIN, INT32_MAX).astype(np.int32)
+
+
+def to_float(values):
+    """
+    Convert s16.15 values to float64
+    """
+    return np.asarray(values, dtype=float) / ONE
+
+
+def to_decay(values):
+    """
+    Convert decay factors in [0, 1] to u0.32 (stored in int64 to be multiplied without overflow)
+
+    :param values: scalar or array of floats
+    :return: int64 array
+    """
+    scaled = np.round(np.asarray(values, dtype=float) * (1 << DECAY_BITS))
+    return np.clip(scaled, 0, (1 << DECAY_BITS) - 1).astype(np.int64)
+
+
+def multiply(a, b):
+    """
+    Product of two s16.15 values (arrays broadcastable between them)
+
+    :return: int32 array with the product in s16.15
+    """
+    return ((np.asarray(a, dtype=np.int64) * np.asarray(b, dtype=np.int64)) >> FRACTION_BITS).astype(np.int32)
+
+
+def decay(values, factor):
+    """
+    Apply a u0.32 decay factor to s16.15 values (decay_s1615 of sPyNNaker)
+
+    :param values: int32 array in s16.15
+    :param factor: int64 array (broadcastable with values) in u0.32
+    :return: int32 array in s16.15
+    """
+    return ((np.asarray(values, dtype=np.int64) * factor) >> DECAY_BITS).astype(np.int32)
@@ -0,0 +1,118 @@
+"""
+Per-phase instrumentation of the executions of the models
+
+The phases of an execution (setup, creation of populations and projections, run, get_data, format, write, plot...) are
+marked with start_phase(name): each phase lasts until the next one starts or until end_phase. For each phase name the
+number of calls, the wall-clock time, the change of the resident memory (RSS) of the process and the change of the
+number of memory blocks allocated by Python (an approximation of the objects alive) are accumulated, so a phase marked
+in a loop (as the run and get weight of each time step) is reported only once. The report is stored as JSON next to
+the data file of the simulation (see write_report).
+
+The instrumentation is disabled until enable is called: start_phase and end_phase only check a global variable, so
+the marks can stay in the code of the models without cost. When the data file is reused from the cache (see
+cache.cached_run), nothing is executed and the instrumentation is disabled, so the report written by the execution
+that created the file is kept.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+
+
+# Measures of the phases of the current execution {name: measures} (None if disabled) and phase being measured
+_phases = None
+_current = None
+_startTime = None
+
+
+def enable(enabled=True):
+    """
+    Start (or disable) the instrumentation of a new execution, discarding the phases measured until now
+
+    :param enabled: if measure the phases
+    """
+    global _phases, _current, _startTime
+    _phases = {} if enabled else None
+    _current = None
+    _startTime = time.perf_counter() if enabled else None
+
+
+def is_enabled():
+    return _phases is not None
+
+
+def _rss():
+    """
+    Current resident memory of the process in bytes (peak resident memory if /proc is not available)
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def start_phase(name):
+    """
+    Finish the current phase (if any) and start measuring a new one
+
+    :param name: name of the phase
+    """
+    global _current
+    if _phases is None:
+        return
+    end_phase()
+    _current = (name, time.perf_counter(), _rss(), sys.getallocatedblocks())
+
+
+def end_phase():
+    """
+    Finish the current phase and accumulate its measures
+    """
+    global _current
+    if _phases is None or _current is None:
+        return
+    name, startTime, startMemory, startBlocks = _current
+    _current = None
+    measures = _phases.setdefault(name, {"name": name, "calls": 0, "wallTime": 0.0, "memoryDelta": 0,
+                                         "objectsDelta": 0})
+    measures["calls"] += 1
+    measures["wallTime"] += time.perf_counter() - startTime
+    measures["memoryDelta"] += _rss() - startMemory
+    measures["objectsDelta"] += sys.getallocatedblocks() - startBlocks
+
+
+def get_report():
+    """
+    Measures of the phases of the current execution (the current phase is finished)
+
+    :return: dict -> {"phases": list of {"name", "calls", "wallTime" (s), "memoryDelta" (bytes), "objectsDelta"} in
+             the order in which each phase was first started, "wallTime" since enable (s), "peakRSS" (MB)} or None if
+             the instrumentation is disabled
+    """
+    if _phases is None:
+        return None
+    end_phase()
+    return {"phases": list(_phases.values()), "wallTime": time.perf_counter() - _startTime,
+            "peakRSS": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0}
+
+
+def write_report(dataPath):
+    """
+    Store the measures of the phases as JSON next to the data file of the simulation (same name with _phases.json).
+    It can be called several times in the same execution (for example, after storing the data and after plotting it)
+    to update the report with the new phases
+
+    :param dataPath: full path to the data file of the simulation
+    :return: full path to the report or None if the instrumentation is disabled
+    """
+    report = get_report()
+    if report is None:
+        return None
+    report["dataFile"] = os.path.basename(dataPath)
+    fullPath = os.path.splitext(dataPath)[0] + "_phases.json"
+    with open(fullPath, "w") as file:
+        json.dump(report, file, indent=2)
+    return fullPath
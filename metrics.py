@@ -0,0 +1,177 @@
+"""
+Recall quality and recall latency metrics of the CA3 memories
+
+The input spikes of DG and the output spikes of PC are converted to bool matrices (time step, neuron). The input is
+divided in events: consecutive time steps where the same set of DG neurons fires (a presentation of a pattern or of a
+cue). The stored patterns are the sets of neurons of the input events that are not part of a bigger event and the cues
+are the events with a partial pattern (or all the events if there is not any partial one). For each cue, the response
+of PC is the set of neurons that fire from the cue until the next input event, and it is compared with the pattern
+that contains the cue (DG neuron i excites PC neuron i):
+    + accuracy: fraction of the neurons of the pattern that have fired (pattern completion)
+    + false positives/negatives: neurons that have fired out of the pattern / neurons of the pattern that have not fired
+    + latency: time from the cue until all the neurons of the pattern have fired (nan if the pattern is not completed)
+All cues are computed together with vectorized operations, so the metrics can be computed in sweeps and batch runs
+without plotting.
+"""
+
+import numpy as np
+import stdp
+import utils
+
+
+#####################################
+# Input events and patterns
+#####################################
+
+def input_events(inputMatrix):
+    """
+    Divide the input in events: consecutive time steps where the same set of neurons fires
+
+    :param inputMatrix: bool matrix (time step, neuron) of the input spikes
+    :return: array with the first time step of each event, array with the time step after the end of each event and
+             bool matrix (event, neuron) with the neurons of each event
+    """
+    active = inputMatrix.any(axis=1)
+    ticks = np.nonzero(active)[0]
+    if len(ticks) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros((0, inputMatrix.shape[1]), bool)
+    # A new event starts when the previous step has no input or a different set of neurons
+    sameAsPrevious = np.zeros(len(ticks), dtype=bool)
+    sameAsPrevious[1:] = (ticks[1:] == ticks[:-1] + 1) & (inputMatrix[ticks[1:]] == inputMatrix[ticks[:-1]]).all(axis=1)
+    starts = np.nonzero(~sameAsPrevious)[0]
+    ends = np.append(starts[1:], len(ticks)) - 1
+    return ticks[starts], ticks[ends] + 1, inputMatrix[ticks[starts]]
+
+
+def find_patterns(eventNeurons):
+    """
+    Get the stored patterns: the different sets of neurons of the events that are not a subset of another event
+
+    :param eventNeurons: bool matrix (event, neuron) with the neurons of each event
+    :return: bool matrix (pattern, neuron) and bool array that indicates if each event is a full pattern
+    """
+    unique = np.unique(eventNeurons, axis=0)
+    unique = unique[unique.any(axis=1)]
+    # overlap[a, b] = neurons of a that are also in b
+    overlap = unique.astype(np.int64) @ unique.T.astype(np.int64)
+    sizes = unique.sum(axis=1)
+    isSubset = (overlap == sizes[:, None]) & (sizes[:, None] < sizes[None, :])
+    patterns = unique[~isSubset.any(axis=1)]
+    isPattern = (eventNeurons[:, None, :] == patterns[None, :, :]).all(axis=2).any(axis=1)
+    return patterns, isPattern
+
+
+#####################################
+# Metrics
+#####################################
+
+def recall_metrics(inputMatrix, outputMatrix, timeStep, patterns=None, cueStart=None):
+    """
+    Compute the recall metrics of each cue
+
+    :param inputMatrix: bool matrix (time step, neuron) of DG spikes
+    :param outputMatrix: bool matrix (time step, neuron) of PC spikes
+    :param timeStep: time step of the simulation (ms)
+    :param patterns: (optional) bool matrix (pattern, neuron) or list of lists of neuron ids with the stored patterns
+                     (by default, inferred from the input with find_patterns)
+    :param cueStart: (optional) time (ms) from which the input events are cues (by default, the events with partial
+                     patterns or all the events if there is not any)
+    :return: dict with an element per cue -> {"cueTime" (ms), "pattern" (index of the pattern), "cueNeurons",
+             "responseNeurons", "falsePositive", "falseNegative" (bool matrices (cue, neuron)), "accuracy",
+             "numFalsePositives", "numFalseNegatives", "latency" (ms)} and "patterns" (bool matrix (pattern, neuron))
+    """
+    numTicks, numNeurons = outputMatrix.shape
+    starts, ends, eventNeurons = input_events(inputMatrix)
+    if patterns is None:
+        patterns, isPattern = find_patterns(eventNeurons)
+    else:
+        if not isinstance(patterns, np.ndarray) or patterns.dtype != bool:
+            patternMatrix = np.zeros((len(patterns), numNeurons), dtype=bool)
+            for indexPattern, neurons in enumerate(patterns):
+                patternMatrix[indexPattern, list(neurons)] = True
+            patterns = patternMatrix
+        isPattern = (eventNeurons[:, None, :] == patterns[None, :, :]).all(axis=2).any(axis=1)
+
+    # Cues and the window of the response to each one (until the next input event)
+    windowEnds = np.append(starts[1:], numTicks)
+    if cueStart is not None:
+        isCue = starts * timeStep >= cueStart
+    else:
+        isCue = ~isPattern if (~isPattern).any() else np.ones(len(starts), dtype=bool)
+    cueTicks, windowEnds, cueNeurons = starts[isCue], windowEnds[isCue], eventNeurons[isCue]
+
+    # Pattern of each cue: the one with more neurons of the cue (the smallest one if there is a tie)
+    overlap = cueNeurons.astype(np.int64) @ patterns.T.astype(np.int64)
+    score = overlap * (numNeurons + 1) - patterns.sum(axis=1)[None, :]
+    indexPattern = np.argmax(score, axis=1) if len(patterns) > 0 else np.zeros(len(cueTicks), dtype=np.int64)
+    expected = patterns[indexPattern] if len(patterns) > 0 else np.zeros_like(cueNeurons)
+
+    # Neurons that fire in the window of each cue (cumulative sum of spikes)
+    cumSpikes = np.zeros((numTicks + 1, numNeurons), dtype=np.int64)
+    np.cumsum(outputMatrix, axis=0, out=cumSpikes[1:])
+    response = (cumSpikes[windowEnds] - cumSpikes[cueTicks]) > 0
+
+    # First spike of each neuron from each time step (numTicks if it does not fire again)
+    nextSpike = np.where(outputMatrix, np.arange(numTicks, dtype=np.int32)[:, None], np.int32(numTicks))
+    nextSpike = np.minimum.accumulate(nextSpike[::-1], axis=0)[::-1]
+    firstSpike = nextSpike[np.minimum(cueTicks, numTicks - 1)] if numTicks > 0 else np.zeros_like(response, int)
+    completion = np.where(expected, firstSpike, -1).max(axis=1)
+    completed = (completion < windowEnds) & expected.any(axis=1)
+    latency = np.where(completed, (completion - cueTicks) * timeStep, np.nan)
+
+    falsePositive = response & ~expected
+    falseNegative = expected & ~response
+    numExpected = expected.sum(axis=1)
+    accuracy = np.divide((response & expected).sum(axis=1), numExpected, out=np.zeros(len(cueTicks)),
+                         where=numExpected > 0)
+    return {"cueTime": cueTicks * timeStep, "pattern": indexPattern, "cueNeurons": cueNeurons,
+            "responseNeurons": response, "falsePositive": falsePositive, "falseNegative": falseNegative,
+            "accuracy": accuracy, "numFalsePositives": falsePositive.sum(axis=1),
+            "numFalseNegatives": falseNegative.sum(axis=1), "latency": latency, "patterns": patterns}
+
+
+def summarize_recall(metrics):
+    """
+    Summary of the recall metrics of all cues
+
+    :param metrics: recall metrics of each cue (see recall_metrics)
+    :return: dict with the number of cues, the mean accuracy, the fraction of completed patterns, the mean number of
+             false positives and negatives per cue and the mean latency of the completed patterns (ms)
+    """
+    numCues = len(metrics["cueTime"])
+    if numCues == 0:
+        return {"numCues": 0, "meanAccuracy": np.nan, "completedRatio": np.nan, "meanFalsePositives": np.nan,
+                "meanFalseNegatives": np.nan, "meanLatency": np.nan}
+    completed = ~np.isnan(metrics["latency"])
+    return {"numCues": numCues, "meanAccuracy": float(metrics["accuracy"].mean()),
+            "completedRatio": float(completed.mean()),
+            "meanFalsePositives": float(metrics["numFalsePositives"].mean()),
+            "meanFalseNegatives": float(metrics["numFalseNegatives"].mean()),
+            "meanLatency": float(metrics["latency"][completed].mean()) if completed.any() else np.nan}
+
+
+#####################################
+# Metrics of a simulation
+#####################################
+
+def recall_metrics_from_data(data, patterns=None, cueStart=None):
+    """
+    Compute the recall metrics of a simulation from its data (dataOut or the content of a data file)
+
+    :param data: data of the simulation with the spikes of DGL and PCL, or full path to its data file
+    :param patterns: (optional) stored patterns (see recall_metrics)
+    :param cueStart: (optional) time (ms) from which the input events are cues (see recall_metrics)
+    :return: recall metrics of each cue (see recall_metrics)
+    """
+    if isinstance(data, str):
+        meta = utils.read_meta(data)
+        spikesDG = utils.read_variable(data, "spikes", "DGL")["data"]
+        spikesPC = utils.read_variable(data, "spikes", "PCL")["data"]
+    else:
+        meta = data
+        variables = {(variable["type"], variable["popNameShort"]): variable["data"] for variable in data["variables"]}
+        spikesDG, spikesPC = variables[("spikes", "DGL")], variables[("spikes", "PCL")]
+    numTicks = int(round(meta["simTime"] / meta["timeStep"]))
+    inputMatrix = stdp.spike_matrix(spikesDG, numTicks, meta["timeStep"])
+    outputMatrix = stdp.spike_matrix(spikesPC, numTicks, meta["timeStep"])
+    return recall_metrics(inputMatrix, outputMatrix, meta["timeStep"], patterns, cueStart)
@@ -0,0 +1,79 @@
+"""
+Train-then-recall pipeline of the regulated CA3 model
+
+The learning phase (CA3_pc_inhibitory) is executed and its final PCL-PCL weights and synParameters are passed in
+memory to the recall phase (CA3_pc_inhibitory_static_syn, trainedWeights argument), instead of storing the training in
+a data file and copying its path to w_path by hand. The parameters of the recall model are not modified and its data
+only stores a reference to the training (the path to its data file or a tag), not the weights. Storing the data files
+of both phases is optional and several sets of cues can be tested against the same trained weights in a single batch
+simulation.
+"""
+
+import time
+import utils
+import CA3_pc_inhibitory
+import CA3_pc_inhibitory_static_syn
+
+
+def trained_weights(dataOutTraining, synapse="PCL-PCL", tag=None):
+    """
+    Take from the data of a training only what the recall phase needs: the synParameters and the final weights of the
+    trained synapses
+
+    :param dataOutTraining: data of the learning phase (dataOut)
+    :param synapse: name of the trained synapses
+    :param tag: (optional) reference to the training stored in the data of the recall (by default, the script name of
+                the training)
+    :return: dataOut with "tag", the "synParameters" of the synapses and their final weight variable (see
+             utils.get_last_stamp_synapse_list)
+    """
+    return {"tag": tag or dataOutTraining["scriptName"] + " (in memory)",
+            "synParameters": {synapse: dataOutTraining["synParameters"][synapse]},
+            "variables": [variable for variable in dataOutTraining["variables"]
+                          if variable["type"] == "wFinal" and variable["popNameShort"] == synapse]}
+
+
+def run_pipeline(cuesBatch=None, store=False):
+    """
+    Execute the learning phase and the recall phase with the trained weights, passed in memory
+
+    :param cuesBatch: (optional) list with the input spikes of DG of several recall trials, executed in a single batch
+                      simulation with the NumPy backend (by default, one recall with the DGLSpikes of the static model)
+    :param store: if store the data files of the learning phase and of each recall
+    :return: dataOut of the learning phase, list with the dataOut of each recall and list with (full path, filename)
+             of each file stored if store
+    """
+    files = []
+
+    # Learning phase
+    dataOutTraining = CA3_pc_inhibitory.simulate()
+    tag = None
+    if store:
+        files.append(utils.write_file("data/", CA3_pc_inhibitory.simulationParameters["filename"], dataOutTraining))
+        tag = files[-1][0]
+
+    # Recall phase with the trained weights
+    weights = trained_weights(dataOutTraining, tag=tag)
+    if cuesBatch is None:
+        dataOutRecall = [CA3_pc_inhibitory_static_syn.simulate(weights)]
+        if store:
+            files.append(utils.write_file("data/", CA3_pc_inhibitory_static_syn.simulationParameters["filename"],
+                                          dataOutRecall[0]))
+    else:
+        dataOutRecall, recallFiles = CA3_pc_inhibitory_static_syn.main_batch(cuesBatch, store, weights)
+        files += recallFiles
+    return dataOutTraining, dataOutRecall, files
+
+
+if __name__ == "__main__":
+    # Pipeline parameters
+    # + If store the data files of both phases
+    store = True
+    # + Cues to test against the trained weights (None to use the DGLSpikes of CA3_pc_inhibitory_static_syn)
+    cuesBatch = None
+
+    startTime = time.time()
+    _, _, pipelineFiles = run_pipeline(cuesBatch, store)
+    print("Pipeline executed in {:.2f}s".format(time.time() - startTime))
+    for fullPath, _ in pipelineFiles:
+        print("Data stored in: " + fullPath)
@@ -0,0 +1,177 @@
+"""
+Batch plotting of the data files of archived simulations
+
+The data files of a folder (.dat and .txt of previous versions) are discovered and the figures of each one are created
+with custom_plots of the plot script of its model, the same figures and paths as the simulation_and_plot_* scripts
+(savePath + saveName + "/" + saveName + suffix + ".png", with saveName the name of the data file). The files are
+plotted in a pool of processes ("spawn") with the headless backend Agg, and a file is skipped when all its figures
+exist and are newer than the data file, so only new or changed simulations are plotted again. The throughput (figures
+per second) of the batch is reported at the end.
+"""
+
+import glob
+import importlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+# Headless backend, selected before pyplot is imported (also in the worker processes, which import this module)
+matplotlib.use("Agg")
+import utils
+
+
+# Plot script of the data files of each model (name of the data file = scriptName + "_" + date)
+PLOT_SCRIPTS = {"CA3_oscilatory": "simulation_and_plot_CA3_oscilatory",
+                "CA3_pc_inhibitory": "simulation_and_plot_CA3_pc_inhibitory",
+                "CA3_pc_inhibitory_static": "simulation_and_plot_CA3_pc_inhibitory"}
+DATA_EXTENSIONS = [".dat", ".txt"]
+
+
+#####################################
+# Discovery of files
+#####################################
+
+def get_plot_script(filename):
+    """
+    Plot script of a data file, from the name of its model at the beginning of the filename
+
+    :param filename: name of the data file without extension
+    :return: name of the module of the plot script or None if the model is unknown
+    """
+    matches = [scriptName for scriptName in PLOT_SCRIPTS if filename.startswith(scriptName + "_")]
+    return PLOT_SCRIPTS[max(matches, key=len)] if matches else None
+
+
+def get_figure_paths(moduleName, saveName, savePath):
+    """
+    Full paths of the figures that the plot script creates for a data file
+
+    :param moduleName: name of the module of the plot script
+    :param saveName: base name of the figures (name of the data file)
+    :param savePath: base path of the figures
+    :return: list of full paths of the png files
+    """
+    module = importlib.import_module(moduleName)
+    return [savePath + saveName + "/" + saveName + suffix + ".png" for suffix in module.FIGURES]
+
+
+def is_up_to_date(fullPathFile, figurePaths):
+    """
+    Check if all the figures of a data file exist and are newer than the data file
+    """
+    dataTime = os.path.getmtime(fullPathFile)
+    return all(os.path.isfile(path) and os.path.getmtime(path) >= dataTime for path in figurePaths)
+
+
+def find_plot_tasks(dataPath, savePath, pattern="*", force=False):
+    """
+    Discover the data files of a folder and decide which of them must be plotted
+
+    :param dataPath: folder with the data files
+    :param savePath: base path of the figures
+    :param pattern: (optional) glob pattern of the names of the data files to plot (without extension)
+    :param force: if plot again the files whose figures are up to date
+    :return: list of tasks (full path of the data file, module of the plot script, saveName, savePath, number of
+             figures) to plot, list of full paths of the files skipped because they are up to date and list of full
+             paths of the files of unknown models
+    """
+    tasks, upToDate, unknown = [], [], []
+    paths = sorted(path for extension in DATA_EXTENSIONS
+                   for path in glob.glob(os.path.join(dataPath, pattern + extension)))
+    for fullPathFile in paths:
+        saveName = os.path.splitext(os.path.basename(fullPathFile))[0]
+        moduleName = get_plot_script(saveName)
+        if moduleName is None:
+            unknown.append(fullPathFile)
+            continue
+        figurePaths = get_figure_paths(moduleName, saveName, savePath)
+        if not force and is_up_to_date(fullPathFile, figurePaths):
+            upToDate.append(fullPathFile)
+        else:
+            tasks.append((fullPathFile, moduleName, saveName, savePath, len(figurePaths)))
+    return tasks, upToDate, unknown
+
+
+#####################################
+# Plotting
+#####################################
+
+def plot_file(task):
+    """
+    Create the figures of a data file (executed in a worker process)
+
+    :param task: (full path of the data file, module of the plot script, saveName, savePath, number of figures)
+    :return: dict -> {"file", "figures" (number of figures created), "time" (s)[, "error"]}
+    """
+    fullPathFile, moduleName, saveName, savePath, numFigures = task
+    startTime = time.perf_counter()
+    result = {"file": fullPathFile, "figures": 0}
+    try:
+        module = importlib.import_module(moduleName)
+        if module.custom_plots(fullPathFile, False, True, saveName, savePath):
+            result["figures"] = numFigures
+        else:
+            result["error"] = "the data file could not be plotted"
+    except Exception as error:
+        result["error"] = repr(error)
+    result["time"] = time.perf_counter() - startTime
+    return result
+
+
+def plot_batch(dataPath="data/", savePath="plot/", pattern="*", numWorkers=None, force=False):
+    """
+    Plot all the data files of a folder whose figures are missing or older than the data, in a pool of processes
+
+    :param dataPath: folder with the data files
+    :param savePath: base path of the figures
+    :param pattern: (optional) glob pattern of the names of the data files to plot (without extension)
+    :param numWorkers: (optional) number of worker processes (by default, the number of cores)
+    :param force: if plot again the files whose figures are up to date
+    :return: summary -> {"files", "skipped", "unknown", "errors", "figures", "time" (s), "figuresPerSecond"} and list
+             with the result of each file plotted (see plot_file)
+    """
+    startTime = time.perf_counter()
+    tasks, upToDate, unknown = find_plot_tasks(dataPath, savePath, pattern, force)
+    results = []
+    if tasks:
+        # Base folder of the figures (the folder of each data file is created by its plot script)
+        utils.check_folder(savePath)
+        numWorkers = min(os.cpu_count() if numWorkers is None else numWorkers, len(tasks))
+        with ProcessPoolExecutor(max_workers=numWorkers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(plot_file, task) for task in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                if "error" in result:
+                    print("Error plotting " + result["file"] + ": " + result["error"])
+                results.append(result)
+    elapsed = time.perf_counter() - startTime
+    figures = sum(result["figures"] for result in results)
+    summary = {"files": len(tasks), "skipped": len(upToDate), "unknown": len(unknown),
+               "errors": sum(1 for result in results if "error" in result), "figures": figures, "time": elapsed,
+               "figuresPerSecond": figures / elapsed if elapsed > 0 else 0.0}
+    return summary, results
+
+
+def format_summary(summary):
+    """
+    Text line with the summary of a batch
+    """
+    return ("Plotted {files} files ({figures} figures, {errors} errors), skipped {skipped} up to date and {unknown} of "
+            "unknown models in {time:.2f}s: {figuresPerSecond:.2f} figures/s").format(**summary)
+
+
+if __name__ == "__main__":
+    # Batch parameters
+    # + Folder with the data files and base path where store the figures
+    dataPath = "data/"
+    savePath = "plot/"
+    # + Glob pattern of the names of the data files to plot (without extension), for example "CA3_oscilatory_2022_*"
+    pattern = "*"
+    # + Number of worker processes (None to use all the cores)
+    numWorkers = None
+    # + If plot again the data files whose figures are newer than the data
+    force = False
+
+    batchSummary, _ = plot_batch(dataPath, savePath, pattern, numWorkers, force)
+    print(format_summary(batchSummary))
@@ -0,0 +1,366 @@
+"""
+Low-latency recall service of the regulated CA3 network
+
+The static network (CA3_pc_inhibitory_static_syn) is built once with the trained PCL-PCL weights and stays resident:
+each recall sets the cue spikes of DG, runs recallTime ms, takes the spikes of PC and resets the network (sim.reset)
+instead of building it again. The cues arrive as JSON lines over a local socket (TCP on localhost or a Unix socket) and
+the requests that arrive close in time are grouped in micro-batches (up to maxBatch cues or batchWindow ms after the
+first one) that are simulated together in the batch mode of the NumPy backend, the local reference simulator used when
+no SpiNNaker board is present. With sPyNNaker the batch is simulated cue by cue on the board.
+
+Protocol (one JSON object per line in both directions):
+    {"id": 1, "cue": [0, 3, 4]}             -> DG neurons of the cue, fired at cueTimes
+    {"id": 2, "spikes": [[1.0], [], ...]}   -> spike times (ms) of each DG neuron
+    {"stats": true}                         -> latency report of the service
+The response is {"id", "pattern" (ids of the PC neurons that fire), "spikes" (spike times of each PC neuron),
+"batchSize", "latency" (ms)} or {"id", "error"}. The latency (from the request received to the response sent) of the
+requests is kept to report its p50 and p99.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import spikes
+import CA3_pc_inhibitory_static_syn as model
+
+
+#####################################
+# Resident network
+#####################################
+
+class RecallNetwork(object):
+    """
+    Static regulated network built once with the trained weights and executed again for each batch of cues
+    """
+
+    def __init__(self, weights, maxBatch=16, recallTime=20.0, eventDriven=True):
+        """
+        :param weights: full path to the data file of a training or its dataOut (see pipeline.trained_weights)
+        :param maxBatch: number of cues simulated together (1 with sPyNNaker)
+        :param recallTime: time simulated for each cue (ms)
+        :param eventDriven: if jump over the quiescent periods with the NumPy backend (see sim_numpy.setup)
+        """
+        self.sim = model.sim
+        self.batched = self.sim.__name__ == "sim_numpy"
+        self.maxBatch = maxBatch if self.batched else 1
+        self.recallTime = recallTime
+        self.timeStep = model.simulationParameters["timeStep"]
+        self.numDG = model.popNeurons["DGLayer"]
+        self.numPC = model.popNeurons["PCLayer"]
+        if self.batched:
+            self.sim.setup(timestep=self.timeStep, batch_size=self.maxBatch, event_driven=eventDriven)
+            DGLSpikes = self.sim.PerTrial([[]] * self.maxBatch)
+        else:
+            self.sim.setup(timestep=self.timeStep)
+            DGLSpikes = []
+        # Only the spikes of PC are used: v of a single neuron once per recall (the model is not modified)
+        recordPolicies = {population: {"neurons": [0], "samplingInterval": recallTime, "dtype": "float64",
+                                       "delta": False} for population in model.recordPolicies}
+        self.network = model.build_network(self.sim, DGLSpikes, [], weights, {"recordPolicies": recordPolicies})
+
+    def recall(self, cues):
+        """
+        Simulate a batch of cues and return the response of PC to each one
+
+        :param cues: list (up to maxBatch) with the spike times (ms) of each DG neuron of each cue
+        :return: list with the SpikeTrains of PC of each cue
+        """
+        if len(cues) > self.maxBatch:
+            raise ValueError("The batch has " + str(len(cues)) + " cues but the maximum is " + str(self.maxBatch))
+        if not self.batched:
+            return [self._recall_trials([cue])[0] for cue in cues]
+        # The trials without cue of the batch are simulated without input
+        return self._recall_trials(cues + [[]] * (self.maxBatch - len(cues)))[:len(cues)]
+
+    def _recall_trials(self, cues):
+        """
+        Run all the trials of the network with the given cues and reset it
+        """
+        DGLayer = self.network["DGLayer"]
+        DGLayer.set(spike_times=self.sim.PerTrial(cues) if self.batched else cues[0])
+        self.sim.run(self.recallTime)
+        PCData = self.network["PCLayer"].get_data(variables=["spikes"], clear=True)
+        self.sim.reset()
+        return [spikes.SpikeTrains.from_times(segment.spiketrains, self.timeStep, self.numPC)
+                for segment in PCData.segments]
+
+    def close(self):
+        self.sim.end()
+
+
+def cue_spikes(request, numNeurons, cueTimes):
+    """
+    Spike times of DG of a request
+
+    :param request: dict with "cue" (ids of the DG neurons of the cue) or "spikes" (spike times of each DG neuron)
+    :param numNeurons: number of neurons of DG
+    :param cueTimes: spike times (ms) of the neurons of a cue
+    :return: list with the spike times of each DG neuron or Raise an error if the request is not valid
+    """
+    if "spikes" in request:
+        spikeTimes = [list(map(float, times)) for times in request["spikes"]]
+        if len(spikeTimes) != numNeurons:
+            raise ValueError("The spikes of the cue must have " + str(numNeurons) + " neurons")
+        return spikeTimes
+    if "cue" not in request:
+        raise ValueError("The request must have a cue or spikes")
+    neurons = set(int(neuron) for neuron in request["cue"])
+    if any(neuron < 0 or neuron >= numNeurons for neuron in neurons):
+        raise ValueError("The neurons of the cue must be between 0 and " + str(numNeurons - 1))
+    return [list(cueTimes) if neuron in neurons else [] for neuron in range(numNeurons)]
+
+
+#####################################
+# Service
+#####################################
+
+class RecallService(object):
+    """
+    asyncio server that groups the concurrent cues in micro-batches and runs them in the resident network
+    """
+
+    def __init__(self, network, batchWindow=2.0, cueTimes=(1.0,), maxLatencies=100000):
+        """
+        :param network: RecallNetwork
+        :param batchWindow: time (ms) to wait for more cues after the first one of a batch
+        :param cueTimes: spike times (ms) of the DG neurons of a cue given as neuron ids
+        :param maxLatencies: number of latencies of the last requests kept for the report
+        """
+        self.network = network
+        self.batchWindow = batchWindow
+        self.cueTimes = cueTimes
+        self.latencies = deque(maxlen=maxLatencies)
+        self.batchSizes = deque(maxlen=maxLatencies)
+        self._queue = None
+        self._batchTask = None
+        self._clients = set()
+        # The simulator has a single global state: the batches are executed one by one out of the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def _batch_loop(self):
+        """
+        Take the pending cues in batches (up to maxBatch or batchWindow ms after the first one) and simulate them
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batchWindow / 1000.0
+            while len(batch) < self.network.maxBatch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            cues = [cue for cue, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.network.recall, cues)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.batchSizes.append(len(batch))
+            # The future of a request is cancelled if its connection is closed while it waits
+            for (_, future), spikeTrains in zip(batch, results):
+                if not future.done():
+                    future.set_result((spikeTrains, len(batch)))
+
+    async def _answer(self, request, receivedTime, writer):
+        """
+        Recall the cue of a request and write its response
+        """
+        response = {"id": request.get("id")}
+        try:
+            cue = cue_spikes(request, self.network.numDG, self.cueTimes)
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((cue, future))
+            spikeTrains, batchSize = await future
+            response["pattern"] = np.nonzero(spikeTrains.counts())[0].tolist()
+            response["spikes"] = spikeTrains.to_lists()
+            response["batchSize"] = batchSize
+            latency = time.perf_counter() - receivedTime
+            self.latencies.append(latency)
+            response["latency"] = latency * 1000.0
+        except Exception as error:
+            response["error"] = str(error)
+        writer.write((json.dumps(response) + "\n").encode())
+
+    async def _handle_client(self, reader, writer):
+        """
+        Read the requests of a connection (several can be pending at the same time) and answer each one
+        """
+        self._clients.add(asyncio.current_task())
+        tasks = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                receivedTime = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    writer.write((json.dumps({"error": "Invalid JSON: " + str(error)}) + "\n").encode())
+                    continue
+                if request.get("stats"):
+                    writer.write((json.dumps(self.latency_report()) + "\n").encode())
+                else:
+                    tasks.append(asyncio.ensure_future(self._answer(request, receivedTime, writer)))
+                await writer.drain()
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            self._clients.discard(asyncio.current_task())
+
+    async def start(self, host="127.0.0.1", port=8765, unixPath=None):
+        """
+        Start the server and the batch loop
+
+        :param host: address of the TCP server (localhost by default)
+        :param port: port of the TCP server (0 to take a free one)
+        :param unixPath: (optional) path of a Unix socket used instead of TCP
+        :return: asyncio server
+        """
+        self._queue = asyncio.Queue()
+        self._batchTask = asyncio.ensure_future(self._batch_loop())
+        if unixPath is not None:
+            if os.path.exists(unixPath):
+                os.remove(unixPath)
+            return await asyncio.start_unix_server(self._handle_client, path=unixPath)
+        return await asyncio.start_server(self._handle_client, host, port)
+
+    async def stop(self, server):
+        """
+        Stop accepting connections, close the open ones (cancelling their pending requests) and stop the batch loop
+        """
+        server.close()
+        clients = list(self._clients)
+        for client in clients:
+            client.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+        await server.wait_closed()
+        self._batchTask.cancel()
+
+    async def serve(self, host="127.0.0.1", port=8765, unixPath=None, reportInterval=10.0):
+        """
+        Serve the recalls until the task is cancelled, printing the latency report every reportInterval s
+        """
+        server = await self.start(host, port, unixPath)
+        print("Recall service listening on " + (unixPath if unixPath is not None else host + ":" + str(port)))
+        numReported = 0
+        try:
+            while True:
+                await asyncio.sleep(reportInterval)
+                if len(self.latencies) != numReported:
+                    numReported = len(self.latencies)
+                    print(format_report(self.latency_report()))
+        finally:
+            await self.stop(server)
+
+    def latency_report(self):
+        """
+        :return: dict -> {"requests", "batches", "meanBatch", "p50", "p99", "max"} with the latencies in ms of the
+                 last requests
+        """
+        report = {"requests": len(self.latencies), "batches": len(self.batchSizes),
+                  "meanBatch": float(np.mean(self.batchSizes)) if self.batchSizes else 0.0}
+        latencies = np.array(self.latencies) * 1000.0
+        for name, value in (("p50", 50), ("p99", 99), ("max", 100)):
+            report[name] = float(np.percentile(latencies, value)) if len(latencies) > 0 else None
+        return report
+
+
+def format_report(report):
+    """
+    Text line with the latency report of the service
+    """
+    if report["requests"] == 0:
+        return "No recalls served"
+    return ("{requests} recalls in {batches} batches (mean batch {meanBatch:.1f}): p50 {p50:.2f}ms, p99 {p99:.2f}ms, "
+            "max {max:.2f}ms").format(**report)
+
+
+#####################################
+# Client
+#####################################
+
+async def request_recalls(requests, host="127.0.0.1", port=8765, unixPath=None):
+    """
+    Send several requests through one connection without waiting for the responses and collect them
+
+    :param requests: list of requests (dicts, see the protocol)
+    :return: list with the responses in the order they arrive
+    """
+    if unixPath is not None:
+        reader, writer = await asyncio.open_unix_connection(unixPath)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    for request in requests:
+        writer.write((json.dumps(request) + "\n").encode())
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    return responses
+
+
+async def load_test(service, cues, numClients, requestsPerClient):
+    """
+    Serve the recalls of several concurrent clients on a free local port and report the latency: each client sends
+    its next request when it receives the response of the previous one
+
+    :param service: RecallService
+    :param cues: list of cues (DG neuron ids) sent in turn by the clients
+    :param numClients: number of concurrent connections
+    :param requestsPerClient: number of requests of each connection
+    :return: latency report of the service (see RecallService.latency_report)
+    """
+    server = await service.start(port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    async def client(clientId):
+        for i in range(requestsPerClient):
+            await request_recalls([{"id": clientId * requestsPerClient + i, "cue": cues[(clientId + i) % len(cues)]}],
+                                  port=port)
+
+    await asyncio.gather(*[client(clientId) for clientId in range(numClients)])
+    await service.stop(server)
+    return service.latency_report()
+
+
+if __name__ == "__main__":
+    # Service parameters
+    # + Trained network: data file of a training (CA3_pc_inhibitory), loaded once at start
+    weightsPath = model.w_path
+    # + Local socket: TCP port on localhost or path of a Unix socket (None to use TCP)
+    host = "127.0.0.1"
+    port = 8765
+    unixPath = None
+    # + Micro-batches: maximum number of cues simulated together and time (ms) to wait for more cues after the first
+    maxBatch = 16
+    batchWindow = 2.0
+    # + Time simulated for each cue and spike times of the DG neurons of a cue (ms)
+    recallTime = 20.0
+    cueTimes = [1.0]
+    # + Period (s) of the latency report
+    reportInterval = 10.0
+
+    recallNetwork = RecallNetwork(weightsPath, maxBatch, recallTime)
+    recallService = RecallService(recallNetwork, batchWindow, cueTimes)
+    try:
+        asyncio.run(recallService.serve(host, port, unixPath, reportInterval))
+    except KeyboardInterrupt:
+        print(format_report(recallService.latency_report()))
+    finally:
+        recallNetwork.close()
@@ -0,0 +1,1362 @@
+"""
+Vectorized NumPy reference backend for the subset of the PyNN/sPyNNaker API used by the CA3 models
+
+It can be imported in place of spynnaker8 ("import sim_numpy as sim") to run the models without SpiNNaker hardware.
+The state of every population (membrane potential, synaptic currents, refractory counters) and every projection
+(weights, STDP traces) is stored as NumPy arrays and updated as a whole on each time step (the STDP traces only on the
+spikes of their neurons, with lookup tables of the decay as in SpiNNaker). The synapses of each
+projection are stored in CSR order, so memory grows with the number of synapses and sparse connectors scale to large
+networks.
+
++ Neuron models: IF_curr_exp, SpikeSourceArray
++ Connectors: OneToOneConnector, AllToAllConnector, FixedProbabilityConnector, FixedNumberPreConnector,
+  FromListConnector (random connectors with NumpyRNG)
++ Synapses: StaticSynapse, STDPMechanism (SpikePairRule + AdditiveWeightDependence)
++ Simulation control: setup, run, reset, end
++ Data: Population.record, Population.get_data (neo-like Block), Projection.get
+The spike times of a SpikeSourceArray can be given as lists of spike times or as a spikes.SpikeTrains. The membrane
+potential can be recorded from a subset of neurons (indexes) every sampling_interval ms, as with sPyNNaker.
+
+Batch mode: setup(batch_size=B) runs B independent copies (trials) of the network together. The state of the neurons
+has shape (trial, neuron) and the weights (trial, synapse). Values that differ between trials (spike times, neuron
+parameters, initial values or weights) are given wrapped in PerTrial, get_data returns one segment per trial and
+Projection.get one result per trial.
+
+Partitioned mode: setup(num_partitions=P) splits each neuron population (not the spike sources) in P contiguous slices
+simulated by P worker processes, as sPyNNaker splits the populations across the cores of the board. The synapses of each
+projection are stored in the partition of their post neuron, so each partition updates its neurons, publishes their
+spikes in a shared memory spike vector, waits for the rest of partitions (one barrier per time step) and then
+propagates the spikes of the whole pre populations to its own neurons and applies STDP to its own synapses. The network
+is built as usual and it is partitioned in the first run; get_data and Projection.get gather the data of all the
+partitions, so the results have the same shape as without partitions. get_partition_load reports the load of each
+partition (neurons, synapses, spikes, synaptic events and time computing and waiting).
+
+Event-driven mode: setup(event_driven=True) only computes time step by time step the periods with activity. When no
+neuron can reach its threshold before the next input (spike of a source or current pending in an input buffer), the
+simulation jumps to that input: the membrane potential and the synaptic currents of IF_curr_exp follow their analytic
+solution for the skipped time steps (the same that the time step by time step integration) and the STDP traces need no
+update, as they are only updated on spikes. So the time of sparsely active networks grows with the number of spikes
+instead of simTime * N.
+
+Fixed-point mode: setup(fixed_point=True) computes IF_curr_exp and STDP with the arithmetic of SpiNNaker (see
+fixedpoint): the membrane potential, synaptic currents, input buffers, STDP traces and weights are int32 arrays in
+s16.15 and the decays are u0.32 factors, so the results can be compared bit by bit with the board instead of with
+float64 and the state takes half the memory. The parameters and the data returned (get_data, Projection.get) are in
+floats.
+"""
+
+import copy
+import multiprocessing
+import multiprocessing.connection
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import fixedpoint
+import sparse
+import spikes
+import stdp
+
+
+#####################################
+# Simulator state
+#####################################
+
+class _State(object):
+    """
+    Global state of the simulation (time step, elapsed ticks and the created populations and projections)
+    """
+
+    def __init__(self, timestep, batchSize, numPartitions=1, eventDriven=False, fixedPoint=False):
+        self.dt = float(timestep)
+        self.batchSize = int(batchSize)
+        self.numPartitions = int(numPartitions)
+        self.eventDriven = bool(eventDriven)
+        self.fixedPoint = bool(fixedPoint)
+        self.tick = 0
+        self.populations = []
+        self.projections = []
+        self.partitions = None
+
+
+_state = None
+
+
+def setup(timestep=1.0, min_delay=None, max_delay=None, batch_size=1, num_partitions=1, event_driven=False,
+          fixed_point=False, **extra_params):
+    """
+    Initialize the simulator
+
+    :param timestep: time step of the simulation in ms
+    :param min_delay: (unused) kept for compatibility with PyNN
+    :param max_delay: (unused) kept for compatibility with PyNN
+    :param batch_size: number of independent trials of the network simulated together
+    :param num_partitions: number of worker processes that simulate the network (1 to simulate it in this process)
+    :param event_driven: if jump over the time steps without activity instead of computing all of them
+    :param fixed_point: if compute the neurons and synapses with the int32 fixed-point arithmetic of SpiNNaker
+    :param extra_params: (unused) kept for compatibility with sPyNNaker
+    :return: 0 as in PyNN
+    """
+    global _state
+    if event_driven and num_partitions > 1:
+        raise ValueError("The event-driven mode can not be used with partitions")
+    if event_driven and fixed_point:
+        raise ValueError("The event-driven mode can not be used with fixed point")
+    if _state is not None and _state.partitions is not None:
+        _state.partitions.stop()
+    _state = _State(timestep, batch_size, num_partitions, event_driven, fixed_point)
+    return 0
+
+
+def end():
+    """
+    Finish the simulation and release the state of the simulator
+    """
+    global _state
+    if _state is not None and _state.partitions is not None:
+        _state.partitions.stop()
+    _state = None
+
+
+def get_current_time():
+    """
+    :return: current time of the simulation in ms
+    """
+    return _state.tick * _state.dt
+
+
+def run(simtime):
+    """
+    Advance the simulation simtime ms
+
+    :param simtime: duration in ms to simulate
+    :return: current time of the simulation in ms
+    """
+    numTicks = int(round(simtime / _state.dt))
+    if _state.numPartitions > 1:
+        if _state.partitions is None:
+            _state.partitions = _Partitions(_state.numPartitions)
+        _state.partitions.run(numTicks)
+        _state.tick += numTicks
+        return get_current_time()
+    for population in _state.populations:
+        population._prepare(_state.tick + numTicks)
+    if _state.eventDriven:
+        _run_event_driven(_state.tick + numTicks)
+        return get_current_time()
+    for _ in range(numTicks):
+        _step(_state.tick)
+        _state.tick += 1
+    return get_current_time()
+
+
+def reset(annotations=None):
+    """
+    Return the simulation to time 0 keeping the network built, so it can be executed again (for example with other
+    spike times set in the sources): v returns to its initial values, the synaptic currents, pending inputs, STDP traces
+    and recorded data are cleared and the weights are kept as in PyNN
+
+    :param annotations: (unused) kept for compatibility with PyNN
+    :return: current time of the simulation in ms (0)
+    """
+    _check_not_partitioned()
+    _state.tick = 0
+    for population in _state.populations:
+        population._reset()
+    for projection in _state.projections:
+        if projection.plastic:
+            projection.stdpRule.reset()
+    return get_current_time()
+
+
+def _step(tick):
+    """
+    Compute one time step of the whole network: update neurons, record and propagate the spikes through projections
+
+    :param tick: index of the current time step
+    """
+    for population in _state.populations:
+        population._update(tick)
+    for projection in _state.projections:
+        projection._propagate(tick)
+
+
+def _run_event_driven(lastTick):
+    """
+    Simulate until lastTick computing only the time steps with activity and jumping over the rest (event-driven mode)
+
+    :param lastTick: tick at which the simulation stops
+    """
+    while _state.tick < lastTick:
+        tick = _state.tick
+        nextInput = min([population._next_input(tick) for population in _state.populations] + [lastTick])
+        if nextInput > tick and all(population._is_quiescent() for population in _state.populations):
+            # The STDP traces are evaluated from the tick of the last spike (see stdp.LookupTableSTDP)
+            for population in _state.populations:
+                population._advance(nextInput - tick)
+            _state.tick = nextInput
+        else:
+            _step(tick)
+            _state.tick += 1
+
+
+#####################################
+# Neuron models
+#####################################
+
+class IF_curr_exp(object):
+    """
+    Leaky integrate and fire neuron with exponentially decaying synaptic currents
+    """
+
+    default_parameters = {"cm": 1.0, "i_offset": 0.0, "tau_m": 20.0, "tau_refrac": 0.1, "tau_syn_E": 5.0,
+                          "tau_syn_I": 5.0, "v_reset": -65.0, "v_rest": -65.0, "v_thresh": -50.0}
+    default_initial_values = {"v": -65.0}
+
+    def __init__(self, **parameters):
+        self.parameters = dict(self.default_parameters)
+        self.parameters.update(parameters)
+
+
+class SpikeSourceArray(object):
+    """
+    Population of neurons that fire at the given spike times
+    """
+
+    default_parameters = {"spike_times": []}
+    default_initial_values = {}
+
+    def __init__(self, spike_times=None):
+        self.parameters = {"spike_times": [] if spike_times is None else spike_times}
+
+
+#####################################
+# Trial values (batch mode)
+#####################################
+
+class PerTrial(list):
+    """
+    List with one value per trial, used in batch mode to give different spike times, parameters, initial values or
+    weights to each copy of the network
+    """
+    pass
+
+
+def _per_trial(value):
+    """
+    Expand a value to a list with the value of each trial of the simulation
+
+    :param value: value shared by all trials or PerTrial with one value per trial
+    :return: list with batch size values
+    """
+    if isinstance(value, PerTrial):
+        if len(value) != _state.batchSize:
+            raise ValueError("PerTrial has " + str(len(value)) + " values but the batch size is " +
+                             str(_state.batchSize))
+        return list(value)
+    return [value] * _state.batchSize
+
+
+def _trial_array(value, size):
+    """
+    Convert a value (scalar, one per neuron and/or PerTrial) to an array with shape (trial, neuron)
+    """
+    return np.array([np.broadcast_to(np.asarray(trialValue, dtype=float), (size,)) for trialValue in _per_trial(value)])
+
+
+def _state_array(value, size):
+    """
+    Array (trial, neuron) of a state variable (v): float or s16.15 in fixed-point mode
+    """
+    values = _trial_array(value, size)
+    return fixedpoint.to_fixed(values) if _state.fixedPoint else values
+
+
+def _state_dtype():
+    """
+    Type of the state variables, input currents, traces and weights
+    """
+    return np.int32 if _state.fixedPoint else float
+
+
+#####################################
+# Populations
+#####################################
+
+class Population(object):
+    """
+    Group of neurons of the same type whose state is stored as arrays of shape (trial, neuron)
+    """
+
+    def __init__(self, size, cellclass, label=None):
+        self.size = int(size)
+        self.celltype = cellclass
+        self.label = label
+        self.parameters = {}
+        self.recordedVariables = []
+        self._recordStart = 0
+        self._recordTicks = 0
+        self._spikeRecord = []
+        self._vRecord = []
+        self._vIndexes = None
+        self._vInterval = 1
+        self.initial_values = dict(cellclass.default_initial_values)
+        self._fixedConstants = None
+        for name, value in cellclass.parameters.items():
+            self._set_parameter(name, value)
+        batchSize = _state.batchSize
+        self.spiked = np.zeros((batchSize, self.size), dtype=bool)
+        if self._is_source():
+            self._inputTicks = None
+        else:
+            self.v = _state_array(self.initial_values["v"], self.size)
+            self.iExc = np.zeros((batchSize, self.size), dtype=_state_dtype())
+            self.iInh = np.zeros((batchSize, self.size), dtype=_state_dtype())
+            self.refracCount = np.zeros((batchSize, self.size), dtype=np.int64)
+            self._inputExc = {}
+            self._inputInh = {}
+        _state.populations.append(self)
+
+    def __len__(self):
+        return self.size
+
+    def _is_source(self):
+        return isinstance(self.celltype, SpikeSourceArray)
+
+    def _set_parameter(self, name, value):
+        """
+        Store a parameter (scalar, one value per neuron and/or PerTrial) of the population
+        """
+        if name == "spike_times":
+            self.parameters[name] = [spikes.SpikeTrains.from_times(trialValue, _state.dt, self.size)
+                                     for trialValue in _per_trial(value)]
+            self._inputTicks = None
+        else:
+            self.parameters[name] = _trial_array(value, self.size)
+            self._fixedConstants = None
+
+    def set(self, **parameters):
+        """
+        Set the parameters or initial values (v) of the population
+
+        :param parameters: parameters to change, as a scalar, a value per neuron and/or PerTrial
+        """
+        _check_not_partitioned()
+        for name, value in parameters.items():
+            if name in self.initial_values:
+                self.initialize(**{name: value})
+            else:
+                self._set_parameter(name, value)
+
+    def initialize(self, **initialValues):
+        """
+        Set the initial value of the state variables (v) of the population
+
+        :param initialValues: state variables to change, as a scalar, a value per neuron and/or PerTrial
+        """
+        _check_not_partitioned()
+        for name, value in initialValues.items():
+            self.initial_values[name] = value
+            if name == "v":
+                self.v = _state_array(value, self.size)
+
+    def record(self, variables, sampling_interval=None, indexes=None):
+        """
+        Indicate which variables ("spikes" and/or "v") will be recorded during the simulation
+
+        :param variables: name or list of names of the variables to record
+        :param sampling_interval: (optional) time (ms) between two recorded values of v, rounded to a multiple of the
+                                  time step (by default, every time step)
+        :param indexes: (optional) ids of the neurons whose v is recorded (by default, all). The spikes are always
+                        recorded from all the neurons
+        """
+        if isinstance(variables, str):
+            variables = [variables]
+        for variable in variables:
+            if variable == "v" and self._is_source():
+                raise ValueError("Variable v can not be recorded in a SpikeSourceArray")
+            if variable not in self.recordedVariables:
+                self.recordedVariables.append(variable)
+        if "v" in variables:
+            if sampling_interval is not None:
+                self._vInterval = max(1, int(round(sampling_interval / _state.dt)))
+            if indexes is not None:
+                indexes = np.unique(np.asarray(indexes, dtype=np.int64))
+                if len(indexes) > 0 and (indexes[0] < 0 or indexes[-1] >= self.size):
+                    raise ValueError("The indexes to record must be between 0 and " + str(self.size - 1))
+                self._vIndexes = indexes
+
+    def get_data(self, variables="all", clear=False):
+        """
+        Get the recorded data of the population as a neo-like Block
+
+        :param variables: name or list of names of the variables to retrieve ("all" to get all recorded)
+        :param clear: if delete the recorded data after retrieving it
+        :return: Block with one segment per trial containing the spiketrains and the analogsignals recorded
+        """
+        if variables == "all":
+            variables = self.recordedVariables
+        elif isinstance(variables, str):
+            variables = [variables]
+        if _state.partitions is not None:
+            spikeMatrix, vMatrix, recordStart = _state.partitions.get_data(self, variables, clear)
+        else:
+            spikeMatrix, vMatrix, recordStart = self._take_record(variables, clear)
+        dt = _state.dt
+        segments = [Segment() for _ in range(_state.batchSize)]
+        if "spikes" in variables:
+            if spikeMatrix is not None:
+                # Matrix (tick, trial, neuron) -> spike times of each neuron of each trial
+                ticks, trials, neurons = np.nonzero(spikeMatrix)
+                times = (ticks + recordStart) * dt
+                keys = trials * self.size + neurons
+                order = np.argsort(keys, kind="stable")
+                bounds = np.searchsorted(keys[order], np.arange(_state.batchSize * self.size + 1))
+                sortedTimes = times[order]
+                for trial, segment in enumerate(segments):
+                    first = trial * self.size
+                    segment.spiketrains = [SpikeTrain(sortedTimes[bounds[first + i]:bounds[first + i + 1]])
+                                           for i in range(self.size)]
+            else:
+                for segment in segments:
+                    segment.spiketrains = [SpikeTrain(np.zeros(0)) for _ in range(self.size)]
+        if "v" in variables:
+            channels = np.arange(self.size) if self._vIndexes is None else self._vIndexes
+            if vMatrix is None:
+                vMatrix = np.zeros((0, _state.batchSize, len(channels)))
+            elif _state.fixedPoint:
+                vMatrix = fixedpoint.to_float(vMatrix)
+            # First sampled tick of the record
+            firstSample = -(-recordStart // self._vInterval) * self._vInterval
+            for trial, segment in enumerate(segments):
+                segment.analogsignals.append(AnalogSignal(vMatrix[:, trial, :], name="v",
+                                                          sampling_period=dt * self._vInterval,
+                                                          t_start=firstSample * dt, channel_index=channels))
+        return Block(segments)
+
+    def _take_record(self, variables, clear):
+        """
+        Get the recorded matrices (tick, trial, neuron) of spikes and v (None if not requested or not recorded)
+
+        :param variables: list of names of the variables to retrieve
+        :param clear: if delete the recorded data after retrieving it
+        :return: spike matrix, v matrix and tick of the first recorded time step
+        """
+        # The records are blocks (ticks, trial, neuron): one tick per computed time step or several in a jump (only the
+        #   sampled ticks and the recorded neurons for v)
+        spikeMatrix = np.concatenate(self._spikeRecord) if "spikes" in variables and self._spikeRecord else None
+        vMatrix = np.concatenate(self._vRecord) if "v" in variables and self._vRecord else None
+        recordStart = self._recordStart
+        if clear:
+            self._recordStart += self._recordTicks
+            self._recordTicks = 0
+            self._spikeRecord = []
+            self._vRecord = []
+        return spikeMatrix, vMatrix, recordStart
+
+    def _reset(self):
+        """
+        Return the state of the neurons to the one at time 0 (see reset) and clear the recorded data
+        """
+        self.spiked[:] = False
+        if not self._is_source():
+            self.v = _state_array(self.initial_values["v"], self.size)
+            self.iExc[:] = 0
+            self.iInh[:] = 0
+            self.refracCount[:] = 0
+            for buffers in (self._inputExc, self._inputInh):
+                if "ring" in buffers:
+                    buffers["ring"][:] = 0
+        self._recordStart = 0
+        self._recordTicks = 0
+        self._spikeRecord = []
+        self._vRecord = []
+
+    def _prepare(self, lastTick):
+        """
+        Prepare the internal structures needed to simulate until lastTick (spike times of sources)
+        """
+        if self._is_source() and self._inputTicks is None:
+            # (trial, neuron) of the spikes of all the trials sorted by tick, with the bounds of the spikes of each tick
+            trainsBatch = self.parameters["spike_times"]
+            ticks = np.concatenate([spikeTrains.ticks for spikeTrains in trainsBatch])
+            trials = np.repeat(np.arange(len(trainsBatch)), [spikeTrains.num_spikes() for spikeTrains in trainsBatch])
+            neurons = np.concatenate([spikeTrains.neurons() for spikeTrains in trainsBatch])
+            order = np.argsort(ticks, kind="stable")
+            self._inputTicks, starts = np.unique(ticks[order], return_index=True)
+            self._inputBounds = np.append(starts, len(order))
+            self._inputTrials, self._inputNeurons = trials[order], neurons[order]
+
+    def _input_buffer(self, receptor, delayTicks):
+        """
+        Get (and create if necessary) the ring buffer of input currents of a receptor type
+
+        :param receptor: "excitatory" or "inhibitory"
+        :param delayTicks: maximum delay in ticks that the buffer must support
+        :return: ring buffer with shape (slots, trial, neuron)
+        """
+        buffers = self._inputExc if receptor == "excitatory" else self._inputInh
+        slots = delayTicks + 1
+        if "ring" not in buffers or buffers["ring"].shape[0] < slots:
+            ring = np.zeros((slots, _state.batchSize, self.size), dtype=_state_dtype())
+            if "ring" in buffers:
+                old = buffers["ring"]
+                for slot in range(old.shape[0]):
+                    tick = _state.tick + slot
+                    ring[tick % slots] = old[tick % old.shape[0]]
+            buffers["ring"] = ring
+        return buffers["ring"]
+
+    def _add_input(self, receptor, tick, current):
+        """
+        Add the current that will arrive to the neurons at the given tick
+        """
+        buffers = self._inputExc if receptor == "excitatory" else self._inputInh
+        ring = buffers["ring"]
+        ring[tick % ring.shape[0]] += current
+
+    def _take_input(self, receptor, tick):
+        """
+        Take (and clear) the current that arrives to the neurons at the given tick
+        """
+        buffers = self._inputExc if receptor == "excitatory" else self._inputInh
+        if "ring" not in buffers:
+            return 0.0
+        ring = buffers["ring"]
+        current = ring[tick % ring.shape[0]].copy()
+        ring[tick % ring.shape[0]] = 0
+        return current
+
+    def _update(self, tick):
+        """
+        Compute the state of the neurons in the given tick and record the requested variables
+        """
+        if self._is_source():
+            self.spiked = np.zeros((_state.batchSize, self.size), dtype=bool)
+            position = np.searchsorted(self._inputTicks, tick)
+            if position < len(self._inputTicks) and self._inputTicks[position] == tick:
+                start, stop = self._inputBounds[position], self._inputBounds[position + 1]
+                self.spiked[self._inputTrials[start:stop], self._inputNeurons[start:stop]] = True
+        elif _state.fixedPoint:
+            self._update_fixed(tick)
+        else:
+            p = self.parameters
+            dt = _state.dt
+            # Synaptic input with the initial value of the exponential shaping used in sPyNNaker
+            initE = p["tau_syn_E"] / dt * (1.0 - np.exp(-dt / p["tau_syn_E"]))
+            initI = p["tau_syn_I"] / dt * (1.0 - np.exp(-dt / p["tau_syn_I"]))
+            self.iExc += self._take_input("excitatory", tick) * initE
+            self.iInh += self._take_input("inhibitory", tick) * initI
+            # Membrane integration (exact for a constant current within the time step)
+            current = self.iExc - self.iInh + p["i_offset"]
+            vInf = p["v_rest"] + current * p["tau_m"] / p["cm"]
+            vNext = vInf + (self.v - vInf) * np.exp(-dt / p["tau_m"])
+            refractory = self.refracCount > 0
+            self.v = np.where(refractory, self.v, vNext)
+            self.refracCount[refractory] -= 1
+            # Spike generation
+            self.spiked = (self.v >= p["v_thresh"]) & ~refractory
+            self.v[self.spiked] = p["v_reset"][self.spiked]
+            self.refracCount[self.spiked] = np.round(p["tau_refrac"][self.spiked] / dt).astype(np.int64)
+            # Decay of the synaptic currents
+            self.iExc *= np.exp(-dt / p["tau_syn_E"])
+            self.iInh *= np.exp(-dt / p["tau_syn_I"])
+        if "spikes" in self.recordedVariables:
+            self._spikeRecord.append(self.spiked[None].copy())
+        if "v" in self.recordedVariables and tick % self._vInterval == 0:
+            self._vRecord.append(self._recorded_v(self.v[None]))
+        self._recordTicks += 1
+
+    def _fixed_constants(self):
+        """
+        Parameters and constants of the integration of IF_curr_exp in fixed point: s16.15 values, u0.32 decays and the
+        refractory period in ticks (computed again only when the parameters change)
+        """
+        if self._fixedConstants is None:
+            p = self.parameters
+            dt = _state.dt
+            constants = {name: fixedpoint.to_fixed(p[name]) for name in ("i_offset", "v_rest", "v_reset", "v_thresh")}
+            constants["resistance"] = fixedpoint.to_fixed(p["tau_m"] / p["cm"])
+            constants["decayM"] = fixedpoint.to_decay(np.exp(-dt / p["tau_m"]))
+            for suffix, tau in (("E", p["tau_syn_E"]), ("I", p["tau_syn_I"])):
+                constants["init" + suffix] = fixedpoint.to_decay(tau / dt * (1.0 - np.exp(-dt / tau)))
+                constants["decay" + suffix] = fixedpoint.to_decay(np.exp(-dt / tau))
+            constants["refracTicks"] = np.round(p["tau_refrac"] / dt).astype(np.int64)
+            self._fixedConstants = constants
+        return self._fixedConstants
+
+    def _update_fixed(self, tick):
+        """
+        Compute the state of the neurons in the given tick with the fixed-point arithmetic of SpiNNaker (the same steps
+        as the float integration, with v = alpha - exp_TC * (alpha - v) as in the LIF model of sPyNNaker)
+        """
+        c = self._fixed_constants()
+        self.iExc += fixedpoint.decay(self._take_input("excitatory", tick), c["initE"])
+        self.iInh += fixedpoint.decay(self._take_input("inhibitory", tick), c["initI"])
+        alpha = fixedpoint.multiply(self.iExc - self.iInh + c["i_offset"], c["resistance"]) + c["v_rest"]
+        vNext = alpha - fixedpoint.decay(alpha - self.v, c["decayM"])
+        refractory = self.refracCount > 0
+        self.v = np.where(refractory, self.v, vNext)
+        self.refracCount[refractory] -= 1
+        self.spiked = (self.v >= c["v_thresh"]) & ~refractory
+        self.v[self.spiked] = c["v_reset"][self.spiked]
+        self.refracCount[self.spiked] = c["refracTicks"][self.spiked]
+        self.iExc = fixedpoint.decay(self.iExc, c["decayE"])
+        self.iInh = fixedpoint.decay(self.iInh, c["decayI"])
+
+    def _recorded_v(self, vSteps):
+        """
+        Copy of the values of v (ticks, trial, neuron) of the neurons whose v is recorded
+        """
+        return vSteps.copy() if self._vIndexes is None else vSteps[:, :, self._vIndexes]
+
+    def _next_input(self, tick):
+        """
+        First tick from the given one with input: a spike of a source or a current pending in an input buffer
+
+        :return: tick of the next input (inf if there is not any)
+        """
+        if self._is_source():
+            position = np.searchsorted(self._inputTicks, tick)
+            return int(self._inputTicks[position]) if position < len(self._inputTicks) else np.inf
+        nextInput = np.inf
+        for buffers in (self._inputExc, self._inputInh):
+            if "ring" in buffers:
+                ring = buffers["ring"]
+                slots = np.nonzero(ring.reshape(ring.shape[0], -1).any(axis=1))[0]
+                if len(slots) > 0:
+                    nextInput = min(nextInput, tick + int(((slots - tick) % ring.shape[0]).min()))
+        return nextInput
+
+    def _membrane_constants(self):
+        """
+        Constants of the integration of one time step of IF_curr_exp: decay of v, iExc and iInh, membrane resistance
+        and resting potential with the offset current
+        """
+        p = self.parameters
+        dt = _state.dt
+        resistance = p["tau_m"] / p["cm"]
+        return (np.exp(-dt / p["tau_m"]), np.exp(-dt / p["tau_syn_E"]), np.exp(-dt / p["tau_syn_I"]), resistance,
+                p["v_rest"] + p["i_offset"] * resistance)
+
+    def _is_quiescent(self):
+        """
+        Check if no neuron can reach its threshold without new input: upper bound of v in the free evolution (the
+        synaptic currents decaying to 0 and v relaxing to the resting potential)
+        """
+        if self._is_source():
+            return True
+        decayM, decayE, decayI, resistance, vBase = self._membrane_constants()
+        # The current that reaches v in all the future steps is at most the sum of the geometric series of the decay
+        maxCurrent = np.maximum(self.iExc, 0.0) / (1.0 - decayE) + np.maximum(-self.iInh, 0.0) / (1.0 - decayI)
+        vMax = vBase + np.maximum(self.v - vBase, 0.0) + (1.0 - decayM) * resistance * maxCurrent
+        return not np.any(vMax >= self.parameters["v_thresh"])
+
+    def _advance(self, numTicks):
+        """
+        Jump numTicks time steps without input nor spikes (event-driven mode): analytic solution of the time step by
+        time step integration, recording the requested variables of all the skipped time steps
+        """
+        batchSize = _state.batchSize
+        if self._is_source():
+            self.spiked = np.zeros((batchSize, self.size), dtype=bool)
+        else:
+            decayM, decayE, decayI, resistance, vBase = self._membrane_constants()
+            if "v" in self.recordedVariables:
+                # Steps of the sampled ticks (the jump computes the ticks _state.tick ... + numTicks - 1) and the last
+                sampled = np.arange(-_state.tick % self._vInterval, numTicks, self._vInterval) + 1
+                steps = np.append(sampled, numTicks)[:, None, None]
+            else:
+                steps = np.array(numTicks)
+            # v is held while the neuron is refractory and then evolves freely with the currents of those steps
+            held = np.minimum(self.refracCount, steps)
+            free = steps - held
+            vSteps = vBase + decayM ** free * (self.v - vBase) + (1.0 - decayM) * resistance * (
+                self.iExc * decayE ** held * _geometric_sum(decayM, decayE, free) -
+                self.iInh * decayI ** held * _geometric_sum(decayM, decayI, free))
+            self.v = vSteps[-1] if vSteps.ndim == 3 else vSteps
+            self.iExc = self.iExc * decayE ** numTicks
+            self.iInh = self.iInh * decayI ** numTicks
+            self.refracCount = np.maximum(self.refracCount - numTicks, 0)
+            self.spiked = np.zeros((batchSize, self.size), dtype=bool)
+            if "v" in self.recordedVariables:
+                self._vRecord.append(self._recorded_v(vSteps[:-1]))
+        if "spikes" in self.recordedVariables:
+            self._spikeRecord.append(np.zeros((numTicks, batchSize, self.size), dtype=bool))
+        self._recordTicks += numTicks
+
+
+def _geometric_sum(a, b, n):
+    """
+    Sum of a ** (n - 1 - j) * b ** j for j in [0, n): accumulated contribution after n steps of a current that decays
+    by b to a potential that decays by a
+
+    :param a: decay of the potential (array)
+    :param b: decay of the current (array)
+    :param n: number of steps (array broadcastable with a and b)
+    :return: array with the sums
+    """
+    difference = a - b
+    equal = np.abs(difference) < 1e-12
+    return np.where(equal, n * a ** np.maximum(n - 1, 0), (a ** n - b ** n) / np.where(equal, 1.0, difference))
+
+
+#####################################
+# Connectors
+#####################################
+
+class NumpyRNG(object):
+    """
+    Random number generator used by the probabilistic connectors
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+
+def _rng(rng):
+    """
+    Get the NumPy generator of a NumpyRNG (a new one with random seed if None)
+    """
+    return rng.rng if isinstance(rng, NumpyRNG) else np.random.default_rng()
+
+
+def _sample_neurons(generator, numNeurons, count, exclude=None, replace=False):
+    """
+    Choose count neurons of a population of numNeurons, excluding (if not None) the neuron exclude
+
+    :return: sorted array with the ids of the chosen neurons
+    """
+    available = numNeurons - (1 if exclude is not None else 0)
+    chosen = generator.choice(available, size=count, replace=replace)
+    if exclude is not None:
+        chosen[chosen >= exclude] += 1
+    return np.sort(chosen)
+
+
+class OneToOneConnector(object):
+    """
+    Connect the neuron i of the pre population with the neuron i of the post population
+    """
+
+    def connect(self, numPre, numPost):
+        if numPre != numPost:
+            raise ValueError("OneToOneConnector needs populations of the same size")
+        return np.arange(numPre), np.arange(numPost), None, None
+
+
+class AllToAllConnector(object):
+    """
+    Connect all neurons of the pre population with all neurons of the post population
+    """
+
+    def __init__(self, allow_self_connections=True):
+        self.allow_self_connections = allow_self_connections
+
+    def connect(self, numPre, numPost):
+        indexType = np.int32 if max(numPre, numPost) < 2 ** 31 else np.int64
+        src = np.repeat(np.arange(numPre, dtype=indexType), numPost)
+        dst = np.tile(np.arange(numPost, dtype=indexType), numPre)
+        if not self.allow_self_connections:
+            keep = src != dst
+            src, dst = src[keep], dst[keep]
+        return src, dst, None, None
+
+
+class FixedProbabilityConnector(object):
+    """
+    Connect each pair of pre and post neurons with probability p_connect
+    """
+
+    def __init__(self, p_connect, allow_self_connections=True, rng=None):
+        self.p_connect = p_connect
+        self.allow_self_connections = allow_self_connections
+        self.rng = rng
+
+    def connect(self, numPre, numPost):
+        generator = _rng(self.rng)
+        noSelf = not self.allow_self_connections and numPre == numPost
+        # Number of synapses of each pre neuron and then the post neurons of each one
+        counts = generator.binomial(numPost - (1 if noSelf else 0), self.p_connect, size=numPre)
+        src = np.repeat(np.arange(numPre), counts)
+        dst = np.concatenate([_sample_neurons(generator, numPost, count, neuron if noSelf else None)
+                              for neuron, count in enumerate(counts)] + [np.zeros(0, dtype=np.int64)])
+        return src, dst, None, None
+
+
+class FixedNumberPreConnector(object):
+    """
+    Connect each post neuron with n pre neurons chosen at random (fixed in-degree)
+    """
+
+    def __init__(self, n, allow_self_connections=True, with_replacement=False, rng=None):
+        self.n = n
+        self.allow_self_connections = allow_self_connections
+        self.with_replacement = with_replacement
+        self.rng = rng
+
+    def connect(self, numPre, numPost):
+        generator = _rng(self.rng)
+        noSelf = not self.allow_self_connections and numPre == numPost
+        if self.n > numPre - (1 if noSelf else 0) and not self.with_replacement:
+            raise ValueError("FixedNumberPreConnector needs n <= number of pre neurons without replacement")
+        src = np.concatenate([_sample_neurons(generator, numPre, self.n, neuron if noSelf else None,
+                                              self.with_replacement)
+                              for neuron in range(numPost)] + [np.zeros(0, dtype=np.int64)])
+        dst = np.repeat(np.arange(numPost), self.n)
+        return src, dst, None, None
+
+
+class FromListConnector(object):
+    """
+    Connect the neurons indicated in a list of (src, dst[, weight[, delay]]) elements
+    """
+
+    def __init__(self, conn_list, column_names=None):
+        self.conn_list = conn_list
+        self.column_names = column_names
+
+    def connect(self, numPre, numPost):
+        connList = np.asarray(self.conn_list, dtype=float)
+        weights, delays = None, None
+        if connList.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), weights, delays
+        src = connList[:, 0].astype(np.int64)
+        dst = connList[:, 1].astype(np.int64)
+        columns = self.column_names if self.column_names is not None else ["weight", "delay"]
+        for indexColumn, name in enumerate(columns):
+            if connList.shape[1] > indexColumn + 2:
+                if name == "weight":
+                    weights = connList[:, indexColumn + 2]
+                elif name == "delay":
+                    delays = connList[:, indexColumn + 2]
+        return src, dst, weights, delays
+
+
+#####################################
+# Synapses
+#####################################
+
+class StaticSynapse(object):
+    """
+    Synapse with constant weight and delay
+    """
+
+    def __init__(self, weight=0.0, delay=None):
+        self.weight = weight
+        self.delay = delay
+
+
+class SpikePairRule(object):
+    """
+    Timing dependence of STDP: all pairs of pre and post spikes through exponentially decaying traces
+    """
+
+    def __init__(self, tau_plus=20.0, tau_minus=20.0, A_plus=0.01, A_minus=0.01):
+        self.tau_plus = tau_plus
+        self.tau_minus = tau_minus
+        self.A_plus = A_plus
+        self.A_minus = A_minus
+
+
+class AdditiveWeightDependence(object):
+    """
+    Weight dependence of STDP: the weight changes do not depend on the current weight, only bounded by w_min and w_max
+    """
+
+    def __init__(self, w_min=0.0, w_max=1.0):
+        self.w_min = w_min
+        self.w_max = w_max
+
+
+class STDPMechanism(object):
+    """
+    Plastic synapse whose weight is modified by a timing and a weight dependence rules
+    """
+
+    def __init__(self, timing_dependence=None, weight_dependence=None, weight=0.0, delay=None):
+        self.timing_dependence = timing_dependence
+        self.weight_dependence = weight_dependence
+        self.weight = weight
+        self.delay = delay
+
+
+#####################################
+# Projections
+#####################################
+
+class Projection(object):
+    """
+    Set of synapses between two populations: connectivity stored in CSR order (see sparse.Connectivity) and delays
+    with one value per synapse shared by all trials and weights as a (trial, synapse) matrix
+    """
+
+    def __init__(self, presynaptic_population, postsynaptic_population, connector, synapse_type=None,
+                 receptor_type="excitatory", label=None):
+        if synapse_type is None:
+            synapse_type = StaticSynapse()
+        if receptor_type not in ("excitatory", "inhibitory"):
+            raise ValueError("Unsupported receptor type: " + str(receptor_type))
+        self.pre = presynaptic_population
+        self.post = postsynaptic_population
+        self.synapse_type = synapse_type
+        self.receptor_type = receptor_type
+        self.label = label
+        dt = _state.dt
+        # Connectivity, weights and delays (in ticks) of the synapses
+        src, dst, listWeights, listDelays = connector.connect(self.pre.size, self.post.size)
+        self.connectivity = sparse.Connectivity(src, dst, self.pre.size, self.post.size)
+        order = self.connectivity.order
+        if listWeights is not None:
+            self.weights = np.repeat(np.asarray(listWeights, dtype=float)[order][None, :], _state.batchSize, axis=0)
+        else:
+            trialWeights = np.array(_per_trial(synapse_type.weight), dtype=float)
+            self.weights = np.repeat(trialWeights[:, None], len(self.connectivity), axis=1)
+        if listDelays is not None:
+            delays = np.asarray(listDelays, dtype=float)[order]
+        else:
+            delays = np.full(len(self.connectivity), dt if synapse_type.delay is None else float(synapse_type.delay))
+        if _state.fixedPoint:
+            self.weights = fixedpoint.to_fixed(self.weights)
+        self.delayTicks = np.maximum(np.round(delays / dt), 1).astype(np.int32)
+        self._delayValues = np.unique(self.delayTicks)
+        self.post._input_buffer(self.receptor_type, int(self.delayTicks.max(initial=1)))
+        # STDP rule with the traces of pre and post neurons
+        self.plastic = isinstance(synapse_type, STDPMechanism)
+        if self.plastic:
+            timing = synapse_type.timing_dependence
+            weightRule = synapse_type.weight_dependence
+            self.stdpParameters = {"tau_plus": timing.tau_plus, "tau_minus": timing.tau_minus, "A_plus": timing.A_plus,
+                                   "A_minus": timing.A_minus, "w_min": weightRule.w_min, "w_max": weightRule.w_max}
+            self.stdpRule = stdp.LookupTableSTDP(self.connectivity, _state.batchSize, self.stdpParameters, dt,
+                                                 _state.fixedPoint)
+        _state.projections.append(self)
+
+    def __len__(self):
+        return len(self.connectivity)
+
+    def _propagate(self, tick):
+        """
+        Send the spikes of the pre population in the given tick to the input buffers of the post population and apply
+        the plasticity rule if the synapses are plastic
+        """
+        trials, neurons = np.nonzero(self.pre.spiked)
+        connectivity = self.connectivity
+        if len(trials) > 0 and connectivity.longRows and len(self._delayValues) == 1:
+            # Long rows: add the row of synapses of each spike (the post neurons of a row are unique)
+            current = np.zeros((_state.batchSize, self.post.size), dtype=self.weights.dtype)
+            for trial, neuron in zip(trials.tolist(), neurons.tolist()):
+                start, stop = connectivity.indptr[neuron], connectivity.indptr[neuron + 1]
+                current[trial, connectivity.dst[start:stop]] += self.weights[trial, start:stop]
+            self.post._add_input(self.receptor_type, tick + int(self._delayValues[0]), current)
+        elif len(trials) > 0:
+            owner, synapses = connectivity.rows(neurons)
+            trials = trials[owner]
+            # Index of each target neuron in the flattened (trial, post) input
+            targets = trials * self.post.size + connectivity.dst[synapses]
+            values = self.weights.reshape(-1)[trials * self.weights.shape[1] + synapses]
+            size = _state.batchSize * self.post.size
+            for delay in self._delayValues:
+                if len(self._delayValues) > 1:
+                    inGroup = self.delayTicks[synapses] == delay
+                    current = np.bincount(targets[inGroup], values[inGroup], minlength=size)
+                else:
+                    current = np.bincount(targets, values, minlength=size)
+                self.post._add_input(self.receptor_type, tick + int(delay),
+                                     current.reshape(_state.batchSize, self.post.size).astype(self.weights.dtype,
+                                                                                             copy=False))
+        if self.plastic:
+            self.stdpRule.step(self.weights, self.pre.spiked, self.post.spiked, tick)
+
+    def get(self, attribute_names, format="list", with_address=True):
+        """
+        Get the current value of the weights or delays of the synapses
+
+        :param attribute_names: "weight" or "delay"
+        :param format: "list" to get the synapses (sorted by pre and post neuron) or "array" to get a (pre, post)
+                       matrix with nan in the non existing synapses
+        :param with_address: in list format, if include the pre and post neuron index of each synapse
+        :return: array (synapse, 3) of (pre, post, value) rows or array of values (as the connection list of PyNN) or a
+                 matrix of values (a list with the result of each trial in batch mode)
+        """
+        if attribute_names == "weight":
+            values = self.weights if _state.partitions is None else _state.partitions.get_weights(self)
+            if _state.fixedPoint:
+                values = fixedpoint.to_float(values)
+        elif attribute_names == "delay":
+            values = np.repeat((self.delayTicks * _state.dt)[None, :], _state.batchSize, axis=0)
+        else:
+            raise ValueError("Unsupported attribute: " + str(attribute_names))
+        results = []
+        for trialValues in values:
+            if format == "array":
+                results.append(self.connectivity.to_dense(trialValues))
+            elif with_address:
+                results.append(np.column_stack((self.connectivity.src, self.connectivity.dst, trialValues)))
+            else:
+                results.append(trialValues.copy())
+        if _state.batchSize == 1:
+            return results[0]
+        return results
+
+
+#####################################
+# Recorded data (subset of neo)
+#####################################
+
+class SpikeTrain(object):
+    """
+    Spike times (ms) of one neuron
+    """
+
+    def __init__(self, times):
+        self.times = np.asarray(times, dtype=float)
+
+    def __len__(self):
+        return len(self.times)
+
+    def as_array(self):
+        return self.times
+
+
+class AnalogSignal(object):
+    """
+    Values of a state variable sampled each sampling_period ms: matrix (time, neuron) of the neurons in channel_index
+    (annotated as in neo)
+    """
+
+    def __init__(self, values, name, sampling_period, t_start=0.0, channel_index=None):
+        self.values = values
+        self.name = name
+        self.sampling_period = sampling_period
+        self.t_start = t_start
+        channel_index = np.arange(values.shape[1]) if channel_index is None else np.asarray(channel_index)
+        self.array_annotations = {"channel_index": channel_index}
+
+    def as_array(self):
+        return self.values
+
+
+class Segment(object):
+    """
+    Recorded data of a population in a period of simulation
+    """
+
+    def __init__(self):
+        self.spiketrains = []
+        self.analogsignals = []
+
+    def filter(self, name=None):
+        return [signal for signal in self.analogsignals if name is None or signal.name == name]
+
+
+class Block(object):
+    """
+    Container of segments of recorded data
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+
+
+#####################################
+# Partitioned execution
+#####################################
+
+def get_partition_load():
+    """
+    Load of each partition in the runs executed until now (partitioned mode)
+
+    :return: list with a dict per partition -> {"partition", "neurons", "synapses", "ticks", "spikes",
+             "synapticEvents", "updateTime", "propagateTime", "waitTime" (s)} or an empty list without partitions
+    """
+    if _state is None or _state.partitions is None:
+        return []
+    return [dict(load, partition=index) for index, load in enumerate(_state.partitions.load)]
+
+
+def _check_not_partitioned():
+    """
+    Raise an error if the network has already been distributed to the partitions (its state is in the workers)
+    """
+    if _state is not None and _state.partitions is not None:
+        raise RuntimeError("The populations can not be modified after the first run in partitioned mode")
+
+
+class _PartitionView(object):
+    """
+    Spikes of a whole partitioned population seen from a partition (pre population of the projection shards): the
+    spike vector exchanged through shared memory
+    """
+
+    def __init__(self, size, index):
+        self.size = size
+        self.index = index
+        self.spiked = None
+
+
+def _partition_bounds(size, numPartitions):
+    """
+    First neuron of each partition of a population (and size of the population at the end)
+    """
+    return [size * partition // numPartitions for partition in range(numPartitions + 1)]
+
+
+def _slice_population(population, start, stop):
+    """
+    Copy of the neurons start:stop of a population with their state, parameters and input buffers
+    """
+    local = copy.copy(population)
+    local.size = stop - start
+    local.parameters = {name: value[:, start:stop].copy() for name, value in population.parameters.items()}
+    local._fixedConstants = None
+    for name in ["v", "iExc", "iInh", "refracCount", "spiked"]:
+        setattr(local, name, getattr(population, name)[:, start:stop].copy())
+    local._inputExc = {name: ring[:, :, start:stop].copy() for name, ring in population._inputExc.items()}
+    local._inputInh = {name: ring[:, :, start:stop].copy() for name, ring in population._inputInh.items()}
+    local.recordedVariables = list(population.recordedVariables)
+    local._partitionStart = start
+    local._spikeRecord, local._vRecord = [], []
+    local._recordTicks = 0
+    if population._vIndexes is not None:
+        inside = (population._vIndexes >= start) & (population._vIndexes < stop)
+        local._vIndexes = population._vIndexes[inside] - start
+    return local
+
+
+def _shard_projection(projection, pre, post, start, stop):
+    """
+    Copy of the synapses of a projection that arrive to the post neurons start:stop
+
+    :param projection: projection to divide
+    :param pre: pre population of the shard (the population itself for sources or its _PartitionView)
+    :param post: slice of the post population of the partition
+    :param start: first post neuron of the partition
+    :param stop: post neuron after the last one of the partition
+    :return: projection with the synapses of the partition and their positions in the projection (positions)
+    """
+    connectivity = projection.connectivity
+    positions = np.nonzero((connectivity.dst >= start) & (connectivity.dst < stop))[0]
+    shard = copy.copy(projection)
+    shard.pre, shard.post = pre, post
+    shard.connectivity = sparse.Connectivity(connectivity.src[positions], connectivity.dst[positions] - start,
+                                             connectivity.numPre, stop - start)
+    shard.positions = positions
+    # Contiguous (trial, synapse) matrix: STDP updates the weights through a flat view
+    shard.weights = np.ascontiguousarray(projection.weights[:, positions])
+    shard.delayTicks = projection.delayTicks[positions]
+    shard._delayValues = np.unique(shard.delayTicks)
+    shard._rowLengths = np.diff(shard.connectivity.indptr)
+    if shard.plastic:
+        shard.stdpRule = projection.stdpRule.shard(shard.connectivity, start, stop)
+    return shard
+
+
+class _Partitions(object):
+    """
+    Worker processes that simulate the partitions of the network and the shared memory where they exchange the spikes
+    """
+
+    def __init__(self, numPartitions):
+        context = multiprocessing.get_context("spawn")
+        batchSize = _state.batchSize
+        self.numPartitions = numPartitions
+        # Shared spike vectors (trial, neuron) of each partitioned population, twice to alternate between time steps
+        self.layout = {}
+        offset = 0
+        for index, population in enumerate(_state.populations):
+            if not population._is_source():
+                self.layout[index] = (offset, population.size)
+                offset += batchSize * population.size
+        self.shared = shared_memory.SharedMemory(create=True, size=max(2 * offset, 1))
+        self.barrier = context.Barrier(numPartitions)
+        self.bounds = {index: _partition_bounds(size, numPartitions) for index, (_, size) in self.layout.items()}
+        self.processes, self.connections = [], []
+        for partition in range(numPartitions):
+            parentConnection, childConnection = context.Pipe()
+            process = context.Process(target=_partition_worker,
+                                      args=(self._partition_spec(partition), childConnection, self.barrier,
+                                            self.shared.name, self.layout, offset), daemon=True)
+            process.start()
+            childConnection.close()
+            self.processes.append(process)
+            self.connections.append(parentConnection)
+        self.load = [None] * numPartitions
+
+    def _partition_spec(self, partition):
+        """
+        Populations and projections of a partition: slices of the neuron populations, whole spike sources and the
+        synapses that arrive to the neurons of the partition
+        """
+        populations, views = [], {}
+        for index, population in enumerate(_state.populations):
+            if population._is_source():
+                populations.append(population)
+            else:
+                start, stop = self.bounds[index][partition], self.bounds[index][partition + 1]
+                populations.append(_slice_population(population, start, stop))
+                views[index] = _PartitionView(population.size, index)
+        indexOf = {id(population): index for index, population in enumerate(_state.populations)}
+        projections = []
+        for projection in _state.projections:
+            indexPre, indexPost = indexOf[id(projection.pre)], indexOf[id(projection.post)]
+            pre = views.get(indexPre, populations[indexPre])
+            start, stop = self.bounds[indexPost][partition], self.bounds[indexPost][partition + 1]
+            projections.append(_shard_projection(projection, pre, populations[indexPost], start, stop))
+        return {"dt": _state.dt, "batchSize": _state.batchSize, "fixedPoint": _state.fixedPoint, "tick": _state.tick,
+                "populations": populations, "views": list(views.values()), "projections": projections}
+
+    def _request(self, command, *args):
+        """
+        Send a command to all the partitions and wait for their answers
+        """
+        answers = [None] * self.numPartitions
+        try:
+            for connection in self.connections:
+                connection.send((command, args))
+            pending = set(range(self.numPartitions))
+            while pending:
+                # Wait for the answers and for the end of the processes (a partition that dies does not answer)
+                ready = multiprocessing.connection.wait([self.connections[partition] for partition in pending] +
+                                                        [self.processes[partition].sentinel for partition in pending])
+                for partition in list(pending):
+                    if self.connections[partition] in ready:
+                        answers[partition] = self.connections[partition].recv()
+                        if isinstance(answers[partition], BaseException):
+                            raise answers[partition]
+                    elif self.processes[partition].sentinel in ready:
+                        raise EOFError("process of partition " + str(partition) + " finished")
+                    else:
+                        continue
+                    pending.remove(partition)
+        except Exception as error:
+            # Release the partitions waiting for the failed one in the barrier
+            self.barrier.abort()
+            self.stop()
+            raise RuntimeError("A partition of the simulation has failed: " + repr(error))
+        return answers
+
+    def run(self, numTicks):
+        self.load = self._request("run", numTicks)
+
+    def get_data(self, population, variables, clear):
+        """
+        Gather the recorded data of a population from the partitions (see Population._take_record)
+        """
+        index = _state.populations.index(population)
+        answers = self._request("get_data", index, variables, clear)
+        if population._is_source():
+            return answers[0]
+        spikeMatrix, vMatrix = [[answer[position] for answer in answers] for position in (0, 1)]
+        spikeMatrix = None if spikeMatrix[0] is None else np.concatenate(spikeMatrix, axis=2)
+        vMatrix = None if vMatrix[0] is None else np.concatenate(vMatrix, axis=2)
+        return spikeMatrix, vMatrix, answers[0][2]
+
+    def get_weights(self, projection):
+        """
+        Gather the weights (trial, synapse) of a projection from the partitions
+        """
+        weights = np.empty_like(projection.weights)
+        for positions, shardWeights in self._request("get_weights", _state.projections.index(projection)):
+            weights[:, positions] = shardWeights
+        return weights
+
+    def stop(self):
+        """
+        Finish the worker processes and release the shared memory
+        """
+        for connection in self.connections:
+            try:
+                connection.send(("stop", ()))
+            except (OSError, ValueError):
+                pass
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        for connection in self.connections:
+            connection.close()
+        self.connections, self.processes = [], []
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+
+def _partition_worker(spec, connection, barrier, sharedName, layout, bufferSize):
+    """
+    Main loop of the process of a partition: simulate its neurons and synapses on request of the main process
+
+    :param spec: populations and projections of the partition (see _Partitions._partition_spec)
+    :param connection: pipe with the main process, that sends (command, arguments) and receives the answers
+    :param barrier: barrier shared by all the partitions to synchronize each time step
+    :param sharedName: name of the shared memory with the spike vectors
+    :param layout: dict {population index: (offset, size)} of the spike vectors in the shared memory
+    :param bufferSize: size in bytes of one copy of all the spike vectors
+    """
+    global _state
+    _state = _State(spec["dt"], spec["batchSize"], fixedPoint=spec["fixedPoint"])
+    _state.tick = spec["tick"]
+    _state.populations = spec["populations"]
+    _state.projections = spec["projections"]
+    shared = shared_memory.SharedMemory(name=sharedName)
+    buffers = [{index: np.ndarray((_state.batchSize, size), dtype=bool, buffer=shared.buf,
+                                  offset=parity * bufferSize + offset)
+                for index, (offset, size) in layout.items()} for parity in range(2)]
+    load = {"neurons": sum(population.size for index, population in enumerate(_state.populations) if index in layout),
+            "synapses": sum(len(projection) for projection in _state.projections), "ticks": 0, "spikes": 0,
+            "synapticEvents": 0, "updateTime": 0.0, "propagateTime": 0.0, "waitTime": 0.0}
+    try:
+        while True:
+            command, args = connection.recv()
+            if command == "run":
+                _partition_run(args[0], spec["views"], buffers, barrier, layout, load)
+                connection.send(load)
+            elif command == "get_data":
+                index, variables, clear = args
+                connection.send(_state.populations[index]._take_record(variables, clear))
+            elif command == "get_weights":
+                projection = _state.projections[args[0]]
+                connection.send((projection.positions, projection.weights))
+            else:
+                break
+    except Exception as error:
+        try:
+            connection.send(error)
+        except OSError:
+            pass
+    finally:
+        del buffers
+        shared.close()
+
+
+def _partition_run(numTicks, views, buffers, barrier, layout, load):
+    """
+    Simulate numTicks time steps of a partition: update its neurons, publish their spikes, wait for the rest of
+    partitions and propagate the spikes of the whole pre populations to the synapses of the partition
+    """
+    for population in _state.populations:
+        population._prepare(_state.tick + numTicks)
+    for _ in range(numTicks):
+        tick = _state.tick
+        spikeVectors = buffers[tick % 2]
+        startTime = time.perf_counter()
+        for index, population in enumerate(_state.populations):
+            population._update(tick)
+            if index in layout:
+                start = population._partitionStart
+                spikeVectors[index][:, start:start + population.size] = population.spiked
+                load["spikes"] += int(np.count_nonzero(population.spiked))
+        updateTime = time.perf_counter()
+        barrier.wait()
+        waitTime = time.perf_counter()
+        for view in views:
+            view.spiked = spikeVectors[view.index]
+        for projection in _state.projections:
+            load["synapticEvents"] += int(projection.pre.spiked.sum(axis=0) @ projection._rowLengths)
+            projection._propagate(tick)
+        load["updateTime"] += updateTime - startTime
+        load["waitTime"] += waitTime - updateTime
+        load["propagateTime"] += time.perf_counter() - waitTime
+        load["ticks"] += 1
+        _state.tick += 1
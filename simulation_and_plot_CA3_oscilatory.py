@@ -1,9 +1,15 @@
 
 import random
 import utils
+import cache
+import instrumentation
 import CA3_oscilatory
 
 
+# Suffixes of the figures created by custom_plots (stored as savePath + saveName + "/" + saveName + suffix + ".png")
+FIGURES = ["_spikes_DG_CA3"]
+
+
 def custom_plots(fullPathFile, plot, save, saveName, savePath):
     """
     Processing the data from a simulation to get a visual representation of the result
@@ -41,12 +47,12 @@ def custom_plots(fullPathFile, plot, save, saveName, savePath):
 
     # Create a spike plot of all activations of DG and PC (CA3) neurons
     utils.plot_spike_pc_dg(spikesPC["data"], spikesDG["data"], timeStream, colors, 0.01, "Spikes DG-CA3", True, plot,
-                           save, saveName+ "_spikes_DG_CA3", savePath)
+                           save, saveName + FIGURES[0], savePath)
 
     return True
 
 
-def main(plot, save, savePath, execute, fullPathFile, saveName):
+def main(plot, save, savePath, execute, fullPathFile, saveName, useCache=False):
     """
     Execute the simulation of the network and/or create a visual representation of the data recorded
 
@@ -56,14 +62,21 @@ def main(plot, save, savePath, execute, fullPathFile, saveName):
     :param execute: if execute or not the simulation, in case of false, a fullPathFile is needed
     :param fullPathFile: the full path to the file with the data recorded from the simulation
     :param saveName: the base name used to store the generated files
+    :param useCache: if reuse the data file of a previous simulation with the same configuration instead of executing
+                     the simulation again (no report of the phases is written when the data is reused)
     :return:
     """
     # Execute the model if applicable
     if execute:
-        fullPathFile, filename = CA3_oscilatory.main()
+        if useCache:
+            fullPathFile, filename = cache.cached_run(CA3_oscilatory)
+        else:
+            fullPathFile, filename = CA3_oscilatory.main()
         saveName = filename
-    # Processing the data and plot it
+    # Processing the data and plot it (added to the phases of the execution if recordPhases)
+    instrumentation.start_phase("plot")
     custom_plots(fullPathFile, plot, save, saveName, savePath)
+    instrumentation.write_report(fullPathFile)
 
 
 if __name__ == "__main__":
@@ -76,10 +89,12 @@ if __name__ == "__main__":
     savePath = "plot/"
     # + If execute the network or take already generated data
     execute = True
+    # + If reuse the data of a previous simulation with the same configuration (see cache.py)
+    useCache = False
     # + If not execute, the full path to the file with the data recorded from the simulation and the base name used to store
     #   the generated files (txt, png, ...)
     fullPathFile = "data/CA3_simple_2021_11_18__12_42_34.txt"
     saveName = "CA3_simple_2021_11_18__12_42_34"
 
     # Simulation and/or representation
-    main(plot, save, savePath, execute, fullPathFile, saveName)
+    main(plot, save, savePath, execute, fullPathFile, saveName, useCache)
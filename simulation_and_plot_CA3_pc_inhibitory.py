@@ -1,10 +1,16 @@
 
 import random
 import utils
+import cache
+import instrumentation
 import CA3_pc_inhibitory
 import CA3_pc_inhibitory_static_syn
 
 
+# Suffixes of the figures created by custom_plots (stored as savePath + saveName + "/" + saveName + suffix + ".png")
+FIGURES = ["_spikes_DG_CA3"]
+
+
 def custom_plots(fullPathFile, plot, save, saveName, savePath):
     """
     Processing the data from a simulation to get a visual representation of the result
@@ -43,12 +49,12 @@ def custom_plots(fullPathFile, plot, save, saveName, savePath):
 
     # Create a spike plot of all activations of DG and PC (CA3) neurons
     utils.plot_spike_pc_dg(spikesPC["data"], spikesDG["data"], timeStream, colors, 0.01, "Spikes DG-CA3", True, plot,
-                           save, saveName + "_spikes_DG_CA3", savePath)
+                           save, saveName + FIGURES[0], savePath)
 
     return True
 
 
-def main(plot, save, savePath, execute, executeSTDPCA3, fullPathFile, saveName):
+def main(plot, save, savePath, execute, executeSTDPCA3, fullPathFile, saveName, useCache=False):
     """
     Execute the simulation of the network and/or create a visual representation of the data recorded
 
@@ -59,18 +65,22 @@ def main(plot, save, savePath, execute, executeSTDPCA3, fullPathFile, saveName):
     :param executeSTDPCA3: if execute dinamic or static version
     :param fullPathFile: the full path to the file with the data recorded from the simulation
     :param saveName: the base name used to store the generated files
+    :param useCache: if reuse the data file of a previous simulation with the same configuration instead of executing
+                     the simulation again (no report of the phases is written when the data is reused)
     :return:
     """
     # Execute the model if applicable
     if execute:
-        if executeSTDPCA3:
-            fullPathFile, filename = CA3_pc_inhibitory.main()
-            saveName = filename
+        model = CA3_pc_inhibitory if executeSTDPCA3 else CA3_pc_inhibitory_static_syn
+        if useCache:
+            fullPathFile, filename = cache.cached_run(model)
         else:
-            fullPathFile, filename = CA3_pc_inhibitory_static_syn.main()
-            saveName = filename
-    # Processing the data and plot it
+            fullPathFile, filename = model.main()
+        saveName = filename
+    # Processing the data and plot it (added to the phases of the execution if recordPhases)
+    instrumentation.start_phase("plot")
     custom_plots(fullPathFile, plot, save, saveName, savePath)
+    instrumentation.write_report(fullPathFile)
 
 
 if __name__ == "__main__":
@@ -85,10 +95,12 @@ if __name__ == "__main__":
     execute = True
     # + if execute dinamic or static version
     executeSTDPCA3 = True
+    # + If reuse the data of a previous simulation with the same configuration (see cache.py)
+    useCache = False
     # + If not execute, the full path to the file with the data recorded from the simulation and the base name used to store
     #   the generated files (txt, png, ...)
     fullPathFile = "data/CA3_simple_2021_11_18__12_42_34.txt"
     saveName = "CA3_simple_2021_11_18__12_42_34"
 
     # Simulation and/or representation
-    main(plot, save, savePath, execute, executeSTDPCA3, fullPathFile, saveName)
+    main(plot, save, savePath, execute, executeSTDPCA3, fullPathFile, saveName, useCache)
@@ -0,0 +1,128 @@
+"""
+Compressed sparse row (CSR) connectivity of a projection
+
+The synapses between a pre population of numPre neurons and a post population of numPost neurons are stored sorted by
+(src, dst): the synapses of the pre neuron i are the positions indptr[i]:indptr[i + 1] and indices holds their post
+neuron. The values of the synapses (weights, delays, STDP state) are arrays with one element per synapse in this order,
+so the memory grows with the number of synapses instead of numPre * numPost. A column view (synapses grouped by post
+neuron) is also kept to access the synapses that arrive to a neuron.
+"""
+
+import numpy as np
+
+
+def csr_ranges(indptr, rows):
+    """
+    Positions of the elements of several rows of a CSR structure
+
+    :param indptr: row pointers of the CSR structure
+    :param rows: array of row ids (they can be repeated)
+    :return: array with the index in rows of the owner of each element and array with the positions of the elements
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    owner = np.repeat(np.arange(len(rows)), counts)
+    # Position = start of the row + index of the element inside the row
+    positions = np.arange(int(counts.sum()), dtype=np.int64)
+    positions += (starts - (np.cumsum(counts) - counts))[owner]
+    return owner, positions
+
+
+def csr_order(src, dst):
+    """
+    Order that sorts the elements (src, dst) by src and dst
+
+    :param src: row of each element
+    :param dst: column of each element
+    :return: array of positions of the elements in sorted order (slice(None) if they are already sorted)
+    """
+    if np.all((src[1:] > src[:-1]) | ((src[1:] == src[:-1]) & (dst[1:] >= dst[:-1]))):
+        return slice(None)
+    return np.lexsort((dst, src))
+
+
+def csr_indptr(rows, numRows):
+    """
+    Row pointers of the sorted row ids of the elements of a CSR structure
+    """
+    return np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=numRows)))).astype(np.int64)
+
+
+def csr_to_dense(indptr, indices, values, numCols, fill=np.nan):
+    """
+    Convert the values of a CSR structure to a dense matrix
+
+    :param indptr: row pointers of the CSR structure
+    :param indices: column of each element
+    :param values: value of each element (the last axis are the elements, the rest are kept: (..., nnz))
+    :param numCols: number of columns of the matrix
+    :param fill: value of the non existing elements
+    :return: matrix (..., rows, cols)
+    """
+    values = np.asarray(values)
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    dense = np.full(values.shape[:-1] + (len(indptr) - 1, numCols), fill, dtype=np.result_type(values, type(fill)))
+    dense[..., rows, indices] = values
+    return dense
+
+
+# Mean number of synapses per neuron from which the rows (or columns) are processed one by one as slices instead of
+#   gathering all their synapses with a single index (faster for long rows, as in all-to-all connectivity)
+LONG_ROW_LENGTH = 256
+
+
+class Connectivity(object):
+    """
+    Synapses of a projection in CSR order and its column view
+    """
+
+    def __init__(self, src, dst, numPre, numPost):
+        """
+        :param src: pre neuron of each synapse (any order)
+        :param dst: post neuron of each synapse
+        :param numPre: number of neurons of the pre population
+        :param numPost: number of neurons of the post population
+        """
+        indexType = np.int32 if max(numPre, numPost) < 2 ** 31 else np.int64
+        src = np.asarray(src, dtype=indexType)
+        dst = np.asarray(dst, dtype=indexType)
+        # order: position in the given synapses of each synapse in CSR order (no copy if they are already sorted)
+        self.order = csr_order(src, dst)
+        self.src = src[self.order]
+        self.dst = dst[self.order]
+        self.numPre = numPre
+        self.numPost = numPost
+        self.indptr = csr_indptr(self.src, numPre)
+        self.colOrder = np.argsort(self.dst, kind="stable").astype(indexType)
+        self.colPtr = csr_indptr(self.dst, numPost)
+        self.longRows = len(self.src) >= LONG_ROW_LENGTH * max(numPre, 1)
+        self.longColumns = len(self.src) >= LONG_ROW_LENGTH * max(numPost, 1)
+
+    def __len__(self):
+        return len(self.src)
+
+    def rows(self, neurons):
+        """
+        Synapses that leave the given pre neurons
+
+        :param neurons: array of pre neuron ids (they can be repeated, as the same neuron in several trials)
+        :return: array with the index in neurons of the owner of each synapse and array with the synapse positions
+        """
+        return csr_ranges(self.indptr, neurons)
+
+    def columns(self, neurons):
+        """
+        Synapses that arrive to the given post neurons
+
+        :param neurons: array of post neuron ids (they can be repeated)
+        :return: array with the index in neurons of the owner of each synapse and array with the synapse positions
+        """
+        owner, positions = csr_ranges(self.colPtr, neurons)
+        return owner, self.colOrder[positions]
+
+    def to_dense(self, values, fill=np.nan):
+        """
+        Convert values of the synapses (..., synapse) to a dense matrix (..., pre, post)
+        """
+        return csr_to_dense(self.indptr, self.dst, values, self.numPost, fill)
@@ -0,0 +1,191 @@
+"""
+Compact spike trains of a population in compressed sparse row (CSR) format
+
+The spikes are stored as the time step (tick) of each spike in an int32 array sorted by neuron and tick, and the
+offsets of the spikes of each neuron: the spikes of neuron i are ticks[offsets[i]:offsets[i + 1]]. The same container is
+used for the input spikes of the models (SpikeSourceArray of the NumPy backend), the spikes recorded from the
+simulations (dataOut), the data files and the plots, so spike times are compared as integer ticks instead of floats.
+Iterating a SpikeTrains (or indexing a neuron) gives the spike times of each neuron in ms, as the list of lists of spike
+times used before, so it can also be given to sPyNNaker.
+"""
+
+import numpy as np
+import sparse
+
+
+class SpikeTrains(object):
+    """
+    Spike times of the neurons of a population as ticks in CSR order
+    """
+
+    def __init__(self, ticks, offsets, timeStep):
+        """
+        :param ticks: int32 array with the tick of each spike, sorted by neuron and tick
+        :param offsets: int64 array (neuron + 1) with the position of the first spike of each neuron (and the number of
+                        spikes at the end)
+        :param timeStep: time step (ms) of the ticks
+        """
+        self.ticks = np.asarray(ticks, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.timeStep = float(timeStep)
+        self._tickIndex = None
+
+    @classmethod
+    def from_events(cls, ticks, neurons, numNeurons, timeStep):
+        """
+        Create the spike trains from (tick, neuron) pairs in any order
+
+        :param ticks: tick of each spike
+        :param neurons: neuron of each spike
+        :param numNeurons: number of neurons of the population
+        :param timeStep: time step (ms) of the ticks
+        :return: SpikeTrains
+        """
+        ticks = np.asarray(ticks, dtype=np.int32)
+        neurons = np.asarray(neurons, dtype=np.int64)
+        order = np.lexsort((ticks, neurons))
+        return cls(ticks[order], sparse.csr_indptr(neurons[order], numNeurons), timeStep)
+
+    @classmethod
+    def from_times(cls, spikeTimes, timeStep, numNeurons=None):
+        """
+        Create the spike trains from spike times in ms (the times are rounded to the nearest tick)
+
+        :param spikeTimes: SpikeTrains (returned as is if it has the same time step), list with the spike times of each
+                           neuron (lists, arrays or neo spike trains) or list of spike times shared by all the neurons
+        :param timeStep: time step (ms) of the ticks
+        :param numNeurons: (optional) number of neurons, needed for spike times shared by all the neurons and checked
+                           against the number of spike trains in other case
+        :return: SpikeTrains or Raise an error if the number of spike trains does not match numNeurons
+        """
+        if isinstance(spikeTimes, SpikeTrains):
+            if spikeTimes.timeStep == float(timeStep):
+                return spikeTimes
+            return cls.from_times(spikeTimes.to_lists(), timeStep, numNeurons)
+        spikeTimes = list(spikeTimes)
+        if len(spikeTimes) > 0 and all(np.isscalar(times) for times in spikeTimes):
+            # The same spike times for all the neurons
+            numNeurons = 1 if numNeurons is None else numNeurons
+            ticks = np.unique(np.round(np.asarray(spikeTimes, dtype=float) / timeStep)).astype(np.int32)
+            return cls(np.tile(ticks, numNeurons), np.arange(numNeurons + 1, dtype=np.int64) * len(ticks), timeStep)
+        if numNeurons is None:
+            numNeurons = len(spikeTimes)
+        elif len(spikeTimes) == 0:
+            spikeTimes = [[] for _ in range(numNeurons)]
+        elif len(spikeTimes) != numNeurons:
+            raise ValueError("The number of spike trains (" + str(len(spikeTimes)) + ") does not match the size of the "
+                             "population (" + str(numNeurons) + ")")
+        arrays = [np.asarray(times.as_array() if hasattr(times, "as_array") else times, dtype=float).reshape(-1)
+                  for times in spikeTimes]
+        lengths = np.array([len(times) for times in arrays], dtype=np.int64)
+        times = np.concatenate(arrays + [np.zeros(0)])
+        ticks = np.round(times / timeStep).astype(np.int32)
+        return cls.from_events(ticks, np.repeat(np.arange(numNeurons), lengths), numNeurons, timeStep)
+
+    @classmethod
+    def from_matrix(cls, matrix, timeStep, firstTick=0):
+        """
+        Create the spike trains from a bool matrix (tick, neuron)
+
+        :param matrix: bool matrix (tick, neuron)
+        :param timeStep: time step (ms) of the ticks
+        :param firstTick: tick of the first row of the matrix
+        :return: SpikeTrains
+        """
+        neurons, ticks = np.nonzero(np.asarray(matrix).T)
+        return cls(ticks + firstTick, sparse.csr_indptr(neurons, matrix.shape[1]), timeStep)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, neuron):
+        """
+        :return: spike times (ms) of a neuron
+        """
+        return self.neuron_ticks(neuron) * self.timeStep
+
+    def __iter__(self):
+        for neuron in range(len(self)):
+            yield self[neuron]
+
+    def neuron_ticks(self, neuron):
+        """
+        :return: ticks of the spikes of a neuron (a view of the ticks array)
+        """
+        return self.ticks[self.offsets[neuron]:self.offsets[neuron + 1]]
+
+    def counts(self):
+        """
+        :return: array with the number of spikes of each neuron
+        """
+        return np.diff(self.offsets)
+
+    def num_spikes(self):
+        return int(self.offsets[-1])
+
+    def neurons(self):
+        """
+        :return: array with the neuron of each spike (in the order of the ticks array)
+        """
+        return np.repeat(np.arange(len(self)), self.counts())
+
+    def times(self):
+        """
+        :return: array with the time (ms) of each spike (in the order of the ticks array)
+        """
+        return self.ticks * self.timeStep
+
+    def to_lists(self):
+        """
+        :return: list with the spike times (ms) of each neuron as lists of floats
+        """
+        return [times.tolist() for times in self]
+
+    def to_matrix(self, numTicks, firstTick=0):
+        """
+        Convert the spike trains to a bool matrix (tick, neuron), ignoring the spikes out of the ticks of the matrix
+
+        :param numTicks: number of ticks of the matrix
+        :param firstTick: tick of the first row of the matrix
+        :return: bool matrix (tick, neuron)
+        """
+        matrix = np.zeros((numTicks, len(self)), dtype=bool)
+        rows = self.ticks.astype(np.int64) - firstTick
+        inside = (rows >= 0) & (rows < numTicks)
+        matrix[rows[inside], self.neurons()[inside]] = True
+        return matrix
+
+    def tick_index(self):
+        """
+        Index tick -> neurons that fire in that tick (built the first time it is needed)
+
+        :return: sorted array of the ticks with spikes, array of neuron ids sorted by tick and array with the position
+                 in the neuron ids array where the neurons of each tick begin (plus the total at the end)
+        """
+        if self._tickIndex is None:
+            neurons = self.neurons()
+            order = np.argsort(self.ticks, kind="stable")
+            ticks, starts = np.unique(self.ticks[order], return_index=True)
+            self._tickIndex = (ticks, neurons[order], np.append(starts, len(order)))
+        return self._tickIndex
+
+    def active_ticks(self):
+        """
+        :return: sorted array of the ticks where any neuron fires
+        """
+        return self.tick_index()[0]
+
+    def fired_at(self, tick):
+        """
+        :param tick: tick to look up
+        :return: array with the (sorted) ids of the neurons that fire in the tick
+        """
+        ticks, neurons, bounds = self.tick_index()
+        position = np.searchsorted(ticks, tick)
+        if position >= len(ticks) or ticks[position] != tick:
+            return neurons[:0]
+        return neurons[bounds[position]:bounds[position + 1]]
+
+    def __repr__(self):
+        return "SpikeTrains(neurons=" + str(len(self)) + ", spikes=" + str(self.num_spikes()) + ", timeStep=" + \
+            str(self.timeStep) + ")"
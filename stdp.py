@@ -0,0 +1,264 @@
+"""
+Spike pair STDP rule with additive weight dependence, as used in the PCL-PCL synapses
+
+The rule is computed with exponentially decaying traces of the pre and post spikes. In each time step: each pre spike
+depresses its synapses by A_minus * post trace, each post spike potentiates its synapses by A_plus * pre trace (weights
+bounded to [w_min, w_max]) and finally the traces of the neurons that have fired are increased by 1. As in SpiNNaker,
+the traces are only updated on the spikes of their neuron and decayed with lookup tables of the exponential
+(LookupTableSTDP), in float or in the int32 s16.15 fixed point of the board. The weights are stored per synapse in the
+CSR order of sparse.Connectivity. The same kernel is used by the NumPy backend (sim_numpy) to simulate the rule and to
+rebuild offline the history of weights from the recorded spikes. reference_spike_pair_additive evaluates the rule
+directly from all the pairs of spikes of each synapse, as a reference for the kernel.
+
++ params: dict with "tau_plus", "tau_minus", "A_plus", "A_minus", "w_min" and "w_max" (as synParameters["PCL-PCL"])
+"""
+
+import copy
+import numpy as np
+import fixedpoint
+import sparse
+import spikes
+
+
+def decay_table(tau, timeStep, size=None):
+    """
+    Lookup table of the exponential decay of a trace: exp(-k * timeStep / tau) for k time steps since the last spike,
+    ending with a 0 used for all the longer intervals (the table of SpiNNaker is also truncated)
+
+    :param tau: time constant of the trace (ms)
+    :param timeStep: time step of the simulation in ms
+    :param size: (optional) number of time steps of the table (by default, until the decay is below 2^-32)
+    :return: float array with size + 1 values
+    """
+    if size is None:
+        size = int(np.ceil(32 * np.log(2) * tau / timeStep)) + 1
+    return np.append(np.exp(-np.arange(size) * timeStep / tau), 0.0)
+
+
+def fixed_parameters(params):
+    """
+    Amplitudes and bounds of the rule in the fixed-point format of SpiNNaker
+
+    :param params: parameters of the rule
+    :return: dict with "A_plus", "A_minus", "w_min" and "w_max" in s16.15
+    """
+    return {name: fixedpoint.to_fixed(params[name]) for name in ("A_plus", "A_minus", "w_min", "w_max")}
+
+
+class LookupTableSTDP(object):
+    """
+    Spike pair rule with the per-neuron traces of SpiNNaker: each trace is stored as its value after the last spike of
+    the neuron and the tick of that spike, and its value at any tick is obtained with the lookup table of the decay
+    (decay_table). So the traces are not decayed in every time step: the time steps without spikes cost nothing and a
+    spike updates the whole row (pre spike) or column (post spike) of the weights at once, O(N) per spike.
+    """
+
+    def __init__(self, connectivity, batchSize, params, timeStep, fixedPoint=False):
+        """
+        :param connectivity: sparse.Connectivity of the synapses
+        :param batchSize: number of trials (first dimension of the weights)
+        :param params: parameters of the rule
+        :param timeStep: time step of the simulation in ms
+        :param fixedPoint: if compute with int32 weights and traces in s16.15 and u0.32 tables, as SpiNNaker (see
+                           fixedpoint)
+        """
+        self.connectivity = connectivity
+        self.fixedPoint = fixedPoint
+        plusTable = decay_table(params["tau_plus"], timeStep)
+        minusTable = decay_table(params["tau_minus"], timeStep)
+        if fixedPoint:
+            self.weightParams = fixed_parameters(params)
+            self.plusTable, self.minusTable = fixedpoint.to_decay(plusTable), fixedpoint.to_decay(minusTable)
+            self.multiply, self.one, dtype = fixedpoint.multiply, fixedpoint.ONE, np.int32
+        else:
+            self.weightParams = params
+            self.plusTable, self.minusTable = plusTable, minusTable
+            self.multiply, self.one, dtype = np.multiply, 1.0, float
+        # Value of the traces after the last spike and tick of that spike (trial, neuron)
+        self.preValue = np.zeros((batchSize, connectivity.numPre), dtype=dtype)
+        self.postValue = np.zeros((batchSize, connectivity.numPost), dtype=dtype)
+        self.preLast = np.zeros((batchSize, connectivity.numPre), dtype=np.int64)
+        self.postLast = np.zeros((batchSize, connectivity.numPost), dtype=np.int64)
+
+    def _decayed(self, values, last, table, tick):
+        """
+        Value of the traces at the given tick
+        """
+        factors = table[np.minimum(tick - last, len(table) - 1)]
+        return fixedpoint.decay(values, factors) if self.fixedPoint else values * factors
+
+    def traces(self, tick):
+        """
+        :return: traces of the pre and post neurons (trial, neuron) at the given tick, before its spikes
+        """
+        return (self._decayed(self.preValue, self.preLast, self.plusTable, tick),
+                self._decayed(self.postValue, self.postLast, self.minusTable, tick))
+
+    def step(self, weights, preSpiked, postSpiked, tick):
+        """
+        Apply the rule to the spikes of a time step, modifying in place the weights: each pre spike depresses its
+        synapses by A_minus * post trace, each post spike potentiates its synapses by A_plus * pre trace (weights
+        bounded to [w_min, w_max]) and finally the traces of the neurons that have fired are increased by 1
+
+        :param weights: weights with shape (trial, synapse), synapses in the order of connectivity
+        :param preSpiked: bool matrix (trial, pre) of pre neurons that have fired in this time step
+        :param postSpiked: bool matrix (trial, post) of post neurons that have fired in this time step
+        :param tick: index of the time step
+        """
+        if not preSpiked.any() and not postSpiked.any():
+            return
+        preTrace, postTrace = self.traces(tick)
+        _update_weights(weights, self.connectivity, preTrace, postTrace, preSpiked, postSpiked, self.weightParams,
+                        self.multiply)
+        self.preValue[preSpiked] = preTrace[preSpiked] + self.one
+        self.preLast[preSpiked] = tick
+        self.postValue[postSpiked] = postTrace[postSpiked] + self.one
+        self.postLast[postSpiked] = tick
+
+    def reset(self):
+        """
+        Clear the traces (time 0)
+        """
+        for array in (self.preValue, self.postValue, self.preLast, self.postLast):
+            array[:] = 0
+
+    def shard(self, connectivity, start, stop):
+        """
+        Copy of the rule for the synapses that arrive to the post neurons start:stop (partitioned mode)
+
+        :param connectivity: sparse.Connectivity of the synapses of the shard
+        :return: LookupTableSTDP with the traces of all the pre neurons and of the post neurons of the shard
+        """
+        shard = copy.copy(self)
+        shard.connectivity = connectivity
+        shard.preValue, shard.preLast = self.preValue.copy(), self.preLast.copy()
+        shard.postValue = self.postValue[:, start:stop].copy()
+        shard.postLast = self.postLast[:, start:stop].copy()
+        return shard
+
+
+def _update_weights(weights, connectivity, preTrace, postTrace, preSpiked, postSpiked, params, multiply):
+    """
+    Depression of the synapses of the pre neurons that have fired and potentiation of the synapses of the post neurons
+    that have fired, modifying the weights in place
+
+    :param params: "A_plus", "A_minus", "w_min" and "w_max" in the format of the weights
+    :param multiply: product of an amplitude and the traces in the format of the weights
+    """
+    # Flat views (trial * size + index) to access the elements of several trials with a single index
+    flatWeights = weights.reshape(-1)
+    numSynapses = weights.shape[1]
+    # Depression: a pre spike after post spikes
+    trials, neurons = np.nonzero(preSpiked)
+    if len(trials) > 0 and connectivity.longRows:
+        for trial, neuron in zip(trials.tolist(), neurons.tolist()):
+            start, stop = connectivity.indptr[neuron], connectivity.indptr[neuron + 1]
+            row = weights[trial, start:stop]
+            row -= multiply(params["A_minus"], postTrace[trial, connectivity.dst[start:stop]])
+            np.clip(row, params["w_min"], params["w_max"], out=row)
+    elif len(trials) > 0:
+        owner, synapses = connectivity.rows(neurons)
+        trials = trials[owner]
+        flat = trials * numSynapses + synapses
+        traces = postTrace.reshape(-1)[trials * postTrace.shape[1] + connectivity.dst[synapses]]
+        flatWeights[flat] = np.clip(flatWeights[flat] - multiply(params["A_minus"], traces), params["w_min"],
+                                    params["w_max"])
+    # Potentiation: a post spike after pre spikes
+    trials, neurons = np.nonzero(postSpiked)
+    if len(trials) > 0 and connectivity.longColumns:
+        for trial, neuron in zip(trials.tolist(), neurons.tolist()):
+            synapses = connectivity.colOrder[connectivity.colPtr[neuron]:connectivity.colPtr[neuron + 1]]
+            column = weights[trial, synapses] + multiply(params["A_plus"], preTrace[trial, connectivity.src[synapses]])
+            weights[trial, synapses] = np.clip(column, params["w_min"], params["w_max"])
+    elif len(trials) > 0:
+        owner, synapses = connectivity.columns(neurons)
+        trials = trials[owner]
+        flat = trials * numSynapses + synapses
+        traces = preTrace.reshape(-1)[trials * preTrace.shape[1] + connectivity.src[synapses]]
+        flatWeights[flat] = np.clip(flatWeights[flat] + multiply(params["A_plus"], traces), params["w_min"],
+                                    params["w_max"])
+
+
+def spike_matrix(spikeTrains, numTicks, timeStep):
+    """
+    Convert spike trains to a bool matrix (tick, neuron)
+
+    :param spikeTrains: spikes of each neuron (spikes.SpikeTrains, neo spike trains or list of lists of times in ms)
+    :param numTicks: number of time steps of the matrix
+    :param timeStep: time step of the simulation in ms
+    :return: bool matrix (tick, neuron)
+    """
+    return spikes.SpikeTrains.from_times(spikeTrains, timeStep).to_matrix(numTicks)
+
+
+def reference_spike_pair_additive(spikesPre, spikesPost, initWeights, params, timeStep):
+    """
+    Naive evaluation of the rule, synapse by synapse from all the pairs of its pre and post spikes (O(spikes^2) per
+    synapse), used as reference of LookupTableSTDP
+
+    :param spikesPre: spikes of the pre neurons (spikes.SpikeTrains, neo spike trains or list of lists)
+    :param spikesPost: spikes of the post neurons (spikes.SpikeTrains, neo spike trains or list of lists)
+    :param initWeights: initial weights as returned by Projection.get('weight', format='list', with_address=True)
+    :param params: parameters of the rule
+    :param timeStep: time step of the simulation in ms
+    :return: array (synapse, 3) of (pre, post, final weight) rows in the order of initWeights
+    """
+    preTrains = spikes.SpikeTrains.from_times(spikesPre, timeStep)
+    postTrains = spikes.SpikeTrains.from_times(spikesPost, timeStep)
+    finalWeights = np.asarray(initWeights, dtype=float).reshape(-1, 3).copy()
+    for synapse in finalWeights:
+        preTicks = preTrains.neuron_ticks(int(synapse[0]))
+        postTicks = postTrains.neuron_ticks(int(synapse[1]))
+        weight = synapse[2]
+        # Depression before potentiation in the same time step, each pair counted once (the earlier spike strictly
+        #   before the later one)
+        for tick in np.union1d(preTicks, postTicks):
+            if tick in preTicks:
+                elapsed = tick - postTicks[postTicks < tick]
+                weight -= params["A_minus"] * np.exp(-elapsed * timeStep / params["tau_minus"]).sum()
+                weight = min(max(weight, params["w_min"]), params["w_max"])
+            if tick in postTicks:
+                elapsed = tick - preTicks[preTicks < tick]
+                weight += params["A_plus"] * np.exp(-elapsed * timeStep / params["tau_plus"]).sum()
+                weight = min(max(weight, params["w_min"]), params["w_max"])
+        synapse[2] = weight
+    return finalWeights
+
+
+def reconstruct_weight_stream(spikesPre, spikesPost, initWeights, params, simTime, timeStep, fixedPoint=False):
+    """
+    Rebuild the weights of each time step of a simulation from the recorded spikes and the initial weights, instead
+    of reading them from the simulator after each time step
+
+    :param spikesPre: spikes of the pre neurons (spikes.SpikeTrains, neo spike trains or list of lists)
+    :param spikesPost: spikes of the post neurons (spikes.SpikeTrains, neo spike trains or list of lists)
+    :param initWeights: initial weights as returned by Projection.get('weight', format='list', with_address=True)
+    :param params: parameters of the rule
+    :param simTime: duration of the simulation in ms
+    :param timeStep: time step of the simulation in ms
+    :param fixedPoint: if apply the rule in the fixed point of SpiNNaker, as the fixed-point mode of sim_numpy
+    :return: synapse arrays of the weights at instant 0 and after each time step (the same that the loop
+             sim.run(timeStep) + Projection.get produces) -> {"src": (synapse), "dst": (synapse),
+             "w": float32 (T + 1, synapse)}, synapses sorted by src and dst
+    """
+    numTicks = int(round(simTime / timeStep))
+    preSpikes = spike_matrix(spikesPre, numTicks, timeStep)
+    postSpikes = spike_matrix(spikesPost, numTicks, timeStep)
+    # Initial state
+    initWeights = np.asarray(initWeights, dtype=float).reshape(-1, 3)
+    connectivity = sparse.Connectivity(initWeights[:, 0], initWeights[:, 1], len(spikesPre), len(spikesPost))
+    weights = initWeights[connectivity.order, 2][None, :].copy()
+    if fixedPoint:
+        weights = fixedpoint.to_fixed(weights)
+    rule = LookupTableSTDP(connectivity, 1, params, timeStep, fixedPoint)
+    # Apply the rule in the time steps with spikes (the weights do not change in the rest)
+    history = np.empty((numTicks + 1, len(connectivity)), dtype=np.float32)
+    history[0] = fixedpoint.to_float(weights[0]) if fixedPoint else weights[0]
+    lastTick = 0
+    for tick in np.nonzero(preSpikes.any(axis=1) | postSpikes.any(axis=1))[0]:
+        history[lastTick + 1:tick + 1] = history[lastTick]
+        rule.step(weights, preSpikes[tick][None, :], postSpikes[tick][None, :], tick)
+        history[tick + 1] = fixedpoint.to_float(weights[0]) if fixedPoint else weights[0]
+        lastTick = tick + 1
+    history[lastTick + 1:] = history[lastTick]
+    return {"src": connectivity.src, "dst": connectivity.dst, "w": history}
@@ -0,0 +1,217 @@
+"""
+Parameter sweep engine for the CA3 models
+
+A sweep is a list of trials, each one a dict {parameter path: value}, where the path indicates the module-level
+parameter of the model to change, with the keys separated by "." (for example "synParameters.PCL-PCL.tau_plus",
+"neuronParameters.PCL.tau_m" or "DGLSpikes"). Trials are generated with a grid or a random search and executed in a
+pool of processes with the NumPy backend (main_batch of the model). The parameters of a trial are built from copies of
+the module-level ones and passed explicitly to the model (params argument, see utils.get_model_parameters), so the
+module is never modified and trials never share state. The trials that only differ in their input spikes (DGLSpikes)
+are simulated together as the trials of a single batch.
+"""
+
+import copy
+import csv
+import importlib
+import itertools
+import os
+import random
+import time
+import numpy as np
+import metrics
+import spikes
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+
+#####################################
+# Generation of trials
+#####################################
+
+def grid_search(grid):
+    """
+    Generate all combinations of the values of the parameters
+
+    :param grid: dict {parameter path: list of values}
+    :return: list of trials {parameter path: value}
+    """
+    paths = list(grid.keys())
+    return [dict(zip(paths, values)) for values in itertools.product(*[grid[path] for path in paths])]
+
+
+def random_search(space, numTrials, seed=None):
+    """
+    Generate random combinations of the values of the parameters
+
+    :param space: dict {parameter path: (low, high) to take a uniform value or list of values to choose one}
+    :param numTrials: number of trials to generate
+    :param seed: (optional) seed of the random generator
+    :return: list of trials {parameter path: value}
+    """
+    generator = random.Random(seed)
+    trials = []
+    for _ in range(numTrials):
+        trial = {}
+        for path, values in space.items():
+            if isinstance(values, tuple):
+                trial[path] = generator.uniform(values[0], values[1])
+            else:
+                trial[path] = generator.choice(values)
+        trials.append(trial)
+    return trials
+
+
+#####################################
+# Execution of trials
+#####################################
+
+def trial_parameters(module, trial):
+    """
+    Parameters of the model for a trial, built from copies of the module-level parameters (the module is not modified)
+
+    :param module: module of the model
+    :param trial: dict {parameter path: value}, the input spikes of DG ("DGLSpikes") are not included (they are the
+                  cue of the trial in the batch, see run_trials)
+    :return: dict {name: value} with the module-level parameters changed by the trial (params of the model)
+    """
+    params = {}
+    for path, value in trial.items():
+        keys = path.split(".")
+        if keys[0] == "DGLSpikes":
+            continue
+        if len(keys) == 1:
+            params[keys[0]] = value
+            continue
+        if keys[0] not in params:
+            params[keys[0]] = copy.deepcopy(getattr(module, keys[0]))
+        container = params[keys[0]]
+        for key in keys[1:-1]:
+            container = container[key]
+        container[keys[-1]] = value
+    return params
+
+
+def group_trials(trials, maxBatch=None):
+    """
+    Group the trials that only differ in their input spikes (DGLSpikes), to simulate each group in a single batch
+
+    :param trials: list of trials {parameter path: value}
+    :param maxBatch: (optional) max number of trials of a group (by default, no limit)
+    :return: list of groups, each one a list with the indexes of its trials
+    """
+    groups = {}
+    for indexTrial, trial in enumerate(trials):
+        key = repr(sorted((path, value) for path, value in trial.items() if path != "DGLSpikes"))
+        groups.setdefault(key, []).append(indexTrial)
+    maxBatch = maxBatch or len(trials) or 1
+    return [indexes[start:start + maxBatch] for indexes in groups.values()
+            for start in range(0, len(indexes), maxBatch)]
+
+
+def summary_metrics(dataOut):
+    """
+    Compute simple metrics of the result of a trial
+
+    :param dataOut: data of the simulation of the trial
+    :return: dict with the number of PC spikes, the number of PC neurons that have fired, the mean and max PCL-PCL
+             final weight (if available) and the summary of the recall metrics (see metrics.summarize_recall)
+    """
+    summary = {}
+    for variable in dataOut["variables"]:
+        if variable["type"] == "spikes" and variable["popNameShort"] == "PCL":
+            spikeTrains = spikes.SpikeTrains.from_times(variable["data"], dataOut["timeStep"])
+            summary["spikesPC"] = spikeTrains.num_spikes()
+            summary["activePC"] = int(np.count_nonzero(spikeTrains.counts()))
+        elif variable["type"] in ("wFinal", "w") and variable["popNameShort"] == "PCL-PCL":
+            weights = variable["data"]["w"] if variable["type"] == "wFinal" else variable["data"]["w"][-1]
+            summary["meanWeightPCL_PCL"] = float(np.nanmean(weights))
+            summary["maxWeightPCL_PCL"] = float(np.nanmax(weights))
+    summary.update(metrics.summarize_recall(metrics.recall_metrics_from_data(dataOut)))
+    return summary
+
+
+def run_trials(task):
+    """
+    Execute a group of trials that only differ in their input spikes in a single batch simulation (in a worker process)
+
+    :param task: (model module name, list with the index of each trial, list of trials {parameter path: value},
+                 additional metric functions, keep dataOut)
+    :return: list with the row of the results table of each trial -> {"trial", parameter paths..., metrics...,
+             "batchSize", "time" (time of the batch divided by its size)[, "dataOut"]}
+    """
+    modelName, indexTrials, trials, extraMetrics, keepData = task
+    module = importlib.import_module(modelName)
+    params = trial_parameters(module, trials[0])
+    cues = [trial.get("DGLSpikes", module.DGLSpikes) for trial in trials]
+
+    startTime = time.time()
+    dataOutBatch, _ = module.main_batch(cues, params=params)
+    rows = []
+    for indexTrial, trial, dataOut in zip(indexTrials, trials, dataOutBatch):
+        row = {"trial": indexTrial}
+        row.update(trial)
+        row.update(summary_metrics(dataOut))
+        for name, function in extraMetrics.items():
+            row[name] = function(dataOut)
+        row["batchSize"] = len(trials)
+        if keepData:
+            row["dataOut"] = dataOut
+        rows.append(row)
+    elapsed = (time.time() - startTime) / len(trials)
+    for row in rows:
+        row["time"] = elapsed
+    return rows
+
+
+def run_sweep(modelName, trials, numWorkers=None, extraMetrics=None, keepData=False, maxBatch=None):
+    """
+    Execute all the trials of a sweep in a pool of processes, the trials that only differ in their input spikes are
+    simulated in a single batch
+
+    :param modelName: name of the module of the model ("CA3_oscilatory", "CA3_pc_inhibitory", ...)
+    :param trials: list of trials {parameter path: value} (see grid_search and random_search)
+    :param numWorkers: (optional) number of worker processes (by default, the number of cores)
+    :param extraMetrics: (optional) dict {name: function(dataOut) -> value} of additional metrics, functions must be
+                         defined at module level to be sent to the workers
+    :param keepData: if include the dataOut of each trial in the results table
+    :param maxBatch: (optional) max number of trials simulated in a batch (by default, no limit)
+    :return: results table -> list of rows {"trial", parameter paths..., metrics..., "batchSize", "time"[, "dataOut"]}
+             in the order of the trials
+    """
+    numWorkers = os.cpu_count() if numWorkers is None else numWorkers
+    tasks = [(modelName, indexes, [trials[indexTrial] for indexTrial in indexes], extraMetrics or {}, keepData)
+             for indexes in group_trials(trials, maxBatch)]
+    chunkSize = max(1, len(tasks) // (numWorkers * 4))
+    with ProcessPoolExecutor(max_workers=numWorkers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        rows = [row for rows in executor.map(run_trials, tasks, chunksize=chunkSize) for row in rows]
+    return sorted(rows, key=lambda row: row["trial"])
+
+
+def write_table(table, fullPath):
+    """
+    Store the results table of a sweep (without the dataOut of the trials) in a CSV file
+
+    :param table: results table of run_sweep
+    :param fullPath: path + filename of the CSV file
+    :return: full path of the file
+    """
+    columns = []
+    for row in table:
+        for column in row:
+            if column != "dataOut" and column not in columns:
+                columns.append(column)
+    with open(fullPath, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(table)
+    return fullPath
+
+
+if __name__ == "__main__":
+    # Sweep of the STDP parameters of the regulated model
+    sweepTrials = grid_search({"synParameters.PCL-PCL.tau_plus": [5.0, 9.0, 13.0],
+                               "synParameters.PCL-PCL.A_plus": [3.0, 6.0],
+                               "neuronParameters.PCL.tau_m": [3.0, 5.0]})
+    results = run_sweep("CA3_pc_inhibitory", sweepTrials)
+    print("Sweep stored in: " + write_table(results, "data/sweep_CA3_pc_inhibitory_" +
+                                            time.strftime("%Y_%m_%d__%H_%M_%S") + ".csv"))
@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+"""
+Common fixtures of the tests. The modules of the repository are flat scripts at its root, so it is added to the path
+"""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Execute the test in a temporal folder with the data/ folder where the models store their data files
+    """
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
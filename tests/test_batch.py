@@ -0,0 +1,99 @@
+import copy
+import numpy as np
+import pytest
+import utils
+import CA3_oscilatory
+import CA3_pc_inhibitory
+import CA3_pc_inhibitory_static_syn
+
+"""
+Batch mode (main_batch): each trial of a batch gives the same result as the trial simulated alone
+"""
+
+
+def half_cue(DGLSpikes):
+    """
+    Input spikes with only the even neurons of DG, so the trials of a batch are different
+    """
+    return [times if neuron % 2 == 0 else [] for neuron, times in enumerate(DGLSpikes)]
+
+
+def get_variable(dataOut, varType, popNameShort):
+    return next(variable for variable in dataOut["variables"]
+                if variable["type"] == varType and variable["popNameShort"] == popNameShort)
+
+
+def spike_lists(data):
+    """
+    Spike times of each neuron as lists (a flat list of times is considered one time per neuron)
+    """
+    return [np.atleast_1d(np.asarray(times, dtype=float)).tolist() for times in data]
+
+
+def assert_same_data(dataOut, expected):
+    for variable in expected["variables"]:
+        other = get_variable(dataOut, variable["type"], variable["popNameShort"])
+        if variable["type"] == "spikes":
+            assert spike_lists(other["data"]) == spike_lists(variable["data"])
+        elif isinstance(variable["data"], dict):
+            for key, values in variable["data"].items():
+                np.testing.assert_allclose(np.asarray(other["data"][key], dtype=float),
+                                           np.asarray(values, dtype=float), atol=1e-9)
+        else:
+            np.testing.assert_allclose(np.asarray(other["data"], dtype=float),
+                                       np.asarray(variable["data"], dtype=float), atol=1e-9)
+
+
+def test_regulated_batch_equals_single_runs():
+    cues = [CA3_pc_inhibitory.DGLSpikes, half_cue(CA3_pc_inhibitory.DGLSpikes)]
+    dataOutBatch, files = CA3_pc_inhibitory.main_batch(cues)
+    assert files == []
+    for DGLSpikes, dataOut in zip(cues, dataOutBatch):
+        assert_same_data(dataOut, CA3_pc_inhibitory.main_batch([DGLSpikes])[0][0])
+
+
+def test_regulated_batch_equals_main(workdir):
+    fullPath, filename = CA3_pc_inhibitory.main()
+    dataOut = CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes])[0][0]
+    assert_same_data(dataOut, utils.read_file(fullPath))
+
+
+def test_oscilatory_batch_equals_single_runs(workdir):
+    cues = [CA3_oscilatory.DGLSpikes, half_cue(CA3_oscilatory.DGLSpikes)]
+    dataOutBatch, files = CA3_oscilatory.main_batch(cues, store=True)
+    assert len(files) == 2
+    for DGLSpikes, dataOut in zip(cues, dataOutBatch):
+        assert_same_data(dataOut, CA3_oscilatory.main_batch([DGLSpikes])[0][0])
+    fullPath, filename = CA3_oscilatory.main()
+    assert_same_data(dataOutBatch[0], utils.read_file(fullPath))
+
+
+def test_static_batch_equals_single_runs(workdir, monkeypatch):
+    fullPath, filename = CA3_pc_inhibitory.main()
+    synParameters = copy.deepcopy(CA3_pc_inhibitory_static_syn.synParameters)
+    synParameters["PCL-PCL-origin"]["initWeight"] = fullPath
+    monkeypatch.setattr(CA3_pc_inhibitory_static_syn, "synParameters", synParameters)
+    cues = [CA3_pc_inhibitory_static_syn.DGLSpikes, half_cue(CA3_pc_inhibitory_static_syn.DGLSpikes)]
+    dataOutBatch, files = CA3_pc_inhibitory_static_syn.main_batch(cues)
+    for DGLSpikes, dataOut in zip(cues, dataOutBatch):
+        assert_same_data(dataOut, CA3_pc_inhibitory_static_syn.main_batch([DGLSpikes])[0][0])
+
+
+def test_batch_parameters_equal_module_parameters(monkeypatch):
+    synParameters = copy.deepcopy(CA3_pc_inhibitory.synParameters)
+    synParameters["PCL-PCL"]["tau_plus"] = 5.0
+    dataOut = CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes], params={"synParameters": synParameters})[0][0]
+    assert CA3_pc_inhibitory.synParameters["PCL-PCL"]["tau_plus"] != 5.0
+    monkeypatch.setattr(CA3_pc_inhibitory, "synParameters", synParameters)
+    assert_same_data(dataOut, CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes])[0][0])
+    with pytest.raises(ValueError):
+        CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes], params={"synParameter": synParameters})
+
+
+@pytest.mark.parametrize("module, name, value", [(CA3_oscilatory, "streamSegment", 10),
+                                                 (CA3_oscilatory, "attractorDetection", {"segment": 20}),
+                                                 (CA3_pc_inhibitory, "streamSegment", 10),
+                                                 (CA3_pc_inhibitory_static_syn, "streamSegment", 10)])
+def test_batch_rejects_streaming(module, name, value):
+    with pytest.raises(ValueError):
+        module.main_batch([module.DGLSpikes], params={name: value})
@@ -0,0 +1,51 @@
+import benchmark
+
+"""
+Network size scaling benchmark: generated inputs, execution of the cases and comparison against a baseline
+"""
+
+
+def test_generate_dg_spikes():
+    options = {"numPatterns": 2, "activeRatio": 0.25, "period": 10, "burst": 2, "seed": 1}
+    DGLSpikes = benchmark.generate_dg_spikes(20, 50, **options)
+    assert len(DGLSpikes) == 20
+    active = [neuron for neuron, times in enumerate(DGLSpikes) if times]
+    assert 5 <= len(active) <= 10
+    # Each presentation of a pattern fires burst consecutive ms
+    assert all(times[:2] == [times[0], times[0] + 1] for times in DGLSpikes if times)
+    assert DGLSpikes == benchmark.generate_dg_spikes(20, 50, **options)
+
+
+def test_run_benchmark(tmp_path):
+    results = benchmark.run_benchmark(sizes=[20])
+    assert [(result["model"], result["networkSize"]) for result in results] == \
+           [(model, 20) for model in benchmark.BENCHMARK_MODELS]
+    for result in results:
+        assert "error" not in result
+        assert set(result["times"]) == set(benchmark.BENCHMARK_PHASES)
+        assert result["bytesWritten"] > 0 and result["peakRSS"] > 0
+    fullPath = benchmark.write_results(results, str(tmp_path / "benchmark.json"))
+    assert benchmark.read_results(fullPath) == results
+    assert benchmark.compare_results(results, results) == []
+
+
+def test_compare_results():
+    base = {"model": "CA3_oscilatory", "networkSize": 100, "recordWeight": False, "total": 1.5, "peakRSS": 100.0,
+            "bytesWritten": 1000, "times": {phase: 0.3 for phase in benchmark.BENCHMARK_PHASES}}
+    slower = dict(base, times=dict(base["times"], run=0.6, write=0.32), total=1.82, peakRSS=105.0)
+    assert benchmark.compare_results([slower], [base]) == [("CA3_oscilatory", 100, "run", 0.3, 0.6)]
+    failed = dict(base, error="MemoryError()")
+    assert benchmark.compare_results([failed], [base]) == []
+    assert benchmark.compare_results([slower], [failed]) == []
+
+
+def test_large_cases_are_sparse_and_fit_in_memory(monkeypatch):
+    dense = {"model": "CA3_pc_inhibitory", "networkSize": 10000, "recordWeight": False, "connectivity": None}
+    sparse = dict(dense, connectivity=benchmark.BENCHMARK_SPARSE_CONNECTIVITY)
+    assert benchmark.estimate_memory(sparse) < benchmark.estimate_memory(dense) / 50
+    monkeypatch.setattr(benchmark, "available_memory", lambda: benchmark.estimate_memory(sparse) - 1)
+    monkeypatch.setattr(benchmark, "_run_case_process", lambda case: dict(case, error="executed"))
+    results = benchmark.run_benchmark(models=["CA3_pc_inhibitory"], sizes=[20, benchmark.BENCHMARK_SPARSE_SIZE * 2])
+    assert results[0]["connectivity"] is None and results[0]["error"] == "executed"
+    assert results[1]["connectivity"] == benchmark.BENCHMARK_SPARSE_CONNECTIVITY
+    assert results[1]["error"].startswith("not executed")
@@ -0,0 +1,132 @@
+import copy
+import inspect
+import os
+import pytest
+import cache
+import instrumentation
+import pipeline
+import simulation_and_plot_CA3_oscilatory
+import simulation_and_plot_CA3_pc_inhibitory
+import CA3_oscilatory
+import CA3_pc_inhibitory
+import CA3_pc_inhibitory_static_syn
+
+"""
+Cache of the simulation results: the key depends on every parameter of the configuration and an identical run is
+served from the cache
+"""
+
+MODELS = [CA3_oscilatory, CA3_pc_inhibitory, CA3_pc_inhibitory_static_syn]
+
+
+def changed(value):
+    """
+    A different value of a parameter of the same kind
+    """
+    if isinstance(value, bool):
+        return not value
+    if value is None:
+        return 1
+    if isinstance(value, (int, float)):
+        return value + 1
+    if isinstance(value, dict):
+        return dict(value, changed=1)
+    if isinstance(value, list):
+        return value + [[]]
+    return str(value) + "_changed"
+
+
+def key(module):
+    return cache.config_key(cache.model_config(module))
+
+
+@pytest.mark.parametrize("module", MODELS, ids=lambda module: module.__name__)
+def test_key_changes_with_every_parameter(module, monkeypatch):
+    reference = key(module)
+    assert key(module) == reference
+    names = [name for name in cache.CONFIG_NAMES if hasattr(module, name)]
+    assert names
+    for name in names:
+        with monkeypatch.context() as context:
+            context.setattr(module, name, changed(getattr(module, name)))
+            assert key(module) != reference, name
+    assert key(module) == reference
+
+
+@pytest.mark.parametrize("name", ["eventDriven", "fixedPoint", "attractorDetection", "streamSegment",
+                                  "reconstructWeight", "recordPolicies"])
+def test_flags_are_part_of_the_key(name):
+    assert name in cache.CONFIG_NAMES
+
+
+def test_sources_of_the_tools_are_hashed():
+    sources = cache.model_config(CA3_oscilatory)["source"]
+    for name in ["CA3_oscilatory", CA3_oscilatory.sim.__name__, "utils", "stdp"]:
+        assert name in sources
+
+
+def test_cached_run_executes_once(workdir):
+    runs = []
+
+    def run():
+        runs.append(1)
+        fullPath = "data/result.dat"
+        with open(fullPath, "wb") as file:
+            file.write(b"0" * 10)
+        return fullPath, "result"
+
+    assert cache.cached_run(CA3_oscilatory, run) == ("data/result.dat", "result")
+    assert cache.cached_run(CA3_oscilatory, run) == ("data/result.dat", "result")
+    assert len(runs) == 1
+    assert os.path.isfile("data/" + cache.CACHE_INDEX_FILE)
+
+
+def test_no_report_on_cache_hit(workdir):
+    def run():
+        with open("data/result.dat", "wb") as file:
+            file.write(b"0" * 10)
+        return "data/result.dat", "result"
+
+    cache.cached_run(CA3_oscilatory, run)
+    # Phases measured by a previous execution in the same process are not reported for the cached file
+    instrumentation.enable(True)
+    instrumentation.start_phase("run")
+    cache.cached_run(CA3_oscilatory, run)
+    assert not instrumentation.is_enabled()
+    assert instrumentation.write_report("data/result.dat") is None
+
+
+@pytest.mark.parametrize("script", [simulation_and_plot_CA3_oscilatory, simulation_and_plot_CA3_pc_inhibitory],
+                         ids=lambda script: script.__name__)
+def test_cache_disabled_by_default(script):
+    assert inspect.signature(script.main).parameters["useCache"].default is False
+
+
+def test_static_model_keeps_its_key(workdir):
+    model = CA3_pc_inhibitory_static_syn
+    key = cache.config_key(cache.model_config(model))
+    synParameters = copy.deepcopy(model.synParameters)
+    dataOut = model.main_batch([model.DGLSpikes], trainedWeights=pipeline.trained_weights(CA3_pc_inhibitory.simulate()))
+    assert model.synParameters == synParameters
+    assert cache.config_key(cache.model_config(model)) == key
+    # The parameters of the trained synapses are only stored in the data of the recall
+    assert dataOut[0][0]["synParameters"]["PCL-PCL"] == CA3_pc_inhibitory.synParameters["PCL-PCL"]
+
+
+def test_evict_least_recently_used():
+    index = {name: {"fullPath": "missing_" + name, "size": 10, "lastUsed": lastUsed}
+             for name, lastUsed in [("old", 1.0), ("new", 3.0), ("middle", 2.0)]}
+    removed = cache.evict(index, maxBytes=20, maxEntries=None, keep="old")
+    assert removed == ["missing_middle"]
+    assert set(index) == {"old", "new"}
+
+
+def test_key_changes_with_input_file_contents(workdir):
+    with open("data/weights.dat", "wb") as file:
+        file.write(b"first")
+    config = {"synParameters": {"PCL-PCL-origin": {"initWeight": "data/weights.dat"}}, "timeStep": 1.0}
+    reference = cache.config_key(config)
+    assert cache.config_key({"timeStep": 1, "synParameters": config["synParameters"]}) == reference
+    with open("data/weights.dat", "wb") as file:
+        file.write(b"second")
+    assert cache.config_key(config) != reference
@@ -0,0 +1,95 @@
+import numpy as np
+import spikes
+import utils
+import CA3_pc_inhibitory
+
+"""
+Binary columnar data files: the data of a simulation written with write_data_file is read back unchanged
+"""
+
+
+def synthetic_data():
+    generator = np.random.default_rng(0)
+    spikeMatrix = generator.random((6, 50)) < 0.2
+    return {"scriptName": "test", "timeStep": 1.0, "simTime": 50, "synParameters": {"PCL-PCL": {"tau_plus": 9.0}},
+            "variables": [
+                {"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": 6,
+                 "data": [list(np.flatnonzero(row) * 1.0) for row in spikeMatrix]},
+                {"type": "v", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": 6,
+                 "data": generator.normal(-65.0, 3.0, (6, 50))},
+                {"type": "w", "popName": "PCL-PCL", "popNameShort": "PCL-PCL",
+                 "data": {"timeStamp": np.arange(3.0), "w": generator.random((3, 6, 6)).astype(np.float32)}},
+                {"type": "inputs", "popName": "DG Layer", "popNameShort": "DGL", "data": [[1.0, 4.0], [], [2.0]]}]}
+
+
+def spike_lists(data):
+    """
+    Spike times of each neuron as lists (a flat list of times is considered one time per neuron)
+    """
+    return [np.atleast_1d(np.asarray(times, dtype=float)).tolist() for times in data]
+
+
+def assert_same_variables(read, expected):
+    assert len(read["variables"]) == len(expected["variables"])
+    for variable, other in zip(expected["variables"], read["variables"]):
+        assert {key: value for key, value in other.items() if key != "data"} == \
+               {key: value for key, value in variable.items() if key != "data"}
+        data = variable["data"]
+        if isinstance(data, dict):
+            assert set(other["data"]) == set(data)
+            for key, values in data.items():
+                np.testing.assert_array_equal(other["data"][key], values)
+        elif isinstance(data, np.ndarray):
+            np.testing.assert_array_equal(other["data"], data)
+        else:
+            assert [list(values) for values in other["data"]] == data
+
+
+def test_write_read_round_trip(workdir):
+    data = synthetic_data()
+    utils.write_data_file("data/test.dat", data)
+    read = utils.read_file("data/test.dat")
+    assert {key: value for key, value in read.items() if key != "variables"} == \
+           {key: value for key, value in data.items() if key != "variables"}
+    assert_same_variables(read, data)
+
+
+def test_read_single_variable_and_header(workdir):
+    data = synthetic_data()
+    utils.write_data_file("data/test.dat", data)
+    assert utils.read_header("data/test.dat")["meta"]["synParameters"] == data["synParameters"]
+    np.testing.assert_array_equal(utils.read_variable("data/test.dat", "v", "PCL")["data"],
+                                  data["variables"][1]["data"])
+    assert utils.read_variable("data/test.dat", "v", "INHL") is False
+    assert utils.read_file("data/missing.dat") is False
+
+
+def test_read_legacy_text_file(workdir):
+    data = {"scriptName": "test", "timeStep": 1.0, "variables": [
+        {"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": 2, "data": [[1.0], []]}]}
+    with open("data/test.txt", "w") as file:
+        file.write(str(data))
+    read = utils.read_file("data/test.txt")
+    assert {key: value for key, value in read.items() if key != "variables"} == \
+        {key: value for key, value in data.items() if key != "variables"}
+    # The spike times are read as spikes.SpikeTrains, as in the binary data files
+    assert isinstance(read["variables"][0]["data"], spikes.SpikeTrains)
+    assert read["variables"][0]["data"].to_lists() == [[1.0], []]
+    variable = utils.read_variable("data/test.txt", "spikes", "PCL")
+    assert variable["numNeurons"] == 2 and variable["data"].to_lists() == [[1.0], []]
+
+
+def test_model_data_round_trip(workdir):
+    dataOut = CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes])[0][0]
+    fullPath, _ = utils.write_file("data/", "CA3_pc_inhibitory", dataOut)
+    assert fullPath.endswith(".dat")
+    read = utils.read_file(fullPath)
+    for variable, other in zip(dataOut["variables"], read["variables"]):
+        assert (other["type"], other["popNameShort"]) == (variable["type"], variable["popNameShort"])
+        if variable["type"] == "spikes":
+            assert spike_lists(other["data"]) == spike_lists(variable["data"])
+        elif isinstance(variable["data"], dict):
+            for key, values in variable["data"].items():
+                np.testing.assert_array_equal(other["data"][key], np.asarray(values))
+        else:
+            np.testing.assert_array_equal(other["data"], np.asarray(variable["data"], dtype=float))
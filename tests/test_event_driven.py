@@ -0,0 +1,81 @@
+import copy
+import numpy as np
+import pytest
+import pipeline
+import sim_numpy
+import CA3_pc_inhibitory
+import CA3_pc_inhibitory_static_syn
+
+"""
+Event-driven mode of the NumPy backend (eventDriven): same spikes and weights as the clock-driven simulation, v within
+the rounding of the closed-form solution
+"""
+
+
+def get_variable(dataOut, varType, popNameShort):
+    return next(variable for variable in dataOut["variables"]
+                if variable["type"] == varType and variable["popNameShort"] == popNameShort)
+
+
+def spike_lists(data):
+    return [np.atleast_1d(np.asarray(times, dtype=float)).tolist() for times in data]
+
+
+def run_batch(module, eventDriven, monkeypatch):
+    monkeypatch.setattr(module, "eventDriven", eventDriven)
+    if module is CA3_pc_inhibitory_static_syn:
+        synParameters = copy.deepcopy(module.synParameters)
+        synParameters["PCL-PCL-origin"]["initWeight"] = pipeline.trained_weights(CA3_pc_inhibitory.simulate())
+        monkeypatch.setattr(module, "synParameters", synParameters)
+    else:
+        monkeypatch.setattr(module, "recordWeight", True)
+    return module.main_batch([module.DGLSpikes])[0][0]
+
+
+@pytest.mark.parametrize("module", [CA3_pc_inhibitory, CA3_pc_inhibitory_static_syn],
+                         ids=lambda module: module.__name__)
+def test_event_driven_equals_clock_driven(module, monkeypatch):
+    clockDriven = run_batch(module, False, monkeypatch)
+    eventDriven = run_batch(module, True, monkeypatch)
+    for variable in clockDriven["variables"]:
+        other = get_variable(eventDriven, variable["type"], variable["popNameShort"])
+        if variable["type"] == "spikes":
+            assert spike_lists(other["data"]) == spike_lists(variable["data"])
+        elif isinstance(variable["data"], dict):
+            for key, values in variable["data"].items():
+                np.testing.assert_allclose(other["data"][key], values, atol=1e-9, equal_nan=True)
+        else:
+            np.testing.assert_allclose(np.asarray(other["data"], dtype=float),
+                                       np.asarray(variable["data"], dtype=float), atol=1e-9)
+
+
+def single_neuron(eventDriven):
+    """
+    A neuron driven by two input spikes separated by a long silent period
+    """
+    sim_numpy.setup(timestep=1.0, event_driven=eventDriven)
+    source = sim_numpy.Population(1, sim_numpy.SpikeSourceArray(spike_times=[[5.0, 80.0]]))
+    neuron = sim_numpy.Population(1, sim_numpy.IF_curr_exp(tau_m=5.0, v_thresh=-55.0, v_reset=-70.0, v_rest=-65.0))
+    neuron.set(v=-65.0)
+    sim_numpy.Projection(source, neuron, sim_numpy.OneToOneConnector(),
+                         synapse_type=sim_numpy.StaticSynapse(weight=20.0, delay=1.0), receptor_type="excitatory")
+    neuron.record(["spikes", "v"])
+    sim_numpy.run(100)
+    segment = neuron.get_data(variables=["spikes", "v"]).segments[0]
+    sim_numpy.end()
+    return np.asarray(segment.spiketrains[0].times, dtype=float), np.asarray(segment.filter(name="v")[0].as_array())
+
+
+def test_event_driven_jumps_silent_periods():
+    spikesClock, vClock = single_neuron(False)
+    spikesEvent, vEvent = single_neuron(True)
+    assert len(spikesClock) > 0 and spikesClock.max() > 80.0
+    np.testing.assert_array_equal(spikesEvent, spikesClock)
+    # v is filled in for the skipped time steps
+    assert vEvent.shape == vClock.shape == (100, 1)
+    np.testing.assert_allclose(vEvent, vClock, atol=1e-9)
+
+
+def test_event_driven_not_with_partitions():
+    with pytest.raises(ValueError):
+        sim_numpy.setup(timestep=1.0, num_partitions=2, event_driven=True)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import utils
+import CA3_pc_inhibitory
+
+"""
+Final PCL-PCL weights of the training stored as their own record (wFinal) and read by get_last_stamp_synapse_list
+"""
+
+
+def get_variable(dataOut, varType, popNameShort):
+    return next(variable for variable in dataOut["variables"]
+                if variable["type"] == varType and variable["popNameShort"] == popNameShort)
+
+
+@pytest.mark.parametrize("recordWeight", [True, False])
+def test_last_stamp_from_final_weights(recordWeight, workdir, monkeypatch):
+    monkeypatch.setattr(CA3_pc_inhibitory, "recordWeight", recordWeight)
+    fullPath, _ = CA3_pc_inhibitory.main()
+    wFinal = utils.read_variable(fullPath, "wFinal", "PCL-PCL")["data"]
+    numNeurons = CA3_pc_inhibitory.popNeurons["PCLayer"]
+    np.testing.assert_array_equal(wFinal["shape"], [numNeurons, numNeurons])
+    assert len(wFinal["w"]) == numNeurons * (numNeurons - 1)
+    assert (utils.read_variable(fullPath, "w", "PCL-PCL") is not False) == recordWeight
+
+    synapses, synParameters = utils.get_last_stamp_synapse_list(fullPath, delay=2.0)
+    np.testing.assert_array_equal(synapses, utils.weight_csr_to_synapses(wFinal["indptr"], wFinal["indices"],
+                                                                         wFinal["w"], 2.0))
+    assert synParameters == CA3_pc_inhibitory.synParameters["PCL-PCL"]
+    if recordWeight:
+        # Same weights as the last time step of the history
+        weightStream = utils.read_variable(fullPath, "w", "PCL-PCL")["data"]
+        np.testing.assert_array_equal(weightStream["indices"], wFinal["indices"])
+        np.testing.assert_allclose(wFinal["w"], weightStream["w"][-1], rtol=1e-6)
+
+
+def test_last_stamp_without_final_weights(workdir):
+    dataOut = CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes])[0][0]
+    wFinal = get_variable(dataOut, "wFinal", "PCL-PCL")["data"]
+    dataOut["variables"] = [variable for variable in dataOut["variables"] if variable["type"] != "wFinal"]
+    fullPath, _ = utils.write_file("data/", "CA3_pc_inhibitory", dataOut)
+    synapses, _ = utils.get_last_stamp_synapse_list(fullPath)
+    np.testing.assert_allclose(synapses, utils.weight_csr_to_synapses(wFinal["indptr"], wFinal["indices"],
+                                                                      wFinal["w"]), rtol=1e-6)
+
+
+def test_last_stamp_from_dense_final_weights(workdir):
+    weights = np.array([[np.nan, 0.5], [0.25, np.nan]])
+    utils.write_data_file("data/dense.dat", {"synParameters": {"PCL-PCL": {}}, "variables": [
+        {"type": "wFinal", "popName": "PCL-PCL", "popNameShort": "PCL-PCL", "data": weights}]})
+    synapses, _ = utils.get_last_stamp_synapse_list("data/dense.dat")
+    np.testing.assert_array_equal(synapses, [[0, 1, 0.5, 1.0], [1, 0, 0.25, 1.0]])
+    np.testing.assert_array_equal(synapses, utils.weight_matrix_to_synapses(weights))
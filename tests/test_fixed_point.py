@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import fixedpoint
+import sim_numpy
+import utils
+import CA3_oscilatory
+import CA3_pc_inhibitory
+
+"""
+Fixed-point mode (fixedPoint): s16.15 arithmetic of SpiNNaker, with results that match the float simulation within the
+resolution of the format
+"""
+
+
+def test_conversions():
+    values = np.array([-65.0, -0.3, 0.0, 1e-5, 12.25, 1000.0])
+    np.testing.assert_allclose(fixedpoint.to_float(fixedpoint.to_fixed(values)), values, atol=0.5 / fixedpoint.ONE)
+    assert fixedpoint.to_fixed(1e6) == fixedpoint.INT32_MAX
+    assert fixedpoint.to_fixed(-1e6) == fixedpoint.INT32_MIN
+    assert fixedpoint.to_decay(1.0) == (1 << fixedpoint.DECAY_BITS) - 1
+    assert fixedpoint.to_decay(0.5) == 1 << (fixedpoint.DECAY_BITS - 1)
+
+
+def test_arithmetic_truncates_towards_minus_infinity():
+    a, b = fixedpoint.to_fixed([1.5, -1.5]), fixedpoint.to_fixed(0.5)
+    np.testing.assert_array_equal(fixedpoint.multiply(a, b), fixedpoint.to_fixed([0.75, -0.75]))
+    smallest = np.array([1, -1], dtype=np.int32)
+    np.testing.assert_array_equal(fixedpoint.multiply(smallest, fixedpoint.to_fixed(0.5)), [0, -1])
+    np.testing.assert_array_equal(fixedpoint.decay(smallest, fixedpoint.to_decay(0.5)), [0, -1])
+    assert fixedpoint.decay(fixedpoint.to_fixed(-65.0), fixedpoint.to_decay(0.5)) == fixedpoint.to_fixed(-32.5)
+
+
+def run_batch(module, fixedPoint, monkeypatch):
+    monkeypatch.setattr(module, "fixedPoint", fixedPoint)
+    monkeypatch.setattr(module, "recordWeight", True)
+    return module.main_batch([module.DGLSpikes])[0][0]
+
+
+@pytest.mark.parametrize("module", [CA3_oscilatory, CA3_pc_inhibitory], ids=lambda module: module.__name__)
+def test_fixed_point_matches_float(module, monkeypatch):
+    floatData = run_batch(module, False, monkeypatch)
+    fixedData = run_batch(module, True, monkeypatch)
+    assert utils._find_variable(fixedData, "spikes", "PCL")["data"].to_lists() == \
+        utils._find_variable(floatData, "spikes", "PCL")["data"].to_lists()
+    vFloat = np.asarray(utils._find_variable(floatData, "v", "PCL")["data"], dtype=float)
+    vFixed = np.asarray(utils._find_variable(fixedData, "v", "PCL")["data"], dtype=float)
+    # The batch mode computes in fixed point: v is rounded, but within 0.05 mV of the float simulation
+    assert 0 < np.abs(vFixed - vFloat).max() < 0.05
+    wFloat = utils._find_variable(floatData, "w", "PCL-PCL")["data"]["w"]
+    wFixed = utils._find_variable(fixedData, "w", "PCL-PCL")["data"]["w"]
+    np.testing.assert_allclose(wFixed, wFloat, atol=0.01, equal_nan=True)
+
+
+def test_fixed_point_single_run_equals_batch(monkeypatch):
+    monkeypatch.setattr(CA3_pc_inhibitory, "fixedPoint", True)
+    single = CA3_pc_inhibitory.simulate()
+    batch = CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes])[0][0]
+    np.testing.assert_array_equal(np.asarray(utils._find_variable(batch, "v", "PCL")["data"], dtype=float),
+                                  np.asarray(utils._find_variable(single, "v", "PCL")["data"], dtype=float))
+    np.testing.assert_array_equal(utils._find_variable(batch, "wFinal", "PCL-PCL")["data"]["w"],
+                                  utils._find_variable(single, "wFinal", "PCL-PCL")["data"]["w"])
+
+
+def test_fixed_point_not_with_event_driven():
+    with pytest.raises(ValueError):
+        sim_numpy.setup(timestep=1.0, event_driven=True, fixed_point=True)
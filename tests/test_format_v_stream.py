@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import sim_numpy
+import utils
+
+"""
+format_v_stream: same membrane potentials and NaN repair as the loop of previous versions
+"""
+
+
+def format_v_stream_loop(vStream):
+    """
+    format_v_stream of previous versions
+    """
+    formatV = []
+    rawStream = vStream.as_array().tolist()
+    numNeurons = len(rawStream[0])
+    for neuron in range(0, numNeurons):
+        formatV.append([item[neuron] for item in rawStream])
+    for indexNeuron, neuron in enumerate(formatV):
+        for indexTime, timeStamp in enumerate(neuron):
+            if str(formatV[indexNeuron][indexTime]) == "nan":
+                if indexTime == 0:
+                    formatV[indexNeuron][indexTime] = -60.0
+                elif indexTime >= len(neuron)-1:
+                    formatV[indexNeuron][indexTime] = formatV[indexNeuron][indexTime-1]
+                else:
+                    formatV[indexNeuron][indexTime] = (formatV[indexNeuron][indexTime-1] +
+                                                      formatV[indexNeuron][indexTime+1])/2
+    return formatV
+
+
+@pytest.mark.parametrize("numTimeStamps", [1, 2, 3, 40])
+@pytest.mark.parametrize("nanFraction", [0.0, 0.1, 0.5])
+def test_same_output_as_loop(numTimeStamps, nanFraction):
+    generator = np.random.default_rng(numTimeStamps)
+    values = generator.normal(-65.0, 3.0, (numTimeStamps, 7))
+    values[generator.random(values.shape) < nanFraction] = np.nan
+    # NaNs in the first and last time stamps and consecutive NaNs
+    values[0, 0] = values[-1, 1] = np.nan
+    values[:2, 2] = values[-2:, 3] = np.nan
+    vStream = sim_numpy.AnalogSignal(values, "v", 1.0)
+
+    expected = format_v_stream_loop(vStream)
+    formatV = utils.format_v_stream(vStream)
+    assert formatV.shape == (7, numTimeStamps)
+    np.testing.assert_array_equal(formatV, np.array(expected))
+    formatList = utils.format_v_stream(vStream, asList=True)
+    assert isinstance(formatList, list) and isinstance(formatList[0], list)
+    np.testing.assert_array_equal(np.array(formatList), np.array(expected))
+    # The signal is not modified
+    assert np.isnan(vStream.as_array()[0, 0])
@@ -0,0 +1,81 @@
+import json
+import os
+import pytest
+import cache
+import instrumentation
+import CA3_oscilatory
+import CA3_pc_inhibitory
+import CA3_pc_inhibitory_static_syn
+import simulation_and_plot_CA3_oscilatory
+
+"""
+Per-phase instrumentation: accumulated measures of the phases and report of the executions of the models
+"""
+
+
+@pytest.fixture(autouse=True)
+def disable_instrumentation():
+    yield
+    instrumentation.enable(False)
+
+
+def test_phases_accumulate():
+    instrumentation.enable()
+    for _ in range(3):
+        instrumentation.start_phase("run")
+        instrumentation.start_phase("get_weight")
+    instrumentation.start_phase("write")
+    instrumentation.end_phase()
+    instrumentation.end_phase()
+    report = instrumentation.get_report()
+    assert [(phase["name"], phase["calls"]) for phase in report["phases"]] == [("run", 3), ("get_weight", 3),
+                                                                               ("write", 1)]
+    assert all(phase["wallTime"] >= 0.0 for phase in report["phases"])
+    assert report["wallTime"] >= sum(phase["wallTime"] for phase in report["phases"])
+    assert report["peakRSS"] > 0
+
+
+def test_disabled_without_report(tmp_path):
+    instrumentation.enable(False)
+    instrumentation.start_phase("run")
+    assert not instrumentation.is_enabled()
+    assert instrumentation.get_report() is None
+    assert instrumentation.write_report(str(tmp_path / "data.dat")) is None
+
+
+@pytest.mark.parametrize("module, expected", [
+    (CA3_oscilatory, ["setup", "populations", "projections", "run", "get_data", "format", "write"]),
+    (CA3_pc_inhibitory, ["setup", "populations", "projections", "run", "get_weight", "get_data", "format", "write"])],
+    ids=["CA3_oscilatory", "CA3_pc_inhibitory"])
+def test_model_report(module, expected, workdir, monkeypatch):
+    monkeypatch.setattr(module, "recordPhases", True)
+    monkeypatch.setattr(module, "recordWeight", True)
+    monkeypatch.setattr(module, "reconstructWeight", False)
+    fullPath, _ = module.main()
+    with open(fullPath[:-len(".dat")] + "_phases.json") as file:
+        report = json.load(file)
+    assert report["dataFile"] == fullPath.split("/")[-1]
+    phases = {phase["name"]: phase for phase in report["phases"]}
+    assert set(expected) <= set(phases)
+    # The run of each time step of the weight record loop is reported once
+    simulationParameters = module.simulationParameters
+    assert phases["run"]["calls"] == int(simulationParameters["simTime"] / simulationParameters["timeStep"])
+
+
+def test_no_report_by_default(workdir):
+    assert not CA3_pc_inhibitory_static_syn.recordPhases
+    fullPath, _ = CA3_pc_inhibitory.main()
+    assert not (workdir / (fullPath[:-len(".dat")] + "_phases.json")).exists()
+
+
+def test_report_kept_on_cache_hit(workdir, monkeypatch):
+    monkeypatch.setattr(CA3_oscilatory, "recordPhases", True)
+    simulation_and_plot_CA3_oscilatory.main(False, False, "plot/", True, None, None, useCache=True)
+    fullPath = cache.read_index("data/")[cache.config_key(cache.model_config(CA3_oscilatory))]["fullPath"]
+    reportPath = os.path.splitext(fullPath)[0] + "_phases.json"
+    with open(reportPath) as file:
+        report = json.load(file)
+    assert "run" in [phase["name"] for phase in report["phases"]]
+    simulation_and_plot_CA3_oscilatory.main(False, False, "plot/", True, None, None, useCache=True)
+    with open(reportPath) as file:
+        assert json.load(file) == report
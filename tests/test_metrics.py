@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+import metrics
+import utils
+import CA3_pc_inhibitory
+
+"""
+Recall metrics: accuracy, false positives/negatives and latency of each cue on a hand-made simulation
+"""
+
+
+def synthetic_spikes():
+    """
+    Patterns {0, 1, 2} (0-1 ms) and {3, 4} (5 ms) stored, cue {0} at 10 ms completed at 13 ms with a false positive (5)
+    and cue {3} at 20 ms that only recalls 3
+    """
+    spikesDG = [[0.0, 1.0, 10.0], [0.0, 1.0], [0.0, 1.0], [5.0, 20.0], [5.0], []]
+    spikesPC = [[1.0, 11.0], [11.0], [13.0], [6.0, 21.0, 30.0], [6.0], [13.0]]
+    return spikesDG, spikesPC
+
+
+def matrix(spikes, numTicks):
+    spikeMatrix = np.zeros((numTicks, len(spikes)), dtype=bool)
+    for neuron, times in enumerate(spikes):
+        spikeMatrix[np.asarray(times, dtype=int), neuron] = True
+    return spikeMatrix
+
+
+def assert_synthetic_metrics(recall):
+    assert sorted(np.flatnonzero(pattern).tolist() for pattern in recall["patterns"]) == [[0, 1, 2], [3, 4]]
+    np.testing.assert_array_equal(recall["cueTime"], [10.0, 20.0])
+    np.testing.assert_array_equal(recall["cueNeurons"], [[1, 0, 0, 0, 0, 0], [0, 0, 0, 1, 0, 0]])
+    assert [np.flatnonzero(recall["patterns"][index]).tolist() for index in recall["pattern"]] == [[0, 1, 2], [3, 4]]
+    np.testing.assert_array_equal(recall["responseNeurons"], [[1, 1, 1, 0, 0, 1], [0, 0, 0, 1, 0, 0]])
+    np.testing.assert_array_equal(recall["accuracy"], [1.0, 0.5])
+    np.testing.assert_array_equal(recall["numFalsePositives"], [1, 0])
+    np.testing.assert_array_equal(recall["numFalseNegatives"], [0, 1])
+    np.testing.assert_array_equal(recall["falsePositive"][0], [0, 0, 0, 0, 0, 1])
+    np.testing.assert_array_equal(recall["falseNegative"][1], [0, 0, 0, 0, 1, 0])
+    np.testing.assert_array_equal(recall["latency"], [3.0, np.nan])
+
+
+def test_recall_metrics():
+    spikesDG, spikesPC = synthetic_spikes()
+    recall = metrics.recall_metrics(matrix(spikesDG, 40), matrix(spikesPC, 40), 1.0)
+    assert_synthetic_metrics(recall)
+    assert metrics.summarize_recall(recall) == {"numCues": 2, "meanAccuracy": 0.75, "completedRatio": 0.5,
+                                                "meanFalsePositives": 0.5, "meanFalseNegatives": 0.5,
+                                                "meanLatency": 3.0}
+
+
+def test_given_patterns_and_cue_start():
+    spikesDG, spikesPC = synthetic_spikes()
+    recall = metrics.recall_metrics(matrix(spikesDG, 40), matrix(spikesPC, 40), 0.5, patterns=[[3, 4], [0, 1, 2]],
+                                    cueStart=7.5)
+    # Time step of 0.5 ms: the cue of the tick 20 starts at 10 ms, the only one after 7.5 ms
+    np.testing.assert_array_equal(recall["cueTime"], [10.0])
+    np.testing.assert_array_equal(recall["pattern"], [0])
+    np.testing.assert_array_equal(recall["accuracy"], [0.5])
+    assert metrics.summarize_recall({"cueTime": np.zeros(0)})["numCues"] == 0
+
+
+def test_input_events():
+    inputMatrix = matrix([[1.0, 2.0, 3.0, 7.0], [1.0, 2.0]], 10)
+    starts, ends, eventNeurons = metrics.input_events(inputMatrix)
+    np.testing.assert_array_equal(starts, [1, 3, 7])
+    np.testing.assert_array_equal(ends, [3, 4, 8])
+    np.testing.assert_array_equal(eventNeurons, [[1, 1], [1, 0], [1, 0]])
+
+
+def test_recall_metrics_from_data(workdir):
+    spikesDG, spikesPC = synthetic_spikes()
+    data = {"timeStep": 1.0, "simTime": 40, "variables": [
+        {"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": 6, "data": spikesPC},
+        {"type": "spikes", "popName": "DG Layer", "popNameShort": "DGL", "numNeurons": 6, "data": spikesDG}]}
+    assert_synthetic_metrics(metrics.recall_metrics_from_data(data))
+    utils.write_data_file("data/synthetic.dat", data)
+    assert_synthetic_metrics(metrics.recall_metrics_from_data("data/synthetic.dat"))
+
+
+def test_model_recall():
+    dataOut = CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes])[0][0]
+    summary = metrics.summarize_recall(metrics.recall_metrics_from_data(dataOut))
+    assert summary["numCues"] > 0
+    assert 0.0 <= summary["meanAccuracy"] <= 1.0
@@ -0,0 +1,38 @@
+import numpy as np
+import sim_numpy
+import utils
+import CA3_pc_inhibitory
+
+"""
+Partitioned execution of the NumPy backend (num_partitions): same result as the simulation in a single process
+"""
+
+
+def simulate(numPartitions):
+    model = CA3_pc_inhibitory
+    sim_numpy.setup(timestep=model.simulationParameters["timeStep"], num_partitions=numPartitions)
+    try:
+        network = model.build_network(sim_numpy, model.DGLSpikes, model.LEARNINGSpikes)
+        sim_numpy.run(model.simulationParameters["simTime"])
+        segment = network["PCLayer"].get_data(variables=["spikes", "v"]).segments[0]
+        weights = np.asarray(network["PCL_PCL_conn"].get("weight", format="list", with_address=True), dtype=float)
+        load = sim_numpy.get_partition_load()
+    finally:
+        sim_numpy.end()
+    vMatrix = np.asarray(utils.format_neo_data("v", segment.filter(name="v")[0]), dtype=float)
+    spikeLists = [np.asarray(spikeTrain.times, dtype=float).tolist() for spikeTrain in segment.spiketrains]
+    return spikeLists, vMatrix, weights, load
+
+
+def test_partitions_equal_single_process():
+    spikesSerial, vSerial, weightsSerial, loadSerial = simulate(1)
+    spikesPartitioned, vPartitioned, weightsPartitioned, load = simulate(3)
+    assert loadSerial == []
+    assert len(load) == 3
+    assert sum(partition["neurons"] for partition in load) > 0
+    assert sum(len(times) for times in spikesSerial) > 0
+    assert spikesPartitioned == spikesSerial
+    np.testing.assert_allclose(vPartitioned, vSerial, atol=1e-9)
+    weightsSerial = weightsSerial[np.lexsort((weightsSerial[:, 1], weightsSerial[:, 0]))]
+    weightsPartitioned = weightsPartitioned[np.lexsort((weightsPartitioned[:, 1], weightsPartitioned[:, 0]))]
+    np.testing.assert_allclose(weightsPartitioned, weightsSerial, atol=1e-9)
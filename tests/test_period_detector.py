@@ -0,0 +1,79 @@
+import numpy as np
+import attractor
+import utils
+import CA3_oscilatory
+
+"""
+Detection of periodic attractors (attractor.PeriodDetector) and early termination of the oscillatory model
+"""
+
+
+def periodic_spikes(numTicks, period, numNeurons=6):
+    spikeMatrix = np.zeros((numTicks, numNeurons), dtype=bool)
+    for neuron in range(numNeurons):
+        spikeMatrix[neuron % period::period, neuron] = True
+    return spikeMatrix
+
+
+def test_detects_period_after_two_cycles():
+    detector = attractor.PeriodDetector(0, 1.0)
+    cycle = detector.update(periodic_spikes(20, 3))
+    assert cycle["periodTicks"] == 3 and cycle["period"] == 3.0
+    assert cycle["detectedTime"] == 6.0 and cycle["startTime"] == 0.0
+    assert cycle["assembly"] == list(range(6))
+
+
+def test_detects_period_across_segments():
+    spikeMatrix = periodic_spikes(40, 4)
+    spikeMatrix[:10] = np.random.default_rng(0).random((10, 6)) < 0.5
+    detector = attractor.PeriodDetector(10, 0.5)
+    assert detector.update(spikeMatrix[:12], firstTick=0) is None
+    cycle = detector.update(spikeMatrix[12:], firstTick=12)
+    assert cycle["periodTicks"] == 4 and cycle["period"] == 2.0
+    # The state before startTick is not considered
+    assert cycle["startTime"] >= 10 * 0.5
+
+
+def test_rest_only_with_v():
+    silent = np.zeros((10, 6), dtype=bool)
+    assert attractor.PeriodDetector(0, 1.0).update(silent) is None
+    cycle = attractor.PeriodDetector(0, 1.0).update(silent, np.full((10, 6), -65.0))
+    assert cycle["periodTicks"] == 1 and cycle["assembly"] == []
+
+
+def test_no_period_while_integrating():
+    silent = np.zeros((30, 6), dtype=bool)
+    integrating = -65.0 + np.linspace(0.0, 10.0, 30)[:, None] * np.ones(6)
+    assert attractor.PeriodDetector(0, 1.0).update(silent, integrating) is None
+
+
+def test_no_period_in_aperiodic_activity():
+    spikeMatrix = np.random.default_rng(1).random((200, 12)) < 0.5
+    assert attractor.PeriodDetector(0, 1.0).update(spikeMatrix) is None
+
+
+def test_partial_repeat_is_not_a_period():
+    # A B A C A B A C...: the repetition of A every 2 time steps is not confirmed by a whole cycle
+    states = [[True, False], [False, True], [True, False], [False, False]] * 3
+    cycle = attractor.PeriodDetector(0, 1.0).update(np.array(states))
+    assert cycle["periodTicks"] == 4 and cycle["detectedTime"] == 8.0
+
+
+def test_bounded_memory_and_max_period():
+    detector = attractor.PeriodDetector(0, 1.0, maxPeriod=5.0)
+    assert detector.update(periodic_spikes(60, 6)) is None
+    assert len(detector._spikeRows) == 5 and detector._digests.shape[0] == 5
+    assert attractor.PeriodDetector(0, 1.0, maxPeriod=6.0).update(periodic_spikes(60, 6))["periodTicks"] == 6
+
+
+def test_model_stops_at_attractor(workdir, monkeypatch):
+    monkeypatch.setattr(CA3_oscilatory, "simulationParameters",
+                        dict(CA3_oscilatory.simulationParameters, simTime=400, filename="attractor"))
+    monkeypatch.setattr(CA3_oscilatory, "attractorDetection", {"segment": 20, "vQuantum": 0.01})
+    fullPath, _ = CA3_oscilatory.main()
+    meta = utils.read_meta(fullPath)
+    assert meta["simTime"] < 400
+    assert meta["attractor"]["periodTicks"] >= 1
+    assert meta["attractor"]["detectedTime"] <= meta["simTime"]
+    numTicks = int(round(meta["simTime"] / meta["timeStep"]))
+    assert utils.read_variable(fullPath, "v", "PCL")["data"].shape[1] == numTicks
@@ -0,0 +1,59 @@
+import copy
+import os
+import cache
+import pipeline
+import utils
+import CA3_pc_inhibitory
+import CA3_pc_inhibitory_static_syn
+
+"""
+Train-then-recall pipeline: the trained weights are passed in memory without modifying the recall model
+"""
+
+
+def test_trained_weights_only_final():
+    weights = pipeline.trained_weights(CA3_pc_inhibitory.simulate())
+    assert [variable["type"] for variable in weights["variables"]] == ["wFinal"]
+    assert list(weights["synParameters"]) == ["PCL-PCL"]
+    assert weights["tag"] == CA3_pc_inhibitory.simulationParameters["filename"] + " (in memory)"
+
+
+def test_pipeline_keeps_recall_model(workdir):
+    synParameters = copy.deepcopy(CA3_pc_inhibitory_static_syn.synParameters)
+    key = cache.config_key(cache.model_config(CA3_pc_inhibitory_static_syn))
+    dataOutTraining, dataOutRecall, files = pipeline.run_pipeline(store=True)
+    assert CA3_pc_inhibitory_static_syn.synParameters == synParameters
+    assert cache.config_key(cache.model_config(CA3_pc_inhibitory_static_syn)) == key
+
+    # The header of the recall only references the data file of the training
+    (trainingPath, _), (recallPath, _) = files
+    assert utils.read_meta(recallPath)["synParameters"]["PCL-PCL-origin"]["initWeight"] == trainingPath
+    assert os.path.getsize(recallPath) < os.path.getsize(trainingPath)
+
+    # Same recall as reading the weights from the data file of the training
+    recall = CA3_pc_inhibitory_static_syn.simulate(trainingPath)
+    assert utils._find_variable(recall, "spikes", "PCL")["data"].to_lists() == \
+        utils._find_variable(dataOutRecall[0], "spikes", "PCL")["data"].to_lists()
+
+
+def test_pipeline_batch_of_cues():
+    cuesBatch = [CA3_pc_inhibitory_static_syn.DGLSpikes, [[] for _ in CA3_pc_inhibitory_static_syn.DGLSpikes]]
+    _, dataOutRecall, files = pipeline.run_pipeline(cuesBatch)
+    assert files == [] and len(dataOutRecall) == 2
+    assert utils._find_variable(dataOutRecall[0], "spikes", "PCL")["data"].num_spikes() > \
+        utils._find_variable(dataOutRecall[1], "spikes", "PCL")["data"].num_spikes()
+    for dataOut in dataOutRecall:
+        assert dataOut["synParameters"]["PCL-PCL-origin"]["initWeight"].endswith("(in memory)")
+
+
+def test_stream_recall_with_trained_weights(workdir, monkeypatch):
+    model = CA3_pc_inhibitory_static_syn
+    weights = pipeline.trained_weights(CA3_pc_inhibitory.simulate())
+    recall = model.simulate(weights)
+    monkeypatch.setattr(model, "streamSegment", 7)
+    fullPath, _ = model.main(weights)
+    meta = utils.read_meta(fullPath)
+    assert meta["synParameters"]["PCL-PCL-origin"]["initWeight"] == weights["tag"]
+    assert meta["synParameters"]["PCL-PCL"] == recall["synParameters"]["PCL-PCL"]
+    assert utils.read_variable(fullPath, "spikes", "PCL")["data"].to_lists() == \
+        utils._find_variable(recall, "spikes", "PCL")["data"].to_lists()
@@ -0,0 +1,94 @@
+import os
+import plot_batch
+import CA3_oscilatory
+import CA3_pc_inhibitory
+
+"""
+Batch plotting of archived data files: discovery of the files and their plot scripts, skip of the files whose figures
+are up to date and report of the batch
+"""
+
+
+def figure_paths(fullPath):
+    saveName = os.path.splitext(os.path.basename(fullPath))[0]
+    return plot_batch.get_figure_paths(plot_batch.get_plot_script(saveName), saveName, "plot/")
+
+
+def test_plot_script_of_each_model():
+    assert plot_batch.get_plot_script("CA3_oscilatory_2022_01_25__11_38_12") == "simulation_and_plot_CA3_oscilatory"
+    assert plot_batch.get_plot_script("CA3_pc_inhibitory_2022_01_25__11_38_12") == \
+        "simulation_and_plot_CA3_pc_inhibitory"
+    assert plot_batch.get_plot_script("CA3_pc_inhibitory_static_2022_01_25__11_38_12") == \
+        "simulation_and_plot_CA3_pc_inhibitory"
+    assert plot_batch.get_plot_script("sweep_2022_01_25__11_38_12") is None
+
+
+def test_plot_batch_and_skip_up_to_date(workdir):
+    dataPaths = [CA3_oscilatory.main()[0], CA3_pc_inhibitory.main()[0]]
+    with open("data/sweep_2022_01_25__11_38_12.txt", "w") as file:
+        file.write("{}")
+
+    summary, results = plot_batch.plot_batch("data/", "plot/", numWorkers=1)
+    numFigures = sum(len(figure_paths(fullPath)) for fullPath in dataPaths)
+    assert (summary["files"], summary["skipped"], summary["unknown"], summary["errors"]) == (2, 0, 1, 0)
+    assert summary["figures"] == numFigures > 0
+    assert summary["figuresPerSecond"] == summary["figures"] / summary["time"]
+    assert sorted(result["file"] for result in results) == sorted(dataPaths)
+    assert all(os.path.isfile(path) for fullPath in dataPaths for path in figure_paths(fullPath))
+    assert plot_batch.format_summary(summary).startswith("Plotted 2 files (" + str(numFigures) + " figures, 0 errors)")
+
+    # Only the data files newer than their figures are plotted again
+    older = os.path.getmtime(dataPaths[0]) - 10
+    os.utime(figure_paths(dataPaths[0])[0], (older, older))
+    tasks, upToDate, unknown = plot_batch.find_plot_tasks("data/", "plot/")
+    assert [task[0] for task in tasks] == [dataPaths[0]] and upToDate == [dataPaths[1]]
+    summary, results = plot_batch.plot_batch("data/", "plot/", numWorkers=1)
+    assert (summary["files"], summary["skipped"]) == (1, 1)
+    assert all(os.path.getmtime(path) >= os.path.getmtime(dataPaths[0]) for path in figure_paths(dataPaths[0]))
+    summary, _ = plot_batch.plot_batch("data/", "plot/", numWorkers=1, force=True)
+    assert (summary["files"], summary["skipped"]) == (2, 0)
+
+
+def write_legacy_file(module, filename):
+    """
+    Text file of previous versions (str of the data, spikes as lists of spike times) with the spikes of the model
+    """
+    dataOut = module.main_batch([module.DGLSpikes])[0][0]
+    legacy = {"scriptName": dataOut["scriptName"], "simTime": dataOut["simTime"], "timeStep": dataOut["timeStep"],
+              "variables": [dict(variable, data=variable["data"].to_lists()) for variable in dataOut["variables"]
+                            if variable["type"] == "spikes"]}
+    fullPath = "data/" + filename + ".txt"
+    with open(fullPath, "w") as file:
+        file.write(str(legacy))
+    return fullPath
+
+
+def test_plot_batch_of_binary_and_legacy_files(workdir):
+    dataPaths = [CA3_oscilatory.main()[0], write_legacy_file(CA3_oscilatory, "CA3_oscilatory_2022_01_25__11_38_12"),
+                 write_legacy_file(CA3_pc_inhibitory, "CA3_pc_inhibitory_2022_01_25__11_38_12")]
+    summary, results = plot_batch.plot_batch("data/", "plot/", numWorkers=2)
+    assert (summary["files"], summary["skipped"], summary["errors"]) == (3, 0, 0)
+    assert summary["figures"] == sum(len(figure_paths(fullPath)) for fullPath in dataPaths)
+    assert summary["figuresPerSecond"] > 0
+    assert all(os.path.isfile(path) for fullPath in dataPaths for path in figure_paths(fullPath))
+
+    # Nothing changed: all the files are skipped and no figure is created
+    summary, results = plot_batch.plot_batch("data/", "plot/", numWorkers=2)
+    assert (summary["files"], summary["skipped"], summary["figures"]) == (0, 3, 0)
+    assert summary["figuresPerSecond"] == 0 and results == []
+
+    # A rewritten legacy file is newer than its figures, so it is the only one plotted again
+    newer = max(os.path.getmtime(path) for path in figure_paths(dataPaths[1])) + 10
+    os.utime(dataPaths[1], (newer, newer))
+    summary, results = plot_batch.plot_batch("data/", "plot/", numWorkers=2)
+    assert (summary["files"], summary["skipped"], summary["errors"]) == (1, 2, 0)
+    assert [result["file"] for result in results] == [dataPaths[1]]
+    assert summary["figuresPerSecond"] == summary["figures"] / summary["time"]
+
+
+def test_plot_errors_are_reported(workdir):
+    with open("data/CA3_oscilatory_2022_01_25__11_38_12.dat", "wb") as file:
+        file.write(b"not a data file")
+    summary, results = plot_batch.plot_batch("data/", "plot/", numWorkers=1)
+    assert (summary["files"], summary["errors"], summary["figures"]) == (1, 1, 0)
+    assert "error" in results[0]
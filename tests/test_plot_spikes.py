@@ -0,0 +1,72 @@
+import os
+import numpy as np
+import spikes
+import utils
+import CA3_oscilatory
+import simulation_and_plot_CA3_oscilatory
+
+"""
+Raster plot of PC and DG spikes: time -> neurons index, labels and number of labels that fit in the figure
+"""
+
+
+def test_spike_time_index():
+    spikeTrains = spikes.SpikeTrains.from_times([[3.0, 1.0], [], [1.0], [5.0, 3.0]], 1.0)
+    stamps, neurons, bounds = utils.spike_time_index(spikeTrains)
+    np.testing.assert_array_equal(stamps, [1, 3, 5])
+    np.testing.assert_array_equal(neurons, [0, 2, 0, 3, 3])
+    np.testing.assert_array_equal(bounds, [0, 2, 4, 5])
+    stamps, neurons, bounds = utils.spike_time_index(spikes.SpikeTrains.from_times([[], []], 1.0))
+    assert len(stamps) == len(neurons) == 0
+    np.testing.assert_array_equal(bounds, [0])
+
+
+def test_spike_label():
+    # Time step of 0.5 ms: labels are looked up by tick
+    spikeTrains = spikes.SpikeTrains.from_times([[0.5], [0.5], [0.5, 1.0], [0.5]], 0.5)
+    assert utils._spike_label("PC", spikeTrains, 1, 10) == "PC0-1-2-3"
+    assert utils._spike_label("PC", spikeTrains, 1, 2) == "PC0-1(+2)"
+    assert utils._spike_label("PC", spikeTrains, 2, 10) == "PC2"
+    assert utils._spike_label("PC", spikeTrains, 3, 10) == ""
+
+
+def plot(spikesPC, spikesDG, simTime, monkeypatch, tmp_path):
+    figures = []
+    monkeypatch.setattr(utils.plt, "close", lambda *args: figures.append(utils.plt.gcf()))
+    spikesPC, spikesDG = spikes.SpikeTrains.from_times(spikesPC, 1.0), spikes.SpikeTrains.from_times(spikesDG, 1.0)
+    path = utils.plot_spike_pc_dg(spikesPC, spikesDG, list(range(simTime)), ["blue", "red"], 0.1, "test", True,
+                                  False, True, "spikes", str(tmp_path) + "/")
+    assert (tmp_path / "spikes.png").exists() and path == str(tmp_path) + "/spikes.png"
+    return figures[0]
+
+
+def test_plot_labels_each_time_stamp(monkeypatch, tmp_path):
+    figure = plot([[2.0, 4.0], [4.0]], [[1.0], []], 6, monkeypatch, tmp_path)
+    labels = sorted(text.get_text().strip() for text in figure.axes[0].texts)
+    assert labels == ["DG0", "PC0", "PC0-1"]
+    np.testing.assert_array_equal(figure.axes[0].get_xticks(), [1.0, 2.0, 4.0])
+    utils.plt.close(figure)
+
+
+def test_plot_caps_labels(monkeypatch, tmp_path):
+    generator = np.random.default_rng(0)
+    spikesPC = [list(np.flatnonzero(generator.random(1000) < 0.05) * 1.0) for _ in range(600)]
+    figure = plot(spikesPC, [[0.0]] * 10, 1000, monkeypatch, tmp_path)
+    maxLabels = int(figure.get_figwidth() * 72 / (15 * 1.5))
+    assert 0 < len(figure.axes[0].texts) <= maxLabels
+    assert all("(+" in text.get_text() for text in figure.axes[0].texts)
+    utils.plt.close(figure)
+
+
+def test_plot_legacy_text_file(workdir):
+    # Text file of previous versions: the spikes are stored as lists of spike times
+    dataOut = CA3_oscilatory.main_batch([CA3_oscilatory.DGLSpikes])[0][0]
+    legacy = {"scriptName": "CA3_oscilatory", "simTime": dataOut["simTime"], "timeStep": dataOut["timeStep"],
+              "variables": [dict(variable, data=variable["data"].to_lists()) for variable in dataOut["variables"]
+                            if variable["type"] == "spikes"]}
+    with open("data/CA3_oscilatory_legacy.txt", "w") as file:
+        file.write(str(legacy))
+    utils.check_folder("plot/")
+    assert simulation_and_plot_CA3_oscilatory.custom_plots("data/CA3_oscilatory_legacy.txt", False, True, "legacy",
+                                                           "plot/")
+    assert os.path.isfile("plot/legacy/legacy" + simulation_and_plot_CA3_oscilatory.FIGURES[0] + ".png")
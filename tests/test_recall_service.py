@@ -0,0 +1,130 @@
+import asyncio
+import copy
+import numpy as np
+import pytest
+import sim_numpy
+import pipeline
+import recall_service
+import CA3_pc_inhibitory
+import CA3_pc_inhibitory_static_syn
+
+"""
+Recall service: the cues sent over a local socket are answered with the response of the resident network, the same
+one as recalling each cue alone
+"""
+
+CUES = [[0, 1, 2], [3, 4], [5, 6, 7, 8], [0, 4, 9]]
+
+
+@pytest.fixture
+def network():
+    recallNetwork = recall_service.RecallNetwork(pipeline.trained_weights(CA3_pc_inhibitory.simulate()), maxBatch=4)
+    yield recallNetwork
+    recallNetwork.close()
+
+
+def expected_patterns(network, cueTimes):
+    patterns = []
+    for cue in CUES:
+        spikeTrains = network.recall([recall_service.cue_spikes({"cue": cue}, network.numDG, cueTimes)])[0]
+        patterns.append(spikeTrains.counts().nonzero()[0].tolist())
+    return patterns
+
+
+async def serve_requests(service, requests, unixPath=None):
+    server = await service.start(port=0, unixPath=unixPath)
+    port = None if unixPath is not None else server.sockets[0].getsockname()[1]
+    try:
+        return await recall_service.request_recalls(requests, port=port, unixPath=unixPath)
+    finally:
+        await service.stop(server)
+
+
+def test_recall_end_to_end(network):
+    service = recall_service.RecallService(network, batchWindow=50.0)
+    requests = [{"id": i, "cue": cue} for i, cue in enumerate(CUES)]
+    requests.append({"id": "spikes", "spikes": [[1.0] if neuron in CUES[0] else [] for neuron in range(network.numDG)]})
+    requests.append({"id": "invalid", "cue": [network.numDG]})
+    responses = {response["id"]: response for response in asyncio.run(serve_requests(service, requests))}
+
+    expected = expected_patterns(network, service.cueTimes)
+    for i, pattern in enumerate(expected):
+        assert responses[i]["pattern"] == pattern
+        assert "latency" in responses[i]
+    assert responses["spikes"]["pattern"] == expected[0]
+    assert "error" in responses["invalid"]
+    # The concurrent cues are simulated in micro-batches
+    assert max(response.get("batchSize", 0) for response in responses.values()) > 1
+    report = service.latency_report()
+    assert report["requests"] == len(CUES) + 1 and report["p50"] <= report["p99"] <= report["max"]
+
+
+def test_recall_unix_socket(network, tmp_path):
+    service = recall_service.RecallService(network)
+    responses = asyncio.run(serve_requests(service, [{"id": 0, "cue": CUES[1]}, {"stats": True}],
+                                           str(tmp_path / "recall.sock")))
+    # The report is written at once, before the response of the recall
+    report, response = sorted(responses, key=lambda item: "id" in item)
+    assert response["pattern"] == expected_patterns(network, service.cueTimes)[1]
+    assert report["requests"] == 0
+
+
+def test_reset_repeats_the_simulation():
+    sim_numpy.setup(timestep=1.0)
+    source = sim_numpy.Population(1, sim_numpy.SpikeSourceArray(spike_times=[[2.0]]))
+    neuron = sim_numpy.Population(1, sim_numpy.IF_curr_exp())
+    neuron.set(v=-60.0)
+    sim_numpy.Projection(source, neuron, sim_numpy.OneToOneConnector(),
+                         synapse_type=sim_numpy.StaticSynapse(weight=20.0, delay=1.0), receptor_type="excitatory")
+    neuron.record(["spikes", "v"])
+    results = []
+    for _ in range(2):
+        sim_numpy.run(20)
+        segment = neuron.get_data(variables=["spikes", "v"], clear=True).segments[0]
+        results.append((segment.spiketrains[0].times.tolist(), np.asarray(segment.filter(name="v")[0].as_array())))
+        sim_numpy.reset()
+        assert sim_numpy.get_current_time() == 0.0
+    sim_numpy.end()
+    assert len(results[0][0]) > 0 and results[1][0] == results[0][0]
+    np.testing.assert_array_equal(results[1][1], results[0][1])
+
+
+def test_network_keeps_model_parameters():
+    recordPolicies = copy.deepcopy(CA3_pc_inhibitory_static_syn.recordPolicies)
+    synParameters = copy.deepcopy(CA3_pc_inhibitory_static_syn.synParameters)
+    recall_service.RecallNetwork(pipeline.trained_weights(CA3_pc_inhibitory.simulate())).close()
+    assert CA3_pc_inhibitory_static_syn.recordPolicies == recordPolicies
+    assert CA3_pc_inhibitory_static_syn.synParameters == synParameters
+
+
+def test_stop_with_open_connection(network):
+    service = recall_service.RecallService(network)
+
+    async def run():
+        server = await service.start(port=0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+        await asyncio.wait_for(service.stop(server), 5.0)
+        # The connection is closed by the service
+        assert await asyncio.wait_for(reader.readline(), 5.0) == b""
+        writer.close()
+
+    asyncio.run(run())
+
+
+def test_cancelled_request_does_not_stop_the_batches(network):
+    service = recall_service.RecallService(network)
+
+    async def run():
+        server = await service.start(port=0)
+        cancelled = asyncio.get_running_loop().create_future()
+        await service._queue.put((recall_service.cue_spikes({"cue": CUES[0]}, network.numDG, service.cueTimes),
+                                  cancelled))
+        cancelled.cancel()
+        try:
+            return await recall_service.request_recalls([{"id": 0, "cue": CUES[1]}],
+                                                        port=server.sockets[0].getsockname()[1])
+        finally:
+            await service.stop(server)
+
+    response = asyncio.run(run())[0]
+    assert response["pattern"] == expected_patterns(network, service.cueTimes)[1]
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import CA3_oscilatory
+import CA3_pc_inhibitory
+
+"""
+Offline reconstruction of the PCL-PCL weight history (reconstructWeight): same history as reading the weights from the
+simulator after each time step
+"""
+
+
+def weight_history(module, reconstructWeight, monkeypatch):
+    monkeypatch.setattr(module, "recordWeight", True)
+    monkeypatch.setattr(module, "reconstructWeight", reconstructWeight)
+    dataOutBatch, _ = module.main_batch([module.DGLSpikes])
+    return next(variable["data"] for variable in dataOutBatch[0]["variables"]
+                if variable["type"] == "w" and variable["popNameShort"] == "PCL-PCL")
+
+
+@pytest.mark.parametrize("module", [CA3_oscilatory, CA3_pc_inhibitory])
+def test_reconstruction_equals_step_loop(module, monkeypatch):
+    reconstructed = weight_history(module, True, monkeypatch)
+    stepLoop = weight_history(module, False, monkeypatch)
+    assert set(reconstructed) == set(stepLoop)
+    for key in stepLoop:
+        np.testing.assert_allclose(np.asarray(reconstructed[key], dtype=float),
+                                   np.asarray(stepLoop[key], dtype=float), atol=1e-6, equal_nan=True)
+    # The history changes: the comparison is not between two constant weight matrices
+    w, timeStamp = np.asarray(stepLoop["w"], dtype=float), np.asarray(stepLoop["timeStamp"])
+    assert np.nanmax(np.abs(w[timeStamp == timeStamp.max()] - w[timeStamp == 0])) > 0
+
+
+def test_default_only_with_numpy_backend():
+    for module in (CA3_oscilatory, CA3_pc_inhibitory):
+        assert module.reconstructWeight == (module.sim.__name__ == "sim_numpy")
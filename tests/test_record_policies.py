@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import utils
+import CA3_oscilatory
+
+"""
+Recording policies of v (recordPolicies): subset of neurons, sampling interval and reduced precision storage with
+delta encoding, read back from the data files
+"""
+
+
+def smooth_v(numNeurons=4, numStamps=300):
+    generator = np.random.default_rng(2)
+    return -65.0 + np.cumsum(generator.normal(0.0, 0.05, (numNeurons, numStamps)), axis=1)
+
+
+def v_variable(v, dtype, delta):
+    return {"type": "v", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": len(v), "data": v,
+            **utils.get_record_fields({"dtype": dtype, "delta": delta}, 1.0)}
+
+
+def delta_bound(v, dtype):
+    """
+    Error of the rebuilt values: the rounding of one difference, it does not accumulate along the time
+    """
+    return np.finfo(dtype).eps * np.abs(np.diff(v, axis=1)).max()
+
+
+@pytest.mark.parametrize("dtype", ["float16", "float32", "float64"])
+def test_delta_round_trip(dtype, workdir):
+    v = smooth_v()
+    utils.write_data_file("data/delta.dat", {"timeStep": 1.0, "variables": [v_variable(v, dtype, True)]})
+    read = utils.read_variable("data/delta.dat", "v", "PCL")
+    assert read["delta"] and read["dtype"] == dtype
+    assert read["data"].shape == v.shape
+    assert np.abs(read["data"] - v).max() <= delta_bound(v, dtype)
+
+
+def test_delta_more_precise_than_direct_storage(workdir):
+    v = smooth_v()
+    utils.write_data_file("data/v.dat", {"timeStep": 1.0, "variables": [v_variable(v, "float16", False)]})
+    utils.write_data_file("data/delta.dat", {"timeStep": 1.0, "variables": [v_variable(v, "float16", True)]})
+    directError = np.abs(utils.read_variable("data/v.dat", "v", "PCL")["data"] - v).max()
+    deltaError = np.abs(utils.read_variable("data/delta.dat", "v", "PCL")["data"] - v).max()
+    assert deltaError < directError
+
+
+def test_delta_stream_round_trip(workdir):
+    v = smooth_v()
+    writer = utils.DataStreamWriter("data/", "delta", {"timeStep": 1.0, "variables": []})
+    for start in range(0, v.shape[1], 70):
+        writer.append(v_variable(v[:, start:start + 70], "float16", True))
+    fullPath, _ = writer.close()
+    read = utils.read_variable(fullPath, "v", "PCL")["data"]
+    assert read.shape == v.shape
+    assert np.abs(read - v).max() <= delta_bound(v, "float16")
+
+
+def test_model_subset_and_sampling(monkeypatch):
+    full = CA3_oscilatory.main_batch([CA3_oscilatory.DGLSpikes])[0][0]
+    monkeypatch.setattr(CA3_oscilatory, "recordPolicies",
+                        {"PCLayer": {"neurons": [4, 1], "samplingInterval": 3.0, "dtype": "float32", "delta": False}})
+    sampled = CA3_oscilatory.main_batch([CA3_oscilatory.DGLSpikes])[0][0]
+    vFull = np.asarray(utils._find_variable(full, "v", "PCL")["data"], dtype=float)
+    vSampled = utils._find_variable(sampled, "v", "PCL")
+    assert vSampled["neurons"] == [1, 4] and vSampled["samplingInterval"] == 3.0
+    np.testing.assert_allclose(np.asarray(vSampled["data"], dtype=float), vFull[[1, 4]][:, ::3], atol=1e-9)
+    # The spikes are always recorded from all the neurons
+    assert utils._find_variable(sampled, "spikes", "PCL")["data"].to_lists() == \
+        utils._find_variable(full, "spikes", "PCL")["data"].to_lists()
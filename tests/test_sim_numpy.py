@@ -0,0 +1,113 @@
+import os
+import re
+import numpy as np
+import pytest
+import sim_numpy
+
+"""
+NumPy backend (sim_numpy): subset of the sPyNNaker API used by the models and dynamics of IF_curr_exp and STDP
+"""
+
+MODELS = ["CA3_oscilatory.py", "CA3_pc_inhibitory.py", "CA3_pc_inhibitory_static_syn.py"]
+NEURON = {"cm": 0.5, "tau_m": 5.0, "tau_refrac": 2.0, "tau_syn_E": 2.0, "tau_syn_I": 2.0, "v_reset": -70.0,
+          "v_rest": -65.0, "v_thresh": -55.0}
+
+
+def test_api_subset_of_the_models():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for model in MODELS:
+        with open(os.path.join(root, model)) as file:
+            names = set(re.findall(r"\bsim\.(\w+)", file.read()))
+        assert names
+        for name in names:
+            assert hasattr(sim_numpy, name), model + " uses sim." + name
+
+
+def reference_v(weight, inputTicks, numTicks, p=NEURON, dt=1.0):
+    """
+    Membrane potential of a neuron that does not fire, integrated step by step as in sPyNNaker
+    """
+    v, iExc, trace = p["v_rest"], 0.0, []
+    initE = p["tau_syn_E"] / dt * (1.0 - np.exp(-dt / p["tau_syn_E"]))
+    for tick in range(numTicks):
+        iExc += weight * initE * inputTicks.count(tick)
+        vInf = p["v_rest"] + iExc * p["tau_m"] / p["cm"]
+        v = vInf + (v - vInf) * np.exp(-dt / p["tau_m"])
+        iExc *= np.exp(-dt / p["tau_syn_E"])
+        trace.append(v)
+    return np.array(trace)
+
+
+def build(weight, spikeTimes, delay=1.0):
+    sim_numpy.setup(timestep=1.0)
+    source = sim_numpy.Population(1, sim_numpy.SpikeSourceArray(spike_times=[spikeTimes]), label="source")
+    neuron = sim_numpy.Population(1, sim_numpy.IF_curr_exp(**NEURON), label="neuron")
+    neuron.set(v=NEURON["v_rest"])
+    sim_numpy.Projection(source, neuron, sim_numpy.OneToOneConnector(),
+                         synapse_type=sim_numpy.StaticSynapse(weight=weight, delay=delay), receptor_type="excitatory")
+    neuron.record(["spikes", "v"])
+    return neuron
+
+
+def test_subthreshold_integration():
+    neuron = build(0.5, [2.0], delay=2.0)
+    sim_numpy.run(20)
+    segment = neuron.get_data(variables=["spikes", "v"]).segments[0]
+    sim_numpy.end()
+    v = np.asarray(segment.filter(name="v")[0].as_array())[:, 0]
+    # The spike of the source at 2 ms arrives after the delay of 2 ms
+    np.testing.assert_allclose(v, reference_v(0.5, [4], 20), atol=1e-12)
+    assert v[:4].max() == NEURON["v_rest"] and v.max() < NEURON["v_thresh"]
+    assert len(segment.spiketrains[0]) == 0
+
+
+def test_spike_reset_and_refractory():
+    neuron = build(20.0, [1.0])
+    sim_numpy.run(10)
+    segment = neuron.get_data(variables=["spikes", "v"]).segments[0]
+    sim_numpy.end()
+    v = np.asarray(segment.filter(name="v")[0].as_array())[:, 0]
+    spikeTimes = np.asarray(segment.spiketrains[0].times)
+    assert len(spikeTimes) >= 1
+    tick = int(spikeTimes[0])
+    # Reset to v_reset and held there for tau_refrac ms
+    assert v[tick] == NEURON["v_reset"] and v[tick + 1] == NEURON["v_reset"] and v[tick + 2] == NEURON["v_reset"]
+    assert v[tick + 3] > NEURON["v_reset"]
+
+
+@pytest.mark.parametrize("preTime", [1.0, 8.0])
+def test_spike_pair_stdp(preTime):
+    sim_numpy.setup(timestep=1.0)
+    pre = sim_numpy.Population(1, sim_numpy.SpikeSourceArray(spike_times=[[preTime]]))
+    drive = sim_numpy.Population(1, sim_numpy.SpikeSourceArray(spike_times=[[3.0]]))
+    post = sim_numpy.Population(1, sim_numpy.IF_curr_exp(**NEURON))
+    post.record(["spikes"])
+    sim_numpy.Projection(drive, post, sim_numpy.OneToOneConnector(),
+                         synapse_type=sim_numpy.StaticSynapse(weight=20.0, delay=1.0), receptor_type="excitatory")
+    rule = sim_numpy.STDPMechanism(
+        timing_dependence=sim_numpy.SpikePairRule(tau_plus=10.0, tau_minus=10.0, A_plus=0.1, A_minus=0.2),
+        weight_dependence=sim_numpy.AdditiveWeightDependence(w_min=0.0, w_max=1.0), weight=0.5, delay=1.0)
+    projection = sim_numpy.Projection(pre, post, sim_numpy.AllToAllConnector(), synapse_type=rule,
+                                      receptor_type="excitatory")
+    sim_numpy.run(15)
+    weight = projection.get("weight", format="list", with_address=True)[0][2]
+    postTimes = np.asarray(post.get_data(variables=["spikes"]).segments[0].spiketrains[0].times)
+    sim_numpy.end()
+    assert len(postTimes) == 1
+    elapsed = abs(postTimes[0] - preTime)
+    # Potentiation when the pre spike comes first, depression when it comes after the post spike
+    expected = 0.5 + 0.1 * np.exp(-elapsed / 10.0) if preTime < postTimes[0] else 0.5 - 0.2 * np.exp(-elapsed / 10.0)
+    assert weight == pytest.approx(expected)
+
+
+def test_from_list_connector_and_get():
+    sim_numpy.setup(timestep=1.0)
+    populationA = sim_numpy.Population(3, sim_numpy.IF_curr_exp())
+    synapses = [(0, 1, 0.5, 1.0), (2, 0, 1.5, 2.0)]
+    projection = sim_numpy.Projection(populationA, populationA, sim_numpy.FromListConnector(synapses),
+                                      synapse_type=sim_numpy.StaticSynapse(), receptor_type="inhibitory")
+    assert np.asarray(projection.get("weight", format="list", with_address=True)).tolist() == [[0, 1, 0.5], [2, 0, 1.5]]
+    weights = projection.get("weight", format="array")
+    assert weights[0, 1] == 0.5 and weights[2, 0] == 1.5 and np.isnan(weights[1, 1])
+    assert np.asarray(projection.get("delay", format="list", with_address=True)).tolist() == [[0, 1, 1.0], [2, 0, 2.0]]
+    sim_numpy.end()
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import sim_numpy
+import sparse
+import CA3_pc_inhibitory
+
+"""
+CSR connectivity of the projections of the NumPy backend and sparse recurrent PC-PC connectivity of the models
+"""
+
+
+def random_synapses(numPre, numPost, numSynapses, seed=0):
+    generator = np.random.default_rng(seed)
+    pairs = generator.choice(numPre * numPost, size=numSynapses, replace=False)
+    return pairs // numPost, pairs % numPost
+
+
+@pytest.mark.parametrize("numSynapses", [0, 7, 40])
+def test_connectivity_rows_and_columns(numSynapses):
+    src, dst = random_synapses(6, 8, numSynapses)
+    connectivity = sparse.Connectivity(src, dst, 6, 8)
+    assert len(connectivity) == numSynapses
+    # CSR order and the position of each given synapse
+    assert list(zip(connectivity.src, connectivity.dst)) == sorted(zip(src.tolist(), dst.tolist()))
+    np.testing.assert_array_equal(connectivity.src, src[connectivity.order])
+    neurons = np.array([3, 0, 3, 5])
+    for method, ids in [(connectivity.rows, connectivity.src), (connectivity.columns, connectivity.dst)]:
+        owner, positions = method(neurons)
+        # Each neuron (repeated neurons too) gets all its synapses
+        for index, neuron in enumerate(neurons):
+            assert sorted(positions[owner == index]) == sorted(np.flatnonzero(ids == neuron))
+
+
+def test_csr_to_dense():
+    src, dst = random_synapses(4, 5, 9)
+    connectivity = sparse.Connectivity(src, dst, 4, 5)
+    values = np.arange(2 * len(connectivity), dtype=float).reshape(2, -1)
+    dense = connectivity.to_dense(values)
+    assert dense.shape == (2, 4, 5)
+    np.testing.assert_array_equal(dense[:, connectivity.src, connectivity.dst], values)
+    assert np.isnan(dense).sum() == 2 * (20 - 9)
+
+
+def test_probabilistic_connectors():
+    connector = sim_numpy.FixedProbabilityConnector(0.3, allow_self_connections=False, rng=sim_numpy.NumpyRNG(1))
+    src, dst, _, _ = connector.connect(200, 200)
+    assert not np.any(src == dst)
+    assert len(set(zip(src.tolist(), dst.tolist()))) == len(src)
+    assert abs(len(src) / (200 * 199) - 0.3) < 0.02
+    again = sim_numpy.FixedProbabilityConnector(0.3, allow_self_connections=False, rng=sim_numpy.NumpyRNG(1))
+    np.testing.assert_array_equal(again.connect(200, 200)[1], dst)
+
+    connector = sim_numpy.FixedNumberPreConnector(4, allow_self_connections=False, rng=sim_numpy.NumpyRNG(1))
+    src, dst, _, _ = connector.connect(10, 10)
+    np.testing.assert_array_equal(np.bincount(dst), [4] * 10)
+    assert not np.any(src == dst)
+    assert len(set(zip(src.tolist(), dst.tolist()))) == len(src)
+    with pytest.raises(ValueError):
+        sim_numpy.FixedNumberPreConnector(10, allow_self_connections=False).connect(10, 10)
+
+
+def run_regulated(connectivity, monkeypatch):
+    monkeypatch.setattr(CA3_pc_inhibitory, "PCConnectivity", connectivity)
+    dataOut = CA3_pc_inhibitory.main_batch([CA3_pc_inhibitory.DGLSpikes])[0][0]
+    return {(variable["type"], variable["popNameShort"]): variable["data"] for variable in dataOut["variables"]}
+
+
+def test_full_probability_equals_all_to_all(monkeypatch):
+    allToAll = run_regulated({"type": "all-to-all"}, monkeypatch)
+    fullProbability = run_regulated({"type": "fixed-probability", "p_connect": 1.0, "seed": 0}, monkeypatch)
+    assert [list(times) for times in fullProbability[("spikes", "PCL")]] == \
+           [list(times) for times in allToAll[("spikes", "PCL")]]
+    for key in ("indptr", "indices", "w"):
+        np.testing.assert_array_equal(fullProbability[("wFinal", "PCL-PCL")][key], allToAll[("wFinal", "PCL-PCL")][key])
+
+
+def test_sparse_recurrent_connectivity(monkeypatch):
+    numNeurons = CA3_pc_inhibitory.popNeurons["PCLayer"]
+    data = run_regulated({"type": "fixed-in-degree", "n": 3, "seed": 0}, monkeypatch)
+    wFinal = data[("wFinal", "PCL-PCL")]
+    assert len(wFinal["w"]) == 3 * numNeurons
+    np.testing.assert_array_equal(np.bincount(wFinal["indices"], minlength=numNeurons), [3] * numNeurons)
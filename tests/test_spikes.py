@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+import spikes
+import utils
+import CA3_pc_inhibitory
+
+"""
+Compact spike trains (SpikeTrains): conversions, lookups by tick and storage in the data files
+"""
+
+SPIKE_TIMES = [[3.0, 1.0, 7.5], [], [0.5], [7.5, 1.0]]
+
+
+def test_from_times_round_trip():
+    spikeTrains = spikes.SpikeTrains.from_times(SPIKE_TIMES, 0.5)
+    assert len(spikeTrains) == 4
+    assert spikeTrains.to_lists() == [sorted(times) for times in SPIKE_TIMES]
+    assert spikeTrains.ticks.dtype == np.int32 and spikeTrains.offsets.dtype == np.int64
+    np.testing.assert_array_equal(spikeTrains.counts(), [3, 0, 1, 2])
+    assert spikeTrains.num_spikes() == 6
+    np.testing.assert_array_equal(spikeTrains[3], [1.0, 7.5])
+    np.testing.assert_array_equal(spikeTrains.neuron_ticks(0), [2, 6, 15])
+    # Same object with the same time step, converted with another one
+    assert spikes.SpikeTrains.from_times(spikeTrains, 0.5) is spikeTrains
+    assert spikes.SpikeTrains.from_times(spikeTrains, 0.25).to_lists() == spikeTrains.to_lists()
+
+
+def test_from_times_shared_and_empty():
+    shared = spikes.SpikeTrains.from_times([2.0, 1.0], 1.0, numNeurons=3)
+    assert shared.to_lists() == [[1.0, 2.0]] * 3
+    assert spikes.SpikeTrains.from_times([], 1.0, numNeurons=2).to_lists() == [[], []]
+    with pytest.raises(ValueError):
+        spikes.SpikeTrains.from_times(SPIKE_TIMES, 1.0, numNeurons=3)
+
+
+def test_matrix_round_trip():
+    generator = np.random.default_rng(0)
+    matrix = generator.random((30, 5)) < 0.2
+    spikeTrains = spikes.SpikeTrains.from_matrix(matrix, 1.0, firstTick=10)
+    np.testing.assert_array_equal(spikeTrains.to_matrix(30, 10), matrix)
+    assert spikeTrains.to_lists() == [(np.flatnonzero(matrix[:, neuron]) + 10.0).tolist() for neuron in range(5)]
+    # Spikes out of the ticks of the matrix are ignored
+    np.testing.assert_array_equal(spikeTrains.to_matrix(10, 20), matrix[10:20])
+
+
+def test_tick_lookups():
+    spikeTrains = spikes.SpikeTrains.from_times(SPIKE_TIMES, 0.5)
+    np.testing.assert_array_equal(spikeTrains.active_ticks(), [1, 2, 6, 15])
+    np.testing.assert_array_equal(spikeTrains.fired_at(2), [0, 3])
+    np.testing.assert_array_equal(spikeTrains.fired_at(15), [0, 3])
+    assert len(spikeTrains.fired_at(3)) == 0
+    assert len(spikeTrains.fired_at(100)) == 0
+
+
+def test_data_file_round_trip(workdir):
+    spikeTrains = spikes.SpikeTrains.from_times(SPIKE_TIMES, 0.5)
+    utils.write_data_file("data/spikes.dat", {"timeStep": 0.5, "variables": [
+        {"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": 4, "data": spikeTrains}]})
+    read = utils.read_variable("data/spikes.dat", "spikes", "PCL")["data"]
+    assert isinstance(read, spikes.SpikeTrains)
+    np.testing.assert_array_equal(read.ticks, spikeTrains.ticks)
+    np.testing.assert_array_equal(read.offsets, spikeTrains.offsets)
+    assert read.timeStep == 0.5
+
+
+def test_data_file_of_previous_versions(workdir):
+    # Spikes stored as lists of spike times (ragged) and as spike times shared by all the neurons (array)
+    utils.write_data_file("data/lists.dat", {"timeStep": 0.5, "variables": [
+        {"type": "spikes", "popName": "PC Layer", "popNameShort": "PCL", "numNeurons": 4, "data": SPIKE_TIMES},
+        {"type": "spikes", "popName": "LEARNING", "popNameShort": "LEARNING", "numNeurons": 2, "data": [1.0, 2.0]}]})
+    assert utils.read_header("data/lists.dat")["variables"][0]["data"]["kind"] == "ragged"
+    read = utils.read_file("data/lists.dat")
+    assert isinstance(read["variables"][0]["data"], spikes.SpikeTrains)
+    assert read["variables"][0]["data"].to_lists() == [sorted(times) for times in SPIKE_TIMES]
+    assert read["variables"][1]["data"].to_lists() == [[1.0, 2.0], [1.0, 2.0]]
+    assert utils.read_variable("data/lists.dat", "spikes", "LEARNING")["data"].to_lists() == [[1.0, 2.0]] * 2
+
+
+def test_model_spikes(workdir):
+    dataOut = CA3_pc_inhibitory.simulate()
+    spikeVariables = [variable for variable in dataOut["variables"] if variable["type"] == "spikes"]
+    assert spikeVariables and all(isinstance(variable["data"], spikes.SpikeTrains) for variable in spikeVariables)
+    fullPath, _ = utils.write_file("data/", "CA3_pc_inhibitory", dataOut)
+    for variable in spikeVariables:
+        read = utils.read_variable(fullPath, "spikes", variable["popNameShort"])["data"]
+        assert read.to_lists() == variable["data"].to_lists()
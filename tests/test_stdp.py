@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import sparse
+import stdp
+import CA3_oscilatory
+import CA3_pc_inhibitory
+
+"""
+Lookup table STDP kernel (LookupTableSTDP): same final weights as the naive evaluation of all the spike pairs
+"""
+
+
+def random_spikes(numNeurons, numTicks, rate, seed):
+    spikeMatrix = np.random.default_rng(seed).random((numTicks, numNeurons)) < rate
+    return spikeMatrix, [np.nonzero(spikeMatrix[:, neuron])[0] * 1.0 for neuron in range(numNeurons)]
+
+
+def init_weights(numNeurons, params):
+    src, dst = np.nonzero(~np.eye(numNeurons, dtype=bool))
+    return np.column_stack((src, dst, np.full(len(src), (params["w_min"] + params["w_max"]) / 2.0)))
+
+
+@pytest.mark.parametrize("module", [CA3_oscilatory, CA3_pc_inhibitory], ids=lambda module: module.__name__)
+@pytest.mark.parametrize("seed", [0, 1])
+def test_kernel_equals_reference(module, seed):
+    params = module.synParameters["PCL-PCL"]
+    spikeMatrix, spikeTimes = random_spikes(12, 400, 0.05, seed)
+    initWeights = init_weights(12, params)
+    connectivity = sparse.Connectivity(initWeights[:, 0], initWeights[:, 1], 12, 12)
+    weights = initWeights[connectivity.order, 2][None, :].copy()
+    rule = stdp.LookupTableSTDP(connectivity, 1, params, 1.0)
+    for tick in np.nonzero(spikeMatrix.any(axis=1))[0]:
+        rule.step(weights, spikeMatrix[tick][None, :], spikeMatrix[tick][None, :], tick)
+
+    reference = stdp.reference_spike_pair_additive(spikeTimes, spikeTimes, initWeights, params, 1.0)
+    np.testing.assert_allclose(weights[0], reference[connectivity.order, 2], atol=1e-6)
+    # The spikes change the weights: the comparison is not between the initial weights
+    assert np.abs(reference[:, 2] - initWeights[:, 2]).max() > 0.01
+
+
+def test_reconstruction_equals_reference():
+    params = CA3_pc_inhibitory.synParameters["PCL-PCL"]
+    _, spikeTimes = random_spikes(8, 200, 0.05, 2)
+    initWeights = init_weights(8, params)
+    stream = stdp.reconstruct_weight_stream(spikeTimes, spikeTimes, initWeights, params, 200.0, 1.0)
+    reference = stdp.reference_spike_pair_additive(spikeTimes, spikeTimes, initWeights, params, 1.0)
+    order = np.lexsort((reference[:, 1], reference[:, 0]))
+    np.testing.assert_array_equal(stream["src"], reference[order, 0])
+    np.testing.assert_array_equal(stream["dst"], reference[order, 1])
+    np.testing.assert_allclose(stream["w"][-1], reference[order, 2], atol=1e-5)
+    np.testing.assert_array_equal(stream["w"][0], initWeights[order, 2])
+
+
+def test_decay_table():
+    table = stdp.decay_table(10.0, 1.0)
+    np.testing.assert_allclose(table[:3], np.exp(-np.arange(3) / 10.0))
+    assert table[-1] == 0.0 and table[-2] < 2.0 ** -32
+    assert len(stdp.decay_table(10.0, 1.0, size=5)) == 6
+
+
+def test_reset_clears_traces():
+    params = CA3_pc_inhibitory.synParameters["PCL-PCL"]
+    initWeights = init_weights(4, params)
+    rule = stdp.LookupTableSTDP(sparse.Connectivity(initWeights[:, 0], initWeights[:, 1], 4, 4), 1, params, 1.0)
+    weights = initWeights[:, 2][None, :].copy()
+    rule.step(weights, np.ones((1, 4), dtype=bool), np.ones((1, 4), dtype=bool), 3)
+    assert rule.traces(4)[0].max() > 0
+    rule.reset()
+    assert rule.traces(4)[0].max() == 0 and rule.traces(4)[1].max() == 0
@@ -0,0 +1,97 @@
+import glob
+import numpy as np
+import pytest
+import utils
+import CA3_oscilatory
+import CA3_pc_inhibitory
+
+"""
+Streaming segmented recording: a data file written segment by segment (DataStreamWriter) has the same content as the
+one written at once
+"""
+
+
+def get_variable(data, varType, popNameShort):
+    return next(variable for variable in data["variables"]
+                if variable["type"] == varType and variable["popNameShort"] == popNameShort)
+
+
+def matrix_to_lists(spikeMatrix, start=0):
+    """
+    Spike times of each neuron of a bool matrix (time step, neuron) of 1 ms time step that begins at start ms
+    """
+    return [(np.flatnonzero(spikeMatrix[:, neuron]) + start).astype(float).tolist()
+            for neuron in range(spikeMatrix.shape[1])]
+
+
+def spike_lists(data):
+    """
+    Spike times of each neuron as lists (a flat list of times is considered one time per neuron)
+    """
+    return [np.atleast_1d(np.asarray(times, dtype=float)).tolist() for times in data]
+
+
+def run_main(module, streamSegment, monkeypatch):
+    monkeypatch.setattr(module, "streamSegment", streamSegment)
+    monkeypatch.setattr(module, "simulationParameters",
+                        dict(module.simulationParameters, filename="stream_" + str(streamSegment)))
+    fullPath, _ = module.main()
+    return utils.read_file(fullPath)
+
+
+@pytest.mark.parametrize("module", [CA3_oscilatory, CA3_pc_inhibitory], ids=lambda module: module.__name__)
+def test_stream_equals_single_write(module, workdir, monkeypatch):
+    # The weight history is sampled at the end of each segment when streaming: compared without it
+    monkeypatch.setattr(module, "recordWeight", False)
+    whole = run_main(module, None, monkeypatch)
+    streamed = run_main(module, 7, monkeypatch)
+    assert len(streamed["variables"]) == len(whole["variables"])
+    for variable in whole["variables"]:
+        other = get_variable(streamed, variable["type"], variable["popNameShort"])
+        if variable["type"] == "spikes":
+            assert spike_lists(other["data"]) == spike_lists(variable["data"])
+        elif isinstance(variable["data"], dict):
+            for key, values in variable["data"].items():
+                np.testing.assert_array_equal(other["data"][key], values)
+        else:
+            np.testing.assert_array_equal(other["data"], variable["data"])
+    # The temporal files of the segments are deleted
+    assert glob.glob("data/*.part*") == []
+
+
+def test_writer_segments_equal_whole_data(workdir):
+    generator = np.random.default_rng(1)
+    spikeMatrix = generator.random((40, 5)) < 0.3
+    v = generator.normal(-65.0, 2.0, (5, 40))
+    w = generator.random((4, 6)).astype(np.float32)
+    writer = utils.DataStreamWriter("data/", "segments", {"timeStep": 1.0, "simTime": 40, "variables": []})
+    for start, stop in [(0, 15), (15, 30), (30, 40)]:
+        writer.append({"type": "spikes", "popNameShort": "PCL", "numNeurons": 5,
+                       "data": matrix_to_lists(spikeMatrix[start:stop], start)})
+        writer.append({"type": "v", "popNameShort": "PCL", "numNeurons": 5, "data": v[:, start:stop]})
+    for step in range(0, 4, 2):
+        writer.append({"type": "w", "popNameShort": "PCL-PCL",
+                       "data": {"timeStamp": np.arange(step, step + 2.0), "indptr": np.array([0, 2, 4, 6]),
+                                "indices": np.array([1, 2, 0, 2, 0, 1]), "w": w[step:step + 2]}},
+                      fixed=("indptr", "indices"))
+    writer.add({"type": "spikes", "popNameShort": "DGL", "numNeurons": 2, "data": [[1.0], [2.0, 3.0]]})
+    fullPath, _ = writer.close()
+    assert glob.glob("data/*.part*") == []
+
+    read = utils.read_file(fullPath)
+    assert read["simTime"] == 40
+    assert [list(times) for times in get_variable(read, "spikes", "PCL")["data"]] == matrix_to_lists(spikeMatrix)
+    np.testing.assert_array_equal(get_variable(read, "v", "PCL")["data"], v)
+    weightStream = get_variable(read, "w", "PCL-PCL")["data"]
+    np.testing.assert_array_equal(weightStream["w"], w)
+    np.testing.assert_array_equal(weightStream["timeStamp"], np.arange(4.0))
+    np.testing.assert_array_equal(weightStream["indptr"], [0, 2, 4, 6])
+    assert [list(times) for times in get_variable(read, "spikes", "DGL")["data"]] == [[1.0], [2.0, 3.0]]
+
+
+def test_writer_rejects_segments_of_other_shape(workdir):
+    writer = utils.DataStreamWriter("data/", "segments", {"timeStep": 1.0})
+    writer.append({"type": "v", "popNameShort": "PCL", "data": np.zeros((5, 3))})
+    with pytest.raises(ValueError):
+        writer.append({"type": "v", "popNameShort": "PCL", "data": np.zeros((4, 3))})
+    writer.close()
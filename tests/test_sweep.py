@@ -0,0 +1,84 @@
+import copy
+import csv
+import cache
+import sweep
+import CA3_pc_inhibitory
+
+"""
+Parameter sweep: generation of trials, trials passed to the model without modifying it, batches of the trials that only
+differ in their cues and execution in a pool of processes
+"""
+
+
+def num_variables(dataOut):
+    return len(dataOut["variables"])
+
+
+def half_cue(DGLSpikes):
+    return [times if neuron % 2 == 0 else [] for neuron, times in enumerate(DGLSpikes)]
+
+
+def model_parameters():
+    return {name: copy.deepcopy(getattr(CA3_pc_inhibitory, name)) for name in cache.CONFIG_NAMES
+            if hasattr(CA3_pc_inhibitory, name)}
+
+
+def test_grid_and_random_search():
+    assert sweep.grid_search({"a": [1, 2], "b": [3]}) == [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+    trials = sweep.random_search({"a": (0.0, 1.0), "b": ["x", "y"]}, 5, seed=1)
+    assert len(trials) == 5
+    assert all(0.0 <= trial["a"] <= 1.0 and trial["b"] in ("x", "y") for trial in trials)
+    assert trials == sweep.random_search({"a": (0.0, 1.0), "b": ["x", "y"]}, 5, seed=1)
+
+
+def test_trial_parameters_are_copies():
+    defaults = model_parameters()
+    params = sweep.trial_parameters(CA3_pc_inhibitory, {"synParameters.PCL-PCL.tau_plus": 5.0, "eventDriven": True,
+                                                        "DGLSpikes": []})
+    assert params["synParameters"]["PCL-PCL"]["tau_plus"] == 5.0 and params["eventDriven"]
+    assert params["synParameters"]["DGL-PCL"] == defaults["synParameters"]["DGL-PCL"]
+    assert "DGLSpikes" not in params
+    assert model_parameters() == defaults
+
+
+def test_group_trials_by_cue():
+    trials = [{"a": 1, "DGLSpikes": [[1.0]]}, {"a": 2, "DGLSpikes": [[1.0]]}, {"a": 1, "DGLSpikes": [[2.0]]},
+              {"a": 1}]
+    assert sweep.group_trials(trials) == [[0, 2, 3], [1]]
+    assert sweep.group_trials(trials, maxBatch=2) == [[0, 2], [3], [1]]
+
+
+def test_trials_do_not_modify_the_model():
+    defaults = model_parameters()
+    first = sweep.run_trials(("CA3_pc_inhibitory", [0], [{}], {}, False))[0]
+    sweep.run_trials(("CA3_pc_inhibitory", [1], [{"eventDriven": True, "synParameters.PCL-PCL.tau_plus": 5.0}], {},
+                      False))
+    assert model_parameters() == defaults
+    again = sweep.run_trials(("CA3_pc_inhibitory", [2], [{}], {"numVariables": num_variables}, True))[0]
+    assert again["spikesPC"] == first["spikesPC"]
+    assert again["numVariables"] == len(again["dataOut"]["variables"])
+
+
+def test_batch_of_cues_equals_single_trials():
+    cues = [CA3_pc_inhibitory.DGLSpikes, half_cue(CA3_pc_inhibitory.DGLSpikes)]
+    trials = [{"synParameters.PCL-PCL.tau_plus": 5.0, "DGLSpikes": cue} for cue in cues]
+    batch = sweep.run_trials(("CA3_pc_inhibitory", [0, 1], trials, {}, False))
+    assert [row["batchSize"] for row in batch] == [2, 2]
+    for indexTrial, trial in enumerate(trials):
+        single = sweep.run_trials(("CA3_pc_inhibitory", [indexTrial], [trial], {}, False))[0]
+        assert single["batchSize"] == 1
+        for name in ("spikesPC", "activePC", "meanWeightPCL_PCL", "maxWeightPCL_PCL"):
+            assert batch[indexTrial][name] == single[name]
+    assert batch[0]["spikesPC"] != batch[1]["spikesPC"]
+
+
+def test_run_sweep_and_table(tmp_path):
+    trials = sweep.grid_search({"synParameters.PCL-PCL.tau_plus": [5.0, 9.0],
+                                "DGLSpikes": [CA3_pc_inhibitory.DGLSpikes, half_cue(CA3_pc_inhibitory.DGLSpikes)]})
+    table = sweep.run_sweep("CA3_pc_inhibitory", trials, numWorkers=2, extraMetrics={"numVariables": num_variables})
+    assert [row["trial"] for row in table] == [0, 1, 2, 3]
+    assert [row["synParameters.PCL-PCL.tau_plus"] for row in table] == [5.0, 5.0, 9.0, 9.0]
+    assert all(row["numVariables"] > 0 and row["batchSize"] == 2 and "dataOut" not in row for row in table)
+    with open(sweep.write_table(table, str(tmp_path / "sweep.csv"))) as file:
+        rows = list(csv.DictReader(file))
+    assert [float(row["synParameters.PCL-PCL.tau_plus"]) for row in rows] == [5.0, 5.0, 9.0, 9.0]
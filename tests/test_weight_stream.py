@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+import utils
+
+"""
+Dense weight streams: format_weight_stream, access to a time step or a synapse and data files of previous versions
+"""
+
+
+def synthetic_weights():
+    """
+    Projection.get list of (src, dst, w) of 4 time stamps of a 3x4 projection without the synapses src == dst
+    """
+    generator = np.random.default_rng(0)
+    synapses = [(src, dst) for src in range(3) for dst in range(4) if src != dst]
+    return [[(src, dst, generator.random()) for src, dst in synapses] for _ in range(4)]
+
+
+def test_format_weight_stream():
+    weights = synthetic_weights()
+    weightStream = utils.format_weight_stream(weights, {"simTime": 3.0, "timeStep": 1.0, "numDst": 5})
+    np.testing.assert_array_equal(weightStream["timeStamp"], [0.0, 1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(weightStream["shape"], [3, 5])
+    np.testing.assert_array_equal(weightStream["indptr"], [0, 3, 6, 9])
+    np.testing.assert_array_equal(weightStream["indices"], [1, 2, 3, 0, 2, 3, 0, 1, 3])
+    assert weightStream["w"].shape == (4, 9)
+    for indexStep, step in enumerate(weights):
+        np.testing.assert_array_equal(weightStream["w"][indexStep], np.float32([w for _, _, w in step]))
+
+
+def test_weight_step_and_synapse_trajectory():
+    weights = synthetic_weights()
+    weightStream = utils.format_weight_stream(weights, {"simTime": 3.0, "timeStep": 1.0})
+    dense = utils.get_weight_step(weightStream, 2.0)
+    assert dense.shape == (3, 4)
+    for src, dst, w in weights[2]:
+        assert dense[src, dst] == np.float32(w)
+    assert np.isnan(dense[[0, 1, 2], [0, 1, 2]]).all()
+    with pytest.raises(ValueError):
+        utils.get_weight_step(weightStream, 1.5)
+    with pytest.raises(ValueError):
+        utils.get_weight_step(weightStream, 4.0)
+    np.testing.assert_allclose(utils.get_synapse_trajectory(weightStream, 2, 1),
+                               [dict(((src, dst), w) for src, dst, w in step)[(2, 1)] for step in weights], rtol=1e-6)
+    assert np.isnan(utils.get_synapse_trajectory(weightStream, 1, 1)).all()
+
+
+def test_dense_weight_stream_of_previous_versions():
+    weightStream = utils.format_weight_stream(synthetic_weights(), {"simTime": 3.0, "timeStep": 1.0})
+    dense = {"timeStamp": weightStream["timeStamp"],
+             "w": np.array([utils.get_weight_step(weightStream, stamp) for stamp in weightStream["timeStamp"]])}
+    np.testing.assert_array_equal(utils.get_weight_step(dense, 3.0), utils.get_weight_step(weightStream, 3.0))
+    np.testing.assert_array_equal(utils.get_synapse_trajectory(dense, 0, 2),
+                                  utils.get_synapse_trajectory(weightStream, 0, 2))
+
+
+def test_weight_stream_from_columns():
+    weights = synthetic_weights()
+    weightStream = utils.format_weight_stream(weights, {"simTime": 3.0, "timeStep": 1.0})
+    # Format of previous versions: one element per synapse and time stamp
+    weightColumns = {"srcNeuronId": [], "dstNeuronId": [], "w": [], "timeStamp": []}
+    for indexStep, step in enumerate(weights):
+        for src, dst, w in step:
+            weightColumns["srcNeuronId"].append(src)
+            weightColumns["dstNeuronId"].append(dst)
+            weightColumns["w"].append(w)
+            weightColumns["timeStamp"].append(float(indexStep))
+    columnStream = utils.weight_stream_from_columns(weightColumns)
+    for key in ("timeStamp", "shape", "indptr", "indices", "w"):
+        np.testing.assert_array_equal(columnStream[key], weightStream[key])
+
+
+def test_last_stamp_synapse_list_from_legacy_file(workdir):
+    weights = synthetic_weights()
+    weightColumns = {"srcNeuronId": [], "dstNeuronId": [], "w": [], "timeStamp": []}
+    for indexStep, step in enumerate(weights):
+        for src, dst, w in step:
+            for key, value in zip(weightColumns, (src, dst, w, float(indexStep))):
+                weightColumns[key].append(value)
+    data = {"synParameters": {"PCL-PCL": {"tau_plus": 9.0}},
+            "variables": [{"type": "w", "popName": "PCL-PCL", "popNameShort": "PCL-PCL", "data": weightColumns}]}
+    with open("data/legacy.txt", "w") as file:
+        file.write(str(data))
+    utils.write_data_file("data/dense.dat", dict(data, variables=[
+        dict(data["variables"][0], data=utils.format_weight_stream(weights, {"simTime": 3.0, "timeStep": 1.0}))]))
+
+    expected = np.array([(src, dst, w, 1.0) for src, dst, w in weights[-1]])
+    for path in ("data/legacy.txt", "data/dense.dat"):
+        synapses, synParameters = utils.get_last_stamp_synapse_list(path)
+        np.testing.assert_allclose(synapses, expected, rtol=1e-6)
+        assert synParameters == data["synParameters"]["PCL-PCL"]
@@ -1,18 +1,27 @@
 
 import time
 import matplotlib.pyplot as plt
-from operator import itemgetter
 import os
+import json
+import shutil
+from collections import ChainMap
 import numpy as np
+import sparse
+import spikes
+import instrumentation
 
 
 #####################################
 # Input/Output
 #####################################
 
+DATA_FILE_MAGIC = b"CA3DATA1"
+DATA_FILE_ALIGN = 64
+
+
 def write_file(basePath, title, data):
     """
-    Generic function to write the data into a file
+    Generic function to write the data of a simulation into a binary data file (see write_data_file)
 
     :param basePath: directory path where the file will be stored
     :param title: name of the file
@@ -21,27 +30,471 @@ def write_file(basePath, title, data):
     """
     strDate = time.strftime("%Y_%m_%d__%H_%M_%S")
     filename = title + "_" + strDate
-    fullPath = basePath + filename + ".txt"
-    file = open(fullPath, "w")
-    file.write(str(data))
-    file.close()
+    fullPath = basePath + filename + ".dat"
+    write_data_file(fullPath, data)
     return fullPath, filename
 
 
+def write_data_file(fullPath, data):
+    """
+    Write the data of a simulation (dataOut) in a binary columnar file:
+        + magic (8 bytes) + header length (uint64 little endian)
+        + header: JSON with the parameters of the simulation and, for each variable, its metadata and the dtype, shape
+          and offset of each of its arrays
+        + the raw arrays of each variable, aligned to DATA_FILE_ALIGN bytes
+    The data of each variable is stored as: "array" (v), "spikes" (spikes.SpikeTrains: int32 ticks + offsets of each
+    neuron, with the time step in the description), "ragged" (lists of lists: values + offsets of each list) or
+    "columns" (w: one array per key). An "array" with "transposed" in its description is stored time-major (written by
+    DataStreamWriter) and it is read as its transpose. The v of a variable with "dtype" (see get_record_fields) is
+    stored with that type and, with "delta", as "delta": the first value of each neuron (float64) and the differences
+    between consecutive values with that type, time-major (see _delta_encode)
+
+    :param fullPath: path + filename of the file to write
+    :param data: data to store in the file (dictionary with the headers and a list of variables)
+    """
+    header = {"meta": {key: value for key, value in data.items() if key != "variables"}, "variables": []}
+    arrays = []
+    for variable in data["variables"]:
+        description, variableArrays = _encode_variable_data(variable)
+        entry = {key: value for key, value in variable.items() if key != "data"}
+        entry["data"] = dict(description, arrays={})
+        for name, array in variableArrays.items():
+            entry["data"]["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+            arrays.append((entry["data"]["arrays"][name], array))
+        header["variables"].append(entry)
+
+    headerBytes = _layout_header(header, [(description, array.nbytes) for description, array in arrays])
+    with open(fullPath, "wb") as file:
+        file.write(DATA_FILE_MAGIC)
+        file.write(np.uint64(len(headerBytes)).tobytes())
+        file.write(headerBytes)
+        for description, array in arrays:
+            file.write(b"\0" * (description["offset"] - file.tell()))
+            np.ascontiguousarray(array).tofile(file)
+
+
+def _layout_header(header, arrays):
+    """
+    Compute the offset of each array in a binary data file and encode the header
+
+    :param header: header of the file ({"meta", "variables"}), the offsets are added to the descriptions of its arrays
+    :param arrays: list of (description of the array in the header, size in bytes of the array) in the order of the file
+    :return: encoded header
+    """
+    # The header size depends on the offsets, so repeat until it is stable
+    headerSize = 0
+    while True:
+        offset = _align(len(DATA_FILE_MAGIC) + 8 + headerSize)
+        for description, nbytes in arrays:
+            description["offset"] = offset
+            offset = _align(offset + nbytes)
+        headerBytes = json.dumps(header, default=_json_default).encode("utf-8")
+        if len(headerBytes) == headerSize:
+            return headerBytes
+        headerSize = len(headerBytes)
+
+
+def _encode_variable_data(variable):
+    """
+    Convert the data of a variable to the arrays that are stored in a binary data file
+
+    :param variable: variable of dataOut ({"type", ..., "data"})
+    :return: description of the data ({"kind": "array", "delta", "spikes", "ragged" or "columns"[, "timeStep"]}) and
+             dict with the arrays to store
+    """
+    data = variable["data"]
+    if isinstance(data, spikes.SpikeTrains):
+        return {"kind": "spikes", "timeStep": data.timeStep}, {"ticks": data.ticks, "offsets": data.offsets}
+    if isinstance(data, dict):
+        return {"kind": "columns"}, {key: np.asarray(value) for key, value in data.items()}
+    if variable["type"] == "v" and variable.get("delta"):
+        values = np.asarray(data, dtype=float).reshape(len(data), -1)
+        first = values[:, 0] if values.shape[1] > 0 else np.zeros(len(values))
+        deltas, _ = _delta_encode(values, variable.get("dtype", "float64"), first)
+        return {"kind": "delta"}, {"first": first, "deltas": deltas}
+    if variable["type"] == "v":
+        return {"kind": "array"}, {"values": np.asarray(data, dtype=variable.get("dtype", float))}
+    if isinstance(data, np.ndarray):
+        return {"kind": "array"}, {"values": np.asarray(data, dtype=float)}
+    if len(data) > 0 and all(np.ndim(element) == 0 for element in data):
+        return {"kind": "array"}, {"values": np.asarray(data, dtype=float)}
+    lengths = [len(element) for element in data]
+    values = np.concatenate([np.asarray(element, dtype=float) for element in data]) if data else np.zeros(0)
+    return {"kind": "ragged"}, {"values": values,
+                                "offsets": np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)}
+
+
+def _delta_encode(values, dtype, last=None):
+    """
+    Encode a matrix (neuron, time stamp) as the differences between consecutive values stored with a reduced precision
+    type. Each difference is taken from the value rebuilt with the previous (rounded) differences, so the rounding
+    errors do not accumulate along the time: the error of each rebuilt value is the rounding of one difference
+
+    :param values: float matrix (neuron, time stamp)
+    :param dtype: type of the differences ("float64", "float32" or "float16")
+    :param last: (optional) value rebuilt for the last time stamp of the previous segment (by default, the first value
+                 of each neuron, so the first difference is 0)
+    :return: differences (time stamp, neuron) with type dtype and value rebuilt for the last time stamp
+    """
+    deltas = np.empty((values.shape[1], values.shape[0]), dtype=dtype)
+    rebuilt = values[:, 0].copy() if last is None else np.array(last, dtype=float)
+    for column in range(values.shape[1]):
+        deltas[column] = values[:, column] - rebuilt
+        rebuilt += deltas[column]
+    return deltas, rebuilt
+
+
+def _delta_decode(first, deltas):
+    """
+    Rebuild the matrix (neuron, time stamp) encoded by _delta_encode
+
+    :param first: float64 array with the first value of each neuron
+    :param deltas: differences (time stamp, neuron)
+    :return: float matrix (neuron, time stamp)
+    """
+    values = np.asarray(deltas, dtype=float).copy()
+    if len(values) > 0:
+        values[0] += first
+    return np.cumsum(values, axis=0).T
+
+
+def _align(offset):
+    return (offset + DATA_FILE_ALIGN - 1) // DATA_FILE_ALIGN * DATA_FILE_ALIGN
+
+
+def _json_default(value):
+    """
+    Convert the numpy values of the header to python values to store them as JSON
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError("Unsupported type in the header: " + str(type(value)))
+
+
 def read_file(fullPath):
     """
-    Read the file in fullPath
+    Read the file in fullPath. Binary data files are memory-mapped: only the header is parsed and the data of each
+    variable is read from disk when it is accessed. Text files of previous versions (str of the data) are also supported
 
     :param fullPath: path + filename to the file to read
     :return: data read from the file or False if the file could not be accessed
     """
     try:
-        file = open(fullPath, "r")
-        return eval(file.read())
+        if fullPath.endswith(".txt"):
+            return _read_text_file(fullPath)
+        header = read_header(fullPath)
+        data = dict(header["meta"])
+        data["variables"] = [_map_variable(fullPath, variable, data.get("timeStep"))
+                             for variable in header["variables"]]
+        return data
     except FileNotFoundError:
         return False
 
 
+def _read_text_file(fullPath):
+    """
+    Read a text file of previous versions (str of the data). The spikes, stored as lists of spike times, are converted
+    to spikes.SpikeTrains if the file has the time step of the simulation, as the spikes of the binary data files
+
+    :param fullPath: path + filename to the file to read
+    :return: data read from the file
+    """
+    with open(fullPath, "r") as file:
+        data = eval(file.read())
+    if isinstance(data, dict) and "timeStep" in data:
+        for variable in data.get("variables", []):
+            if variable["type"] == "spikes":
+                variable["data"] = spikes.SpikeTrains.from_times(variable["data"], data["timeStep"],
+                                                                 variable.get("numNeurons"))
+    return data
+
+
+def read_header(fullPath):
+    """
+    Read the header of a binary data file: parameters of the simulation and metadata of the variables
+
+    :param fullPath: path + filename to the file to read
+    :return: header -> {"meta", "variables"}
+    """
+    with open(fullPath, "rb") as file:
+        if file.read(len(DATA_FILE_MAGIC)) != DATA_FILE_MAGIC:
+            raise ValueError("Not a data file: " + fullPath)
+        headerSize = int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+        return json.loads(file.read(headerSize).decode("utf-8"))
+
+
+def read_meta(fullPath):
+    """
+    Read the parameters of a simulation (all the data except the variables)
+
+    :param fullPath: path + filename to the file to read
+    :return: dict with the parameters of the simulation
+    """
+    if fullPath.endswith(".txt"):
+        return {key: value for key, value in read_file(fullPath).items() if key != "variables"}
+    return read_header(fullPath)["meta"]
+
+
+def read_variable(fullPath, tipo, popNameShort):
+    """
+    Read only one variable of a data file, without loading the rest
+
+    :param fullPath: path + filename to the file to read
+    :param tipo: type of the variable ("spikes", "v", "w", ...)
+    :param popNameShort: short name of the population or synapse of the variable
+    :return: the variable ({"type", "popName", ..., "data"}) or False if it is not in the file
+    """
+    if fullPath.endswith(".txt"):
+        header = read_file(fullPath)
+    else:
+        header = read_header(fullPath)
+    for variable in header["variables"]:
+        if variable["type"] == tipo and variable["popNameShort"] == popNameShort:
+            if fullPath.endswith(".txt"):
+                return variable
+            return _map_variable(fullPath, variable, header["meta"].get("timeStep"))
+    return False
+
+
+def _map_variable(fullPath, variable, timeStep=None):
+    """
+    Memory-map the arrays of a variable described in the header of a binary data file
+
+    :param fullPath: path + filename of the data file
+    :param variable: description of the variable in the header
+    :param timeStep: (optional) time step of the simulation, to read as spikes.SpikeTrains the spikes stored as lists
+                     of spike times by previous versions
+    :return: variable with the data memory-mapped (spikes as spikes.SpikeTrains, ragged data as a list with an array
+             of each neuron and v with delta encoding decoded to float64)
+    """
+    arrays = {}
+    for name, description in variable["data"]["arrays"].items():
+        shape = tuple(description["shape"])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.zeros(shape, dtype=description["dtype"])
+        else:
+            arrays[name] = np.memmap(fullPath, dtype=description["dtype"], mode="r", offset=description["offset"],
+                                     shape=shape)
+    mapped = {key: value for key, value in variable.items() if key != "data"}
+    kind = variable["data"]["kind"]
+    if kind == "spikes":
+        mapped["data"] = spikes.SpikeTrains(arrays["ticks"], arrays["offsets"], variable["data"]["timeStep"])
+    elif kind == "ragged":
+        values, offsets = arrays["values"], arrays["offsets"]
+        mapped["data"] = [values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    elif kind == "columns":
+        mapped["data"] = arrays
+    elif kind == "delta":
+        mapped["data"] = _delta_decode(arrays["first"], arrays["deltas"])
+    elif variable["data"].get("transposed"):
+        mapped["data"] = arrays["values"].T
+    else:
+        mapped["data"] = arrays["values"]
+    if variable["type"] == "spikes" and kind in ("ragged", "array") and timeStep is not None:
+        mapped["data"] = spikes.SpikeTrains.from_times(mapped["data"], timeStep, variable.get("numNeurons"))
+    return mapped
+
+
+# Number of elements of the temporal files of a stream read at once when the data file is assembled
+STREAM_CHUNK = 1 << 20
+
+
+class DataStreamWriter(object):
+    """
+    Binary data file (see write_data_file) written segment by segment, to store long simulations with bounded memory
+
+    The data of each segment is appended to temporal files next to the data file (one per array), so only the data of
+    one segment is in memory. When the simulation ends, close assembles the data file from the temporal files in chunks
+    of STREAM_CHUNK elements:
+        + spikes ("spikes"): the spikes of each segment are stored as (tick, neuron) pairs and they are grouped by
+          neuron in the final file with the number of spikes of each neuron counted while appending
+        + v ("array"): the matrix (time stamp, neuron) of each segment is appended, so it is stored time-major (flag
+          "transposed" in the header) and read as (neuron, time stamp) without moving the data. With "delta" ("delta")
+          the differences of each segment are appended, continuing from the last value rebuilt of the previous one
+        + w ("columns"): the arrays are concatenated along the first axis, except the fixed ones (synapses of the CSR
+          format), stored only once
+    """
+
+    def __init__(self, basePath, title, meta):
+        """
+        :param basePath: directory path where the file will be stored
+        :param title: name of the file
+        :param meta: parameters of the simulation (the headers of dataOut, without variables)
+        """
+        self.filename = title + "_" + time.strftime("%Y_%m_%d__%H_%M_%S")
+        self.fullPath = basePath + self.filename + ".dat"
+        self.meta = {key: value for key, value in meta.items() if key != "variables"}
+        self._variables = []
+        self._streams = {}
+        self._parts = []
+
+    def append(self, variable, fixed=()):
+        """
+        Append a segment of the data of a variable
+
+        :param variable: variable of dataOut ({"type", "popNameShort", ..., "data"}) with the data of the segment:
+                         spikes.SpikeTrains or list with the spike times of each neuron (spikes), matrix (neuron, time
+                         stamp) (v) or dict of arrays (w) whose first axis is the time
+        :param fixed: names of the arrays of a dict that are the same in all segments (stored only from the first one)
+        """
+        key = (variable["type"], variable["popNameShort"])
+        stream = self._streams.get(key)
+        data = variable["data"]
+        if stream is None:
+            if isinstance(data, dict):
+                kind = "columns"
+            elif variable["type"] == "v" and variable.get("delta"):
+                kind = "delta"
+            elif variable["type"] == "v" or isinstance(data, np.ndarray):
+                kind = "array"
+            else:
+                kind = "spikes"
+            stream = {"variable": {name: value for name, value in variable.items() if name != "data"}, "kind": kind,
+                      "parts": {}, "fixed": {}}
+            if kind == "spikes":
+                stream["counts"] = np.zeros(len(data), dtype=np.int64)
+            self._streams[key] = stream
+            self._variables.append(stream)
+        if stream["kind"] == "spikes":
+            spikeTrains = spikes.SpikeTrains.from_times(data, self.meta["timeStep"], len(stream["counts"]))
+            stream["counts"] += spikeTrains.counts()
+            self._write_part(stream, "ticks", spikeTrains.ticks)
+            self._write_part(stream, "neurons", spikeTrains.neurons().astype(np.int32))
+        elif stream["kind"] == "delta":
+            values = np.asarray(data, dtype=float).reshape(len(data), -1)
+            if values.shape[1] > 0:
+                stream["fixed"].setdefault("first", values[:, 0].copy())
+                deltas, stream["last"] = _delta_encode(values, variable.get("dtype", "float64"), stream.get("last"))
+                self._write_part(stream, "deltas", deltas)
+        elif stream["kind"] == "array":
+            self._write_part(stream, "values", np.asarray(data, dtype=variable.get("dtype", float)).T)
+        else:
+            for name, value in data.items():
+                if name in fixed:
+                    stream["fixed"].setdefault(name, np.asarray(value))
+                else:
+                    self._write_part(stream, name, np.asarray(value))
+
+    def add(self, variable):
+        """
+        Add a variable whose data is complete (as the input spikes), stored as in write_data_file
+
+        :param variable: variable of dataOut ({"type", ..., "data"})
+        """
+        self._variables.append({"variable": variable, "kind": None})
+
+    def _write_part(self, stream, name, array):
+        """
+        Append an array to the temporal file of an array of a stream
+        """
+        part = stream["parts"].get(name)
+        if part is None:
+            part = {"path": self.fullPath + ".part" + str(len(self._parts)), "dtype": array.dtype,
+                    "shape": array.shape[1:], "length": 0}
+            part["file"] = open(part["path"], "wb")
+            stream["parts"][name] = part
+            self._parts.append(part)
+        if array.shape[1:] != part["shape"]:
+            raise ValueError("The shape of the segment " + str(array.shape) + " does not match the previous "
+                             "segments of " + name + " " + str(part["shape"]))
+        np.ascontiguousarray(array, dtype=part["dtype"]).tofile(part["file"])
+        part["length"] += len(array)
+
+    def close(self):
+        """
+        Assemble the data file from the temporal files and delete them
+
+        :return: full path to the file created, name of the file created
+        """
+        for part in self._parts:
+            part["file"].close()
+        try:
+            header = {"meta": self.meta, "variables": []}
+            arrays = []
+            for stream in self._variables:
+                if stream["kind"] is None:
+                    description, variableArrays = _encode_variable_data(stream["variable"])
+                    sources = variableArrays
+                    shapes = {name: (array.dtype, array.shape) for name, array in variableArrays.items()}
+                elif stream["kind"] == "spikes":
+                    description = {"kind": "spikes", "timeStep": float(self.meta["timeStep"])}
+                    counts = stream["counts"]
+                    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+                    stream["offsets"] = offsets
+                    sources = {"ticks": stream, "offsets": offsets}
+                    shapes = {"ticks": (np.dtype(np.int32), (int(offsets[-1]),)),
+                              "offsets": (offsets.dtype, offsets.shape)}
+                else:
+                    description = {"kind": stream["kind"]}
+                    sources = dict(stream["fixed"])
+                    shapes = {name: (array.dtype, array.shape) for name, array in stream["fixed"].items()}
+                    for name, part in stream["parts"].items():
+                        sources[name] = part
+                        shapes[name] = (part["dtype"], (part["length"],) + part["shape"])
+                entry = {key: value for key, value in stream["variable"].items() if key != "data"}
+                entry["data"] = dict(description, arrays={})
+                if stream["kind"] == "array":
+                    entry["data"]["transposed"] = True
+                for name, (dtype, shape) in shapes.items():
+                    entry["data"]["arrays"][name] = {"dtype": np.dtype(dtype).str, "shape": list(shape)}
+                    arrays.append((entry["data"]["arrays"][name], sources[name],
+                                   int(np.prod(shape)) * np.dtype(dtype).itemsize))
+                header["variables"].append(entry)
+
+            headerBytes = _layout_header(header, [(description, nbytes) for description, _, nbytes in arrays])
+            with open(self.fullPath, "wb") as file:
+                file.write(DATA_FILE_MAGIC)
+                file.write(np.uint64(len(headerBytes)).tobytes())
+                file.write(headerBytes)
+                for description, source, nbytes in arrays:
+                    file.write(b"\0" * (description["offset"] - file.tell()))
+                    if isinstance(source, np.ndarray):
+                        np.ascontiguousarray(source).tofile(file)
+                    elif "kind" in source:
+                        # Spikes: filled after writing the rest of the file
+                        file.seek(nbytes, os.SEEK_CUR)
+                    else:
+                        with open(source["path"], "rb") as part:
+                            shutil.copyfileobj(part, file, STREAM_CHUNK * 8)
+                file.truncate()
+            for description, source, nbytes in arrays:
+                if nbytes > 0 and isinstance(source, dict) and "kind" in source:
+                    self._group_spikes(source, description)
+        finally:
+            for part in self._parts:
+                if os.path.isfile(part["path"]):
+                    os.remove(part["path"])
+        return self.fullPath, self.filename
+
+    def _group_spikes(self, stream, description):
+        """
+        Write the spike ticks of a stream grouped by neuron: each chunk of (tick, neuron) pairs, in time order, is
+        placed after the spikes of each neuron already written
+        """
+        offsets = stream["offsets"]
+        values = np.memmap(self.fullPath, dtype=np.int32, mode="r+", offset=description["offset"],
+                           shape=(int(offsets[-1]),))
+        written = np.zeros(len(offsets) - 1, dtype=np.int64)
+        ticksPart, neuronsPart = stream["parts"]["ticks"], stream["parts"]["neurons"]
+        for start in range(0, ticksPart["length"], STREAM_CHUNK):
+            count = min(STREAM_CHUNK, ticksPart["length"] - start)
+            ticks = np.fromfile(ticksPart["path"], dtype=ticksPart["dtype"], count=count,
+                                offset=start * ticksPart["dtype"].itemsize)
+            neurons = np.fromfile(neuronsPart["path"], dtype=neuronsPart["dtype"], count=count,
+                                  offset=start * neuronsPart["dtype"].itemsize)
+            order = np.argsort(neurons, kind="stable")
+            neurons = neurons[order]
+            counts = np.bincount(neurons, minlength=len(written))
+            # Position = offset of the neuron + spikes already written of the neuron + index inside the chunk
+            rank = np.arange(count) - (np.cumsum(counts) - counts)[neurons]
+            values[offsets[neurons] + written[neurons] + rank] = ticks[order]
+            written += counts
+        values.flush()
+        del values
+
+
 def check_folder(path):
     """
     Check if a folder exist and, if it does not exist, it creates it
@@ -70,15 +523,16 @@ def format_neo_data(tipo, stream, timeStream={}):
 
     :param tipo: type of neo data ("v", "spikes" and "weights" supported)
     :param stream: data streams to be formated
-    :param timeStream: (optional) {"simTime", "timeStep"} necessary to add the time stamp to the weights stream format
+    :param timeStream: (optional) {"simTime", "timeStep"[, "numSrc", "numDst"]} necessary to add the time stamp to the
+                       weights stream format (the timeStep is also used to store the spikes as spikes.SpikeTrains)
     :return: formated stream or Raise an error if is an unsopported type of data
     """
     if timeStream is None:
-        timeStream = []
+        timeStream = {}
     if tipo == "v":
         formatStream = format_v_stream(stream)
     elif tipo == "spikes":
-        formatStream = format_spike_stream(stream)
+        formatStream = format_spike_stream(stream, timeStream.get("timeStep"))
     elif tipo == "weights":
         formatStream = format_weight_stream(stream, timeStream)
     else:
@@ -86,116 +540,415 @@ def format_neo_data(tipo, stream, timeStream={}):
     return formatStream
 
 
-def format_v_stream(vStream):
+def format_v_stream(vStream, asList=False):
     """
     Change the format of the neo data streams of membrane potentials and correct nan values
 
     :param vStream: neo streams of membrane potentials
-    :return: v stream formated
-    """
-    formatV = []
-    # Obtain the matrix of values ->
-    #   each element represents a time_stamp and the content of that element the value for each neuron
-    rawStream = vStream.as_array().tolist()
-    # Extract the nnumber of neuron on each time stamp
-    numNeurons = len(rawStream[0])
-    # Reformat it so each element is a neuron and the content is the values for each time stamp
-    for neuron in range(0, numNeurons):
-        formatV.append([item[neuron] for item in rawStream])
+    :param asList: (optional) if return the stream as a list of lists (format of previous versions)
+    :return: v stream formated -> float matrix (neuron, time stamp)
+    """
+    # Obtain the matrix of values (time stamp, neuron) and reformat it so each row is a neuron and the columns are the
+    #   values for each time stamp
+    formatV = np.array(vStream.as_array(), dtype=float).T
     # Change nan values for -60 if it is the first value in the stream, the value of the previous instant if it is the
     #  last instant and the average of the instants before and after in another case
-    for indexNeuron, neuron in enumerate(formatV):
-        for indexTime, timeStamp in enumerate(neuron):
-            if str(formatV[indexNeuron][indexTime]) == "nan":
-                if indexTime == 0:
-                    formatV[indexNeuron][indexTime] = -60.0
-                elif indexTime >= len(neuron)-1:
-                    formatV[indexNeuron][indexTime] = formatV[indexNeuron][indexTime-1]
-                else:
-                    formatV[indexNeuron][indexTime] = (formatV[indexNeuron][indexTime-1] +
-                                                      formatV[indexNeuron][indexTime+1])/2
+    isNan = np.isnan(formatV)
+    if isNan.any():
+        formatV[:, 0][isNan[:, 0]] = -60.0
+        if formatV.shape[1] > 2:
+            interior = formatV[:, 1:-1]
+            mean = (formatV[:, :-2] + formatV[:, 2:]) / 2
+            interior[isNan[:, 1:-1]] = mean[isNan[:, 1:-1]]
+        if formatV.shape[1] > 1:
+            formatV[:, -1][isNan[:, -1]] = formatV[:, -2][isNan[:, -1]]
+    if asList:
+        return formatV.tolist()
     return formatV
 
 
-def format_spike_stream(spikes):
+def format_spike_stream(spikeStream, timeStep=None):
     """
     Change the format of the neo data streams of spikes generated by neurons
 
-    :param spikesStream: neo stream of spikes
-    :return: spikes stream formated
+    :param spikeStream: neo stream of spikes
+    :param timeStep: (optional) time step (ms) of the simulation to store the spikes as ticks
+    :return: spikes stream formated -> spikes.SpikeTrains (list with the spike times of each neuron if there is not
+             timeStep)
     """
+    if timeStep is not None:
+        return spikes.SpikeTrains.from_times(spikeStream, timeStep)
     formatSpikes = []
-    for neuron in spikes:
+    for neuron in spikeStream:
         formatSpikes.append(neuron.as_array().tolist())
     return formatSpikes
 
 
 def format_weight_stream(weights, timeParam):
     """
-    Change the format of the streams of weights recorded
+    Change the format of the streams of weights recorded to a compressed sparse row (CSR) history of weights built in
+    one vectorized pass: the synapses sorted by src and dst (the synapses of the src neuron i are the positions
+    indptr[i]:indptr[i + 1] and indices holds their dst neuron) and one row of weights per time stamp
 
-    :param weightsStream: weight stream
-    :param timeStreamParam: temporal parameters of the simulation -> {"simTime", "timeStep"}
-    :return: formated weight stream -> {"srcNeuronId", "dstNeuronId", "w", "timeStamp"}
+    :param weightsStream: weight stream -> list with the synapses (src, dst, w) of each time stamp as returned by
+                          Projection.get('weight', format='list', with_address=True) or synapse arrays
+                          {"src", "dst", "w": (T, synapse)} as returned by stdp.reconstruct_weight_stream
+    :param timeStreamParam: temporal parameters of the simulation -> {"simTime", "timeStep"} and optionally the size of
+                            the populations {"numSrc", "numDst"} (by default, the max neuron id + 1)
+    :return: formated weight stream -> {"timeStamp": (T), "shape": [numSrc, numDst], "indptr": (numSrc + 1),
+             "indices": (synapse), "w": float32 (T, synapse)}
     """
-    srcNeuronId, dstNeuronId, w, timeStampStream = [], [], [], []
-
     # Generate time stream in ms
     timeStream = generate_time_streams(timeParam["simTime"], timeParam["timeStep"], False, True)
 
-    # For each time stamp:
-    for indexStep, step in enumerate(weights):
-        # For each synapse:
-        for indexSyn, synapse in enumerate(step):
-            srcNeuronId.append(synapse[0])
-            dstNeuronId.append(synapse[1])
-            w.append(synapse[2])
-            timeStampStream.append(timeStream[indexStep])
-    return {"srcNeuronId": srcNeuronId, "dstNeuronId": dstNeuronId, "w": w, "timeStamp": timeStampStream}
+    # Synapses (the same in all time stamps) and matrix (time stamp, synapse) of weights
+    if isinstance(weights, dict):
+        src, dst, w = weights["src"], weights["dst"], weights["w"]
+    else:
+        firstStep = np.asarray(weights[0], dtype=float).reshape(-1, 3) if len(weights) > 0 else np.zeros((0, 3))
+        src, dst = firstStep[:, 0].astype(np.int64), firstStep[:, 1].astype(np.int64)
+        w = np.empty((len(weights), len(src)), dtype=np.float32)
+        for indexStep, step in enumerate(weights):
+            w[indexStep] = np.asarray(step, dtype=float).reshape(-1, 3)[:, 2]
+    formatWeight = _weight_csr(src, dst, w, timeParam.get("numSrc"), timeParam.get("numDst"))
+    formatWeight["timeStamp"] = np.array(timeStream[:len(w)])
+    return formatWeight
+
+
+def format_weight_final(weights, numSrc=None, numDst=None):
+    """
+    Change the format of the weights of one instant to the CSR format of format_weight_stream (without time stamps)
+
+    :param weights: list of synapses (src, dst, w) as returned by Projection.get('weight', format='list',
+                    with_address=True)
+    :param numSrc: (optional) number of source neurons (by default, the max neuron id + 1)
+    :param numDst: (optional) number of destination neurons (by default, the max neuron id + 1)
+    :return: formated weights -> {"shape": [numSrc, numDst], "indptr": (numSrc + 1), "indices": (synapse),
+             "w": float32 (synapse)}
+    """
+    synapses = np.asarray(weights, dtype=float).reshape(-1, 3)
+    return _weight_csr(synapses[:, 0].astype(np.int64), synapses[:, 1].astype(np.int64), synapses[:, 2], numSrc,
+                       numDst)
+
+
+# Arrays of the CSR format of the weights that are the same in all time stamps (synapses)
+WEIGHT_FIXED_COLUMNS = ("shape", "indptr", "indices")
+
+
+def format_weight_snapshot(weights, timeStamp, numSrc=None, numDst=None):
+    """
+    Change the format of the weights of one instant to one time stamp of the history of format_weight_stream, to append
+    it to the history of a DataStreamWriter (with fixed=WEIGHT_FIXED_COLUMNS)
+
+    :param weights: list of synapses (src, dst, w) as returned by Projection.get('weight', format='list',
+                    with_address=True)
+    :param timeStamp: time stamp of the weights (ms)
+    :param numSrc: (optional) number of source neurons (by default, the max neuron id + 1)
+    :param numDst: (optional) number of destination neurons (by default, the max neuron id + 1)
+    :return: formated weights -> {"timeStamp": (1), "shape", "indptr", "indices", "w": float32 (1, synapse)}
+    """
+    formatWeight = format_weight_final(weights, numSrc, numDst)
+    formatWeight["w"] = formatWeight["w"][None, :]
+    formatWeight["timeStamp"] = np.array([float(timeStamp)])
+    return formatWeight
+
+
+def _weight_csr(src, dst, w, numSrc=None, numDst=None):
+    """
+    Sort the synapses (src, dst) and their weights (..., synapse) in CSR order
+    """
+    src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+    numSrc = int(src.max(initial=-1)) + 1 if numSrc is None else int(numSrc)
+    numDst = int(dst.max(initial=-1)) + 1 if numDst is None else int(numDst)
+    indexType = np.int32 if max(numSrc, numDst) < 2 ** 31 else np.int64
+    order = sparse.csr_order(src, dst)
+    return {"shape": np.array([numSrc, numDst], dtype=np.int64), "indptr": sparse.csr_indptr(src[order], numSrc),
+            "indices": dst[order].astype(indexType), "w": np.asarray(w, dtype=np.float32)[..., order]}
+
+
+def weight_stream_from_columns(weightColumns, numSrc=None, numDst=None):
+    """
+    Convert a weight stream of previous versions {"srcNeuronId", "dstNeuronId", "w", "timeStamp"} (one element per
+    synapse and time stamp) to the CSR format of format_weight_stream
+
+    :param weightColumns: weight stream of previous versions
+    :param numSrc: (optional) number of source neurons (by default, the max neuron id + 1)
+    :param numDst: (optional) number of destination neurons (by default, the max neuron id + 1)
+    :return: formated weight stream -> {"timeStamp": (T), "shape", "indptr", "indices", "w": float32 (T, synapse)}
+    """
+    src = np.asarray(weightColumns["srcNeuronId"], dtype=np.int64)
+    dst = np.asarray(weightColumns["dstNeuronId"], dtype=np.int64)
+    timeStamp, indexStep = np.unique(np.asarray(weightColumns["timeStamp"], dtype=float), return_inverse=True)
+    numDst = int(dst.max(initial=-1)) + 1 if numDst is None else numDst
+    keys, indexSynapse = np.unique(src * numDst + dst, return_inverse=True)
+    w = np.full((len(timeStamp), len(keys)), np.nan, dtype=np.float32)
+    w[indexStep, indexSynapse] = np.asarray(weightColumns["w"], dtype=float)
+    formatWeight = _weight_csr(keys // numDst, keys % numDst, w, numSrc, numDst)
+    formatWeight["timeStamp"] = timeStamp
+    return formatWeight
+
+
+def get_weight_step(weightStream, timeStamp):
+    """
+    Get the weights of all synapses in a time stamp
+
+    :param weightStream: weight stream formated with format_weight_stream (or the dense format of previous versions)
+    :param timeStamp: time stamp (ms)
+    :return: matrix (src, dst) of weights (nan in the non existing synapses)
+    """
+    indexStep = int(np.searchsorted(weightStream["timeStamp"], timeStamp))
+    if indexStep >= len(weightStream["timeStamp"]) or weightStream["timeStamp"][indexStep] != timeStamp:
+        raise ValueError("Time stamp not recorded: " + str(timeStamp))
+    if "indptr" not in weightStream:
+        return weightStream["w"][indexStep]
+    return sparse.csr_to_dense(weightStream["indptr"], weightStream["indices"], weightStream["w"][indexStep],
+                               int(weightStream["shape"][1]))
+
+
+def get_synapse_trajectory(weightStream, src, dst):
+    """
+    Get the weight of a synapse in each time stamp
+
+    :param weightStream: weight stream formated with format_weight_stream (or the dense format of previous versions)
+    :param src: id of the source neuron
+    :param dst: id of the destination neuron
+    :return: array with the weight of the synapse in each time stamp (nan if the synapse does not exist)
+    """
+    if "indptr" not in weightStream:
+        return weightStream["w"][:, src, dst]
+    start, stop = int(weightStream["indptr"][src]), int(weightStream["indptr"][src + 1])
+    positions = np.nonzero(np.asarray(weightStream["indices"][start:stop]) == dst)[0]
+    if len(positions) == 0:
+        return np.full(len(weightStream["timeStamp"]), np.nan, dtype=np.float32)
+    return weightStream["w"][:, start + positions[0]]
 
 
 def get_last_stamp_synapse_list(dataPath, delay=1.0, synapse="PCL-PCL"):
     """
-    Given full path filename of data file from a simulation, extract the last iteration weight
+    Given full path filename of data file from a simulation (or its data in memory), extract the last iteration weight
 
-    :param dataPath: full path filename of data file from a simulation
+    :param dataPath: full path filename of data file from a simulation or its dataOut (only "synParameters" and the
+                     weight variables are needed)
     :param delay: delay to add to the synapses
     :param synapse: name of synapses that want to extract the weight
-    :return: synapse list (src,dst,w) of last timestamp and other metadata
+    :return: synapse array (src, dst, w, delay) of last timestamp, one row per synapse, and other metadata
     """
+    # Take the final weight, stored as its own record by the training (independent of the training duration)
+    variable = _find_variable(dataPath, "wFinal", synapse)
+    if variable:
+        w = variable["data"]
+        if isinstance(w, dict):
+            synapses = weight_csr_to_synapses(w["indptr"], w["indices"], w["w"], delay)
+        else:
+            synapses = weight_matrix_to_synapses(np.asarray(w), delay)
+    else:
+        # Data files without final weight record: take the last timeStamp of the weight history
+        variable = _find_variable(dataPath, "w", synapse)
+
+        # Check if data has been found
+        if not variable:
+            print("Error to read the weight file. Try to redo training with recordWeight = True.")
+            return False
+
+        # Data files of previous versions store one element per synapse and time stamp or a dense tensor
+        w = variable["data"]
+        if "srcNeuronId" in w:
+            w = weight_stream_from_columns(w)
+        lastStep = int(np.argmax(w["timeStamp"]))
+        if "indptr" in w:
+            synapses = weight_csr_to_synapses(w["indptr"], w["indices"], w["w"][lastStep], delay)
+        else:
+            synapses = weight_matrix_to_synapses(w["w"][lastStep], delay)
 
-    # Open file with weights
-    data = read_file(dataPath)
+    # Return array of synapse and metainformation of original STDP synapses
+    meta = dataPath if isinstance(dataPath, dict) else read_meta(dataPath)
+    return synapses, meta["synParameters"][synapse]
 
-    # Search weight variable with given synapse name
-    w = {}
+
+def _find_variable(data, tipo, popNameShort):
+    """
+    Get a variable from a data file or from the data of a simulation in memory (dataOut), without writing and reading a
+    file when the data is passed directly from a previous simulation
+
+    :return: the variable ({"type", "popName", ..., "data"}) or False if it is not in the data
+    """
+    if not isinstance(data, dict):
+        return read_variable(data, tipo, popNameShort)
     for variable in data["variables"]:
-        if variable["type"] == "w" and variable["popNameShort"] == synapse:
-            w = variable["data"]
+        if variable["type"] == tipo and variable["popNameShort"] == popNameShort:
+            return variable
+    return False
+
+
+def weight_csr_to_synapses(indptr, indices, weights, delay=1.0):
+    """
+    Convert CSR weights to the array of synapses used by FromListConnector
+
+    :param indptr: row pointers (numSrc + 1)
+    :param indices: dst neuron of each synapse
+    :param weights: weight of each synapse
+    :param delay: delay to add to the synapses
+    :return: synapse array (src, dst, w, delay), one row per synapse
+    """
+    indptr = np.asarray(indptr)
+    src = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    return np.column_stack((src, indices, weights, np.full(len(src), delay))).astype(float)
+
+
+def weight_matrix_to_synapses(weights, delay=1.0):
+    """
+    Convert a weight matrix (src, dst) to the array of synapses used by FromListConnector
+
+    :param weights: matrix (src, dst) of weights with nan in the non existing synapses
+    :param delay: delay to add to the synapses
+    :return: synapse array (src, dst, w, delay), one row per existing synapse
+    """
+    src, dst = np.nonzero(~np.isnan(weights))
+    return np.column_stack((src, dst, weights[src, dst], np.full(len(src), delay))).astype(float)
 
-    # Check if data has been found
-    if w == {}:
-        print("Error to read the weight file. Try to redo training with recordWeight = True.")
-        return False
 
-    # Take the last timeStamp
-    maxTimeStamp = max(list(set(w["timeStamp"])))
+#####################################
+# Network
+#####################################
+
+def get_recurrent_connector(sim, connectivity):
+    """
+    Create the connector of a recurrent projection of a population with itself (without self connections)
+
+    :param sim: simulator used to build the network (spynnaker8 or sim_numpy)
+    :param connectivity: type of connectivity -> {"type": "all-to-all"}, {"type": "fixed-probability", "p_connect",
+                         "seed"} (each pair of neurons connected with probability p_connect) or {"type":
+                         "fixed-in-degree", "n", "seed"} (each neuron receives synapses from n neurons)
+    :return: connector of the simulator or Raise an error if is an unsupported type of connectivity
+    """
+    if connectivity["type"] == "all-to-all":
+        return sim.AllToAllConnector(allow_self_connections=False)
+    rng = sim.NumpyRNG(seed=connectivity.get("seed"))
+    if connectivity["type"] == "fixed-probability":
+        return sim.FixedProbabilityConnector(connectivity["p_connect"], allow_self_connections=False, rng=rng)
+    if connectivity["type"] == "fixed-in-degree":
+        return sim.FixedNumberPreConnector(connectivity["n"], allow_self_connections=False, rng=rng)
+    raise ValueError("Unsupported connectivity: " + str(connectivity["type"]))
+
+
+# Execution options of the models, defined as module-level parameters of each one (CA3_oscilatory.py,
+#   CA3_pc_inhibitory.py and CA3_pc_inhibitory_static_syn.py):
+# + streamSegment: duration of the segments of a streaming simulation (ms). The spikes and v recorded are retrieved
+#   after each segment and appended to the data file (see DataStreamWriter), so the memory does not grow with simTime,
+#   and the weight history (recordWeight) is sampled at the end of each segment. None to run the whole simulation at
+#   once
+# + eventDriven: only the time steps with activity are computed and the quiescent periods between the inputs are
+#   skipped with the analytic solution of the neurons (NumPy backend, ignored with sPyNNaker)
+# + fixedPoint: v, synaptic currents, STDP traces and weights computed in the int32 s16.15 format of SpiNNaker, so the
+#   results are comparable bit by bit with the board (NumPy backend, ignored with sPyNNaker, which always uses it). Only
+#   in the models with STDP (CA3_oscilatory.py and CA3_pc_inhibitory.py)
+# + recordPhases: measure the wall-clock time, memory and objects of each phase of the execution (setup, populations,
+#   projections, run, get_data, format, write) and store them as JSON next to the data file (see instrumentation.py)
+# + recordPolicies: recording policy of v of each population (see DEFAULT_RECORD_POLICY), as v dominates the data of
+#   large networks and long simulations. The spikes are always recorded from all the neurons
+def get_setup_options(sim, eventDriven=False, fixedPoint=False):
+    """
+    Options of sim.setup only available in the NumPy backend
+
+    :param sim: simulator used to build the network (spynnaker8 or sim_numpy)
+    :param eventDriven: if only compute the time steps with activity (see sim_numpy.setup)
+    :param fixedPoint: if compute with the fixed-point arithmetic of SpiNNaker (see sim_numpy.setup)
+    :return: dict with the keyword arguments of sim.setup (empty with sPyNNaker, which always computes in fixed point)
+    """
+    if sim.__name__ != "sim_numpy":
+        return {}
+    options = {"event_driven": eventDriven}
+    if fixedPoint:
+        options["fixed_point"] = True
+    return options
+
+
+def get_model_parameters(namespace, params=None):
+    """
+    Module-level parameters of a model (simulationParameters, synParameters, eventDriven, ...) with the values of params
+    instead of the ones of the module, which is not modified. So several configurations of a model can be simulated in
+    the same process (see sweep.py) without changing and restoring its global variables
+
+    :param namespace: module-level variables of the model (globals() of its module)
+    :param params: (optional) dict {name: value} with the parameters to use instead of the module ones
+    :return: mapping {name: value} of the parameters or Raise an error if a parameter is not defined by the model
+    """
+    params = params or {}
+    unknown = [name for name in params if name not in namespace]
+    if unknown:
+        raise ValueError("Unknown parameters of the model: " + ", ".join(map(str, unknown)))
+    return ChainMap(params, namespace)
+
+
+# Recording of v of a population: subset of neuron ids (None for all), sampling interval (ms, None for every time step),
+#   storage type in the data file (one of RECORD_DTYPES) and delta encoding of consecutive values (see write_data_file)
+DEFAULT_RECORD_POLICY = {"neurons": None, "samplingInterval": None, "dtype": "float64", "delta": False}
+RECORD_DTYPES = ["float64", "float32", "float16"]
 
-    # Take all indeces from the last timestamp
-    maxTimeStampIndeces = [i for i, value in enumerate(w["timeStamp"]) if value == maxTimeStamp]
 
-    # Get weight, source id and destiny id from that timestamp
-    lastTimeStampWeights = itemgetter(*maxTimeStampIndeces)(w["w"])
-    lastTimeStampSrcNeuron = itemgetter(*maxTimeStampIndeces)(w["srcNeuronId"])
-    lastTimeStampDstNeuron = itemgetter(*maxTimeStampIndeces)(w["dstNeuronId"])
+def get_record_policy(policy=None):
+    """
+    Complete a recording policy of v with the default values
+
+    :param policy: (optional) dict with some of the keys of DEFAULT_RECORD_POLICY
+    :return: recording policy or Raise an error if the storage type is not supported
+    """
+    policy = dict(DEFAULT_RECORD_POLICY, **(policy or {}))
+    if policy["dtype"] not in RECORD_DTYPES:
+        raise ValueError("Unsupported type to store v: " + str(policy["dtype"]))
+    return policy
 
-    # Create the list of data
-    synapses = []
-    for index, w_individual in enumerate(lastTimeStampWeights):
-        synapses.append((lastTimeStampSrcNeuron[index], lastTimeStampDstNeuron[index], w_individual, delay))
 
-    # Return list of synapse and metainformation of original STDP synapses
-    return synapses, data["synParameters"][synapse]
+def get_record_options(policy=None):
+    """
+    Options of Population.record("v", ...) of a recording policy, so only the selected neurons and time stamps are
+    recorded (and transferred from the board with sPyNNaker)
+
+    :param policy: (optional) recording policy of v (see DEFAULT_RECORD_POLICY)
+    :return: dict with the keyword arguments sampling_interval and indexes (only the ones given in the policy)
+    """
+    policy = get_record_policy(policy)
+    options = {}
+    if policy["samplingInterval"] is not None:
+        options["sampling_interval"] = policy["samplingInterval"]
+    if policy["neurons"] is not None:
+        options["indexes"] = sorted(set(policy["neurons"]))
+    return options
+
+
+def get_record_fields(policy, timeStep):
+    """
+    Fields of the variable v of dataOut that describe how it was recorded and how it is stored
+
+    :param policy: recording policy of v (see DEFAULT_RECORD_POLICY)
+    :param timeStep: time step of the simulation (ms)
+    :return: dict -> {"neurons": ids of the recorded neurons (None for all), "samplingInterval": time between two
+             values (ms), "dtype", "delta"}
+    """
+    policy = get_record_policy(policy)
+    interval = timeStep if policy["samplingInterval"] is None else \
+        max(1, int(round(policy["samplingInterval"] / timeStep))) * timeStep
+    neurons = None if policy["neurons"] is None else sorted(set(policy["neurons"]))
+    return {"neurons": neurons, "samplingInterval": interval, "dtype": policy["dtype"], "delta": policy["delta"]}
+
+
+def run_segments(sim, simTime, segmentTime):
+    """
+    Execute a simulation in consecutive segments, so the recorded data can be retrieved (get_data with clear=True) and
+    stored after each one
+
+    :param sim: simulator with the network already built
+    :param simTime: duration of the simulation (ms)
+    :param segmentTime: duration of each segment (ms), the last one can be shorter
+    :return: generator of the time (ms) at the end of each segment
+    """
+    elapsed = 0.0
+    while elapsed < simTime:
+        duration = min(segmentTime, simTime - elapsed)
+        instrumentation.start_phase("run")
+        sim.run(duration)
+        elapsed += duration
+        yield elapsed
 
 
 #####################################
@@ -249,12 +1002,44 @@ def generate_sequence(start, stop, step, divisor):
 #####################################
 
 
+def spike_time_index(spikeTrains):
+    """
+    Precompute the index tick -> neurons that fire in that tick of a spike stream
+
+    :param spikeTrains: spike stream (spikes.SpikeTrains)
+    :return: sorted array of ticks with spikes, array of neuron ids sorted by tick and array with the position in the
+             neuron ids array where the neurons of each tick begin (plus the total at the end)
+    """
+    return spikeTrains.tick_index()
+
+
+def _spike_label(prefix, spikeTrains, tick, maxNeurons):
+    """
+    Create the label of the neurons of a population that fire in a tick ("DG1-2-3")
+
+    :param prefix: name of the population
+    :param spikeTrains: spikes of the population (spikes.SpikeTrains)
+    :param tick: tick of the time stamp
+    :param maxNeurons: max number of neuron ids in the label, the rest are summarized as "+N"
+    :return: label or empty string if no neuron fires in the tick
+    """
+    ids = spikeTrains.fired_at(tick)
+    if len(ids) == 0:
+        return ""
+    label = prefix + "-".join(str(neuron) for neuron in ids[:maxNeurons])
+    if len(ids) > maxNeurons:
+        label = label + "(+" + str(len(ids) - maxNeurons) + ")"
+    return label
+
+
 def plot_spike_pc_dg(spikesPC, spikesDG, timeStream, colors, marginLim, title, rotateLabels, plot, saveFig, saveName, savePath):
     """
-    Create a spike plot of all activations of DG and PC (CA3) neurons
+    Create a spike plot of all activations of DG and PC (CA3) neurons. The spikes of each population are drawn as a
+    single collection and the labels are built from a time -> neurons index, with at most as many labels (and x ticks)
+    as fit in the width of the figure, so the time grows roughly linearly with the number of spikes
 
-    :param spikesPCdir: PCdir spike stream 
-    :param spikesDG: DG spike stream 
+    :param spikesPC: PC spike stream (spikes.SpikeTrains)
+    :param spikesDG: DG spike stream (spikes.SpikeTrains)
     :param timeStream: time stamp stream
     :param colors: list of color for each population of neuron to represent
     :param marginLim: additional margin to the spike amplitude to mark the begin and end of the representation view
@@ -266,47 +1051,41 @@ def plot_spike_pc_dg(spikesPC, spikesDG, timeStream, colors, marginLim, title, r
     :param savePath: path where to store the png file
     :return: full path (path + fig name) where the figure has been stored, if isSave is True
     """
+    fontSize = 15
+    fig = plt.figure(figsize=(24, 8))
+
+    # Add PC and DG spikes: one collection per population with a line for each time stamp with spikes (the spikes of
+    #   different neurons in the same time stamp are drawn in the same position)
+    spikesPC = spikes.SpikeTrains.from_times(spikesPC, spikesDG.timeStep)
+    ticksDG = spikesDG.active_ticks()
+    ticksPC = spikesPC.active_ticks()
+    plt.vlines(ticksDG * spikesDG.timeStep, ymin=0 - marginLim, ymax=0.5, color=colors[0], label="DG")
+    plt.vlines(ticksPC * spikesDG.timeStep, ymin=0, ymax=0.5 + marginLim, color=colors[1], label="PC")
 
-    plt.figure(figsize=(24, 8))
-
-    # Add PC dir, cont and DG spikes
-    label = "DG"
-    for spikeDG in spikesDG:
-        plt.vlines(spikeDG, ymin=0 - marginLim, ymax=0.5 , color=colors[0], label=label)
-        label = "_nolegend_"
-    label = "PC"
-    for spikePC in spikesPC:
-        plt.vlines(spikePC, ymin=0, ymax=0.5 + marginLim, color=colors[1], label=label)
-        label = "_nolegend_"
-
-    # Make labels for spikes in each instant
-    for stamp in timeStream:
-        label = ""
-        # For current instant, check if a spike has occurred
-        sublabel = "DG"
-        for indexNeuron, spikeDG in enumerate(spikesDG):
-            if stamp in spikeDG:
-                label = label + sublabel + str(indexNeuron)
-                sublabel = "-"
-        label = label + " "
-        sublabel = "PC"
-        for indexNeuron, spikePC in enumerate(spikesPC):
-            if stamp in spikePC:
-                label = label + sublabel + str(indexNeuron)
-                sublabel = "-"
+    # Max number of labels (rotated text of fontSize points) that fit in the width of the figure and max number of
+    #   neuron ids that fit in the height of a label
+    maxLabels = max(1, int(fig.get_figwidth() * 72 / (fontSize * 1.5)))
+    maxNeurons = max(1, int(fig.get_figheight() * 72 * 0.8 / (fontSize * 0.6 * 3)))
+
+    # Make labels for spikes in each instant with spikes (a subsample of them if they do not fit)
+    ticks = np.union1d(ticksDG, ticksPC)
+    labelTicks = ticks[::int(np.ceil(len(ticks) / maxLabels))] if len(ticks) > 0 else ticks
+    for tick in labelTicks:
+        label = _spike_label("DG", spikesDG, tick, maxNeurons) + " " + _spike_label("PC", spikesPC, tick, maxNeurons)
         # Add the label to the current instant
-        plt.annotate(label, xy=(stamp+0.1, 0.01), rotation=90, fontsize=15)
+        plt.annotate(label, xy=(tick * spikesDG.timeStep + 0.1, 0.01), rotation=90, fontsize=fontSize)
 
     # Add metadata
-    plt.xlabel("Simulation time (ms)", fontsize=15)
-    plt.ylabel("Spikes", fontsize=15)
-    plt.title(title, fontsize=15)
+    plt.xlabel("Simulation time (ms)", fontsize=fontSize)
+    plt.ylabel("Spikes", fontsize=fontSize)
+    plt.title(title, fontsize=fontSize)
     plt.ylim([-marginLim, 0.5 + marginLim])
     plt.xlim(-0.5, max(timeStream) + 1.5)
-    listXticks = list(set([spike for sublist in spikesPC for spike in sublist] \
-                 + [spike for sublist in spikesDG for spike in sublist]))
-    plt.xticks(listXticks, fontsize=15)
-    plt.legend(bbox_to_anchor=(1.0, 1.0), loc='upper left', fontsize=15)
+    if len(ticks) <= maxLabels:
+        plt.xticks(ticks * spikesDG.timeStep, fontsize=fontSize)
+    else:
+        plt.xticks(fontsize=fontSize)
+    plt.legend(bbox_to_anchor=(1.0, 1.0), loc='upper left', fontsize=fontSize)
     if rotateLabels:
         plt.xticks(rotation=90)
 